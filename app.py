@@ -1,13 +1,18 @@
-from flask import Flask, render_template, request, send_from_directory, redirect, session, g, url_for, make_response, flash
-from models import db, Question, BroadTheme, SpecificTheme, User, Country, ImageAsset, AnswerImageLink, QuizRuleSet, UserQuestionStat, UserQuizSession, QuestionAnswerStat, Profile, Conversation, ConversationParticipant, ConversationMessage, QuestionReport, ContactMessage, Keyword, QuizShareLink
+from flask import Flask, Response, render_template, request, send_from_directory, redirect, session, g, url_for, make_response, flash
+from markupsafe import Markup
+from models import db, dialect_insert, Question, BroadTheme, SpecificTheme, User, Country, ImageAsset, AnswerImageLink, QuizRuleSet, UserQuestionStat, UserQuizSession, QuestionAnswerStat, Profile, Conversation, ConversationParticipant, ConversationMessage, QuestionReport, ContactMessage, Keyword, QuizShareLink, PendingNotification
 from datetime import datetime
 import random
 import os
 import re
 import json
 import uuid
+import hmac
+import hashlib
+import logging
+import time
 from werkzeug.security import check_password_hash, generate_password_hash
-from sqlalchemy import func, text, or_
+from sqlalchemy import func, text
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import io
 try:
@@ -15,8 +20,24 @@ try:
 except Exception:
     Image = None
 from unidecode import unidecode
-from email_utils import send_email_optional
+from email_outbox import OutboxSender
+from email_digest import DIGEST_MODES, DigestScheduler, queue_message_notification
 from config import config
+from app_logging import get_logger, init_app_logging
+from sql_profiler import init_sql_profiler
+from quiz_state import create_quiz_state_store
+from quiz_pool import catalog_version, apply_rule_set_filters, install_pool_invalidation
+from quiz_history import get_user_history, record_answer, delete_user_history, configure_history_cache
+from quiz_warmup import PlaylistWarmPool
+from quiz_counters import QuestionCounterAggregator, write_counter_batch
+from quiz_rules import CompiledRuleSet, compile_rule_set, get_compiled_rule_set
+from quiz_playlist import build_playlist
+from quiz_simulation import MAX_RUNS as SIMULATION_MAX_RUNS, simulate_playlists
+from quiz_catalog import get_question_snapshot
+from quiz_fragments import QuizFragmentCache, compile_fragment
+from quiz_endless import get_eligible_ids, next_endless_question_id
+from messages_inbox import fetch_inbox, fetch_thread_page, mark_read, mark_unread, record_new_message, recount_unread_counters, total_unread
+from messages_events import MessageEventBroker
 
 app = Flask(__name__)
 
@@ -28,9 +49,47 @@ app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB
 app.config['SOUNDS_FOLDER'] = os.path.join(os.getcwd(), 'ressources', 'sounds')
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.instance_path, exist_ok=True)
+
+# Journalisation par sous-système (niveaux réglables à chaud, file non bloquante), voir app_logging.py
+app.extensions['app_logging'] = init_app_logging(app.config)
+log = get_logger('app')
+images_log = get_logger('images.gallery')
+contact_log = get_logger('messages.contact')
+conversation_log = get_logger('messages.conversation')
+widget_log = get_logger('messages.widget')
+playlist_log = get_logger('quiz.playlist')
+session_log = get_logger('quiz.session')
+next_log = get_logger('quiz.next')
+answer_log = get_logger('quiz.answer')
+shuffle_log = get_logger('quiz.shuffle')
+score_log = get_logger('quiz.score')
+quiz_state_log = get_logger('quiz.state')
+pack_log = get_logger('quiz.pack')
+simulation_log = get_logger('quiz.simulation')
+
+# Requêtes SQL par requête HTTP (en-têtes X-SQL-*, détection des N+1), voir sql_profiler.py
+app.extensions['sql_profiler'] = init_sql_profiler(app)
 
 db.init_app(app)
 
+# État des parties de quiz côté serveur (le cookie ne garde qu'un identifiant opaque)
+app.extensions['quiz_state_store'] = create_quiz_state_store(app.config, app.instance_path)
+
+# Invalider les pools de questions candidates quand le catalogue change (voir quiz_pool.py)
+install_pool_invalidation()
+configure_history_cache(size=app.config.get('QUIZ_HISTORY_CACHE_SIZE'))
+
+# Playlists pré-générées en arrière-plan (démarrage et "Rejouer" instantanés)
+app.extensions['quiz_warm_pool'] = PlaylistWarmPool(
+    app,
+    lambda rule_set, user_id, history=None: _generate_quiz_playlist(rule_set, user_id, history),
+    size=app.config.get('QUIZ_WARM_POOL_SIZE', 0)
+)
+
+# Fragments HTML rendus des questions et résultats (seules les valeurs du joueur sont injectées)
+app.extensions['quiz_fragments'] = QuizFragmentCache(size=app.config.get('QUIZ_FRAGMENT_CACHE_SIZE', 0))
+
 # Créer les tables
 with app.app_context():
     db.create_all()
@@ -60,6 +119,15 @@ with app.app_context():
             if 'is_private' not in existing_cols_questions:
                 db.session.execute(text("ALTER TABLE questions ADD COLUMN is_private BOOLEAN NOT NULL DEFAULT 0"))
             db.session.commit()
+
+            # Migration pour la table conversation_participants
+            result_parts = db.session.execute(text("PRAGMA table_info(conversation_participants)"))
+            existing_cols_parts = {row[1] for row in result_parts.fetchall()}
+            # unread_count (compteur dénormalisé des non lus), initialisé depuis les messages
+            if existing_cols_parts and 'unread_count' not in existing_cols_parts:
+                db.session.execute(text("ALTER TABLE conversation_participants ADD COLUMN unread_count INTEGER NOT NULL DEFAULT 0"))
+                recount_unread_counters()
+            db.session.commit()
     except Exception:
         # Ne bloque pas l'app; pour autres SGBD, utiliser une migration Alembic
         db.session.rollback()
@@ -156,11 +224,45 @@ with app.app_context():
                 )
                 db.session.add(default_admin)
                 db.session.commit()
-                print("[INIT] Administrateur par défaut créé: username='admin', password='admin123'")
+                log.info("Administrateur par défaut créé: username='admin', password='admin123'")
 
     except Exception as e:
         db.session.rollback()
-        print(f"[WARN] Erreur lors de l'initialisation des données: {e}")
+        log.warning("Erreur lors de l'initialisation des données: %s", e)
+
+# Compteurs globaux des questions (réponses, succès, distribution) écrits par lots
+app.extensions['quiz_counters'] = QuestionCounterAggregator(
+    app,
+    flush_interval=app.config.get('QUIZ_COUNTERS_FLUSH_INTERVAL', 0.3),
+    journal_path=app.config.get('QUIZ_COUNTERS_JOURNAL')
+)
+
+# Emails de notification: boîte d'envoi en base, vidée par lots en arrière-plan
+app.extensions['email_outbox'] = OutboxSender(
+    app,
+    batch_size=app.config.get('EMAIL_OUTBOX_BATCH_SIZE', 50),
+    poll_interval=app.config.get('EMAIL_OUTBOX_POLL_INTERVAL', 5.0),
+    max_attempts=app.config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6),
+    retry_base_seconds=app.config.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30),
+)
+# Emails restés en attente avant un redémarrage
+app.extensions['email_outbox'].start()
+
+# Résumés horaires / quotidiens des nouveaux messages (préférence notify_email_digest)
+app.extensions['email_digest'] = DigestScheduler(
+    app,
+    outbox=app.extensions['email_outbox'],
+    interval=app.config.get('DIGEST_INTERVAL_SECONDS', 60),
+    daily_hour=app.config.get('DIGEST_DAILY_HOUR', 7),
+)
+app.extensions['email_digest'].start()
+
+# Push des nouveaux messages et du badge des non lus (server-sent events, /api/messages/events)
+app.extensions['message_events'] = MessageEventBroker(
+    app,
+    backend=app.config.get('MESSAGE_EVENTS_BACKEND', 'local'),
+    poll_interval=app.config.get('MESSAGE_EVENTS_POLL_INTERVAL', 2.0),
+)
 
 # ================== Gestion Session / Utilisateur ==================
 
@@ -220,35 +322,48 @@ def _deny_access(reason: str):
 
 @app.route('/auth/widget')
 def auth_widget():
-    # Calculer le nombre de messages non lus pour l'utilisateur connecté
+    # Nombre de messages non lus: somme des compteurs des participations (voir messages_inbox.py)
     unread = 0
     user = getattr(g, 'current_user', None)
     if user and user.password_hash:
         try:
-            parts = ConversationParticipant.query.filter_by(user_id=user.id).all()
-            print(f"[WIDGET] User {user.username} has {len(parts)} conversation participations")
-            for p in parts:
-                last_read = p.last_read_at or datetime.min
-                # Pour les nouveaux participants (last_read_at=None), compter tous les messages sauf ceux de l'utilisateur
-                if p.last_read_at is None:
-                    count = ConversationMessage.query.filter(
-                        ConversationMessage.conversation_id == p.conversation_id,
-                        or_(ConversationMessage.sender_id.is_(None), ConversationMessage.sender_id != user.id)
-                    ).count()
-                    print(f"[WIDGET] Conversation {p.conversation_id}: NEW participant, messages={count}")
-                else:
-                    count = ConversationMessage.query.filter(
-                        ConversationMessage.conversation_id == p.conversation_id,
-                        ConversationMessage.created_at > last_read,
-                        or_(ConversationMessage.sender_id.is_(None), ConversationMessage.sender_id != user.id)
-                    ).count()
-                    print(f"[WIDGET] Conversation {p.conversation_id}: last_read={p.last_read_at}, messages={count}")
-                unread += count
-            print(f"[WIDGET] Total unread for {user.username}: {unread}")
+            unread = total_unread(user.id)
+            widget_log.debug("Total unread for %s: %s", user.username, unread)
         except Exception as e:
-            print(f"[WIDGET] Error calculating unread: {e}")
+            widget_log.warning("Error calculating unread: %s", e)
             unread = 0
-    return render_template('auth_widget.html', unread_count=unread)
+
+    # Widget inchangé (même utilisateur, mêmes droits, mêmes non lus): 304 sans rendu
+    etag = _auth_widget_etag(user, unread)
+    if request.if_none_match.contains(etag):
+        resp = make_response('', 304)
+    else:
+        resp = make_response(render_template('auth_widget.html', unread_count=unread))
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    resp.vary.add('Cookie')
+    return resp
+
+
+_template_versions: dict[str, str] = {}
+
+
+def _template_version(name: str) -> str:
+    """Empreinte du source d'un template (recalculée à chaque appel en mode debug)."""
+    version = _template_versions.get(name)
+    if version is None or app.debug:
+        source = app.jinja_env.loader.get_source(app.jinja_env, name)[0]
+        version = _template_versions[name] = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    return version
+
+
+def _auth_widget_etag(user, unread: int) -> str:
+    """ETag du widget: tout ce dont dépend son rendu pour un visiteur non connecté ou un utilisateur."""
+    if user is None:
+        state = 'anonymous'
+    else:
+        state = f"{user.id}:{user.username}:{int(bool(user.password_hash))}:{int(user.has_any_admin_perm())}:{unread}"
+    return hashlib.sha1(f"{_template_version('auth_widget.html')}|{state}".encode('utf-8')).hexdigest()
 
 
 @app.route('/auth/quick-login', methods=['POST'])
@@ -633,6 +748,8 @@ def preferences():
         prefs = g.current_user.get_preferences()
         prefs['double_click_validation'] = (request.form.get('double_click_validation') == '1')
         prefs['notify_email_on_message'] = (request.form.get('notify_email_on_message') == '1')
+        digest = request.form.get('notify_email_digest') or 'immediate'
+        prefs['notify_email_digest'] = digest if digest in DIGEST_MODES else 'immediate'
         g.current_user.set_preferences(prefs)
 
         db.session.commit()
@@ -660,6 +777,8 @@ def delete_account():
         # Supprimer explicitement les données liées pour s'assurer qu'elles sont supprimées
         UserQuestionStat.query.filter_by(user_id=user_id).delete()
         UserQuizSession.query.filter_by(user_id=user_id).delete()
+        PendingNotification.query.filter_by(user_id=user_id).delete()
+        delete_user_history(user_id)
 
         # Supprimer l'utilisateur (les foreign keys avec cascade s'occuperont du reste)
         db.session.delete(g.current_user)
@@ -770,11 +889,11 @@ def images_gallery_fragment():
     selected_id = request.args.get('selected_id', type=int)
     select_id = request.args.get('select_id', '')
     partial = request.args.get('partial', '0') == '1'
-    print(f"[DEBUG] /api/images/gallery called with search='{search}', selected_id={selected_id}, select_id='{select_id}', partial={partial}")
+    images_log.debug("/api/images/gallery called with search='%s', selected_id=%s, select_id='%s', partial=%s", search, selected_id, select_id, partial)
     query = ImageAsset.query
     if search:
         like = f"%{search}%"
-        print(f"[DEBUG] Filtering with search pattern: {like}")
+        images_log.debug("Filtering with search pattern: %s", like)
         try:
             from sqlalchemy import or_
             query = query.filter(
@@ -787,7 +906,7 @@ def images_gallery_fragment():
         except Exception:
             query = query.filter(ImageAsset.title.like(like))
     images = query.order_by(ImageAsset.created_at.desc()).all()
-    print(f"[DEBUG] Found {len(images)} images after filtering")
+    images_log.debug("Found %s images after filtering", len(images))
     if selected_id:
         images.sort(key=lambda img: 0 if img.id == selected_id else 1)
 
@@ -1034,20 +1153,20 @@ def about_page():
 
 @app.route('/contact', methods=['GET', 'POST'])
 def contact_page():
-    print(f"[CONTACT] Method: {request.method}")
+    contact_log.debug("Method: %s", request.method)
     if request.method == 'POST':
         name = (request.form.get('name') or '').strip()
         email = (request.form.get('email') or '').strip()
         message = (request.form.get('message') or '').strip()
-        print(f"[CONTACT] Received: name='{name}', email='{email}', message='{message[:50]}...'")
+        contact_log.debug("Received: name='%s', email='%s', message='%s...'", name, email, message[:50])
 
         if not name or not email or not message:
-            print(f"[CONTACT] Validation failed: name={bool(name)}, email={bool(email)}, message={bool(message)}")
+            contact_log.warning("Validation failed: name=%s, email=%s, message=%s", bool(name), bool(email), bool(message))
             flash('Tous les champs sont requis.', 'danger')
             return render_template('contact.html')
 
         try:
-            print("[CONTACT] Creating ContactMessage...")
+            contact_log.debug("Creating ContactMessage...")
             # Créer le message de contact
             contact_msg = ContactMessage(
                 visitor_name=name,
@@ -1056,70 +1175,65 @@ def contact_page():
             )
             db.session.add(contact_msg)
             db.session.flush()
-            print(f"[CONTACT] ContactMessage created with id={contact_msg.id}")
+            contact_log.debug("ContactMessage created with id=%s", contact_msg.id)
 
             # Trouver les administrateurs (utilisateurs avec profil "Administrateur")
-            print("[CONTACT] Looking for admin profile...")
+            contact_log.debug("Looking for admin profile...")
             admin_profile = Profile.query.filter_by(name='Administrateur').first()
             admin_users = []
             if admin_profile:
-                print(f"[CONTACT] Found admin profile id={admin_profile.id}")
+                contact_log.debug("Found admin profile id=%s", admin_profile.id)
                 admin_users = User.query.filter_by(profile_id=admin_profile.id, is_active=True).all()
-                print(f"[CONTACT] Found {len(admin_users)} active admin users: {[u.username for u in admin_users]}")
+                contact_log.debug("Found %s active admin users: %s", len(admin_users), [u.username for u in admin_users])
             else:
-                print("[CONTACT] No admin profile found!")
+                contact_log.debug("No admin profile found!")
 
             # Créer une conversation si il y a des admins
             if admin_users:
-                print("[CONTACT] Creating conversation...")
+                contact_log.debug("Creating conversation...")
                 subject = f"Contact: Message de {name}"
                 conv = Conversation(subject=subject, context_type='contact_message', context_id=contact_msg.id)
                 db.session.add(conv)
                 db.session.flush()
-                print(f"[CONTACT] Conversation created with id={conv.id}")
+                contact_log.debug("Conversation created with id=%s", conv.id)
 
                 # Ajouter les participants (admins)
                 for admin in admin_users:
-                    print(f"[CONTACT] Adding participant: {admin.username} (id={admin.id})")
+                    contact_log.debug("Adding participant: %s (id=%s)", admin.username, admin.id)
                     db.session.add(ConversationParticipant(conversation_id=conv.id, user_id=admin.id, last_read_at=None))
 
                 # Message initial
                 content = f"Message de contact de {name} ({email}):\n\n{message}"
-                print("[CONTACT] Creating initial message...")
+                contact_log.debug("Creating initial message...")
                 msg = ConversationMessage(conversation_id=conv.id, sender_id=None, content=content)  # sender_id=None pour les messages système
                 db.session.add(msg)
+                record_new_message(conv.id, None)
 
                 # Lier la conversation au message de contact
                 contact_msg.conversation_id = conv.id
 
-                # Envoyer emails aux admins ayant activé les notifications
+                # Notifier les admins ayant activé les notifications (email immédiat ou résumé)
                 for admin in admin_users:
-                    prefs = admin.get_preferences()
-                    notify = prefs.get('notify_email_on_message', False)
-                    has_email = bool(admin.email)
-                    print(f"[CONTACT] Admin {admin.username}: notify={notify}, has_email={has_email}")
-                    if notify and has_email:
-                        try:
-                            send_email_optional(
-                                to_email=admin.email,
-                                subject=f"Nouveau message de contact: {subject}",
-                                body=f"Un nouveau message de contact a été reçu de {name}.\n\n{message}\n\nAccéder à la conversation: {request.host_url.rstrip('/')}/messages"
-                            )
-                            print(f"[CONTACT] Email sent to {admin.email}")
-                        except Exception as e:
-                            print(f"[CONTACT] Email error for {admin.email}: {e}")
-
-            print("[CONTACT] Committing transaction...")
+                    queued = queue_message_notification(
+                        admin, conv.id, msg,
+                        subject=f"Nouveau message de contact: {subject}",
+                        body=f"Un nouveau message de contact a été reçu de {name}.\n\n{message}\n\nAccéder à la conversation: {request.host_url.rstrip('/')}/messages",
+                        messages_url=f"{request.host_url.rstrip('/')}/messages"
+                    )
+                    contact_log.debug("Admin %s: notification queued=%s", admin.username, queued)
+
+            contact_log.debug("Committing transaction...")
             db.session.commit()
-            print("[CONTACT] Transaction committed successfully")
+            contact_log.debug("Transaction committed successfully")
+            app.extensions['email_outbox'].wake()
+            if admin_users:
+                app.extensions['message_events'].publish_message(conv.id, msg.id, None, [admin.id for admin in admin_users])
             flash('Merci, votre message a été envoyé.', 'success')
             return redirect(url_for('contact_page'))
 
         except Exception as e:
             db.session.rollback()
-            print(f"[CONTACT] Error during contact message creation: {e}")
-            import traceback
-            traceback.print_exc()
+            contact_log.exception("Error during contact message creation: %s", e)
             flash('Une erreur est survenue lors de l\'envoi de votre message.', 'danger')
             return render_template('contact.html')
 
@@ -1213,6 +1327,7 @@ def report_submit():
         content = f"Raison: {reason}\n\n{details}"
         msg = ConversationMessage(conversation_id=conv.id, sender_id=user.id, content=content)
         db.session.add(msg)
+        record_new_message(conv.id, user.id)
         db.session.flush()
 
         # Créer le report et relier la conversation
@@ -1228,23 +1343,20 @@ def report_submit():
         db.session.add(report)
         conv.context_id = report.id
 
-        db.session.commit()
-
-        # Envoi emails (optionnel)
-        # Récupérer préférences des destinataires
+        # Notifications (email ou résumé selon les préférences) dans la même transaction
         if recipient_ids:
             recips = User.query.filter(User.id.in_(list(recipient_ids))).all()
             for r in recips:
-                prefs = r.get_preferences()
-                if prefs.get('notify_email_on_message') and r.email:
-                    try:
-                        send_email_optional(
-                            to_email=r.email,
-                            subject=f"Nouveau message: {subject}",
-                            body=f"Un nouveau signalement a été créé par {user.username}.\n\n{details}\n\nAccéder à la conversation: {request.host_url.rstrip('/')}/messages"
-                        )
-                    except Exception:
-                        pass
+                queue_message_notification(
+                    r, conv.id, msg,
+                    subject=f"Nouveau message: {subject}",
+                    body=f"Un nouveau signalement a été créé par {user.username}.\n\n{details}\n\nAccéder à la conversation: {request.host_url.rstrip('/')}/messages",
+                    messages_url=f"{request.host_url.rstrip('/')}/messages"
+                )
+
+        db.session.commit()
+        app.extensions['email_outbox'].wake()
+        app.extensions['message_events'].publish_message(conv.id, msg.id, user.id, recipient_ids)
 
         html = (
             "<div id='modal-root' class='modal-overlay' style='display:flex'>"
@@ -1280,36 +1392,13 @@ def api_messages_list():
     if not user or not user.password_hash:
         return "<div class='alert alert-warning'>Connectez-vous pour voir vos messages.</div>", 200
 
-    parts = ConversationParticipant.query.filter_by(user_id=user.id).all()
-    # Récupérer conversations et derniers messages
-    items = []
-    for p in parts:
-        conv = Conversation.query.get(p.conversation_id)
-        if not conv:
-            continue
-        last_msg = ConversationMessage.query.filter_by(conversation_id=conv.id).order_by(ConversationMessage.created_at.desc()).first()
-
-        # Calcul des messages non lus (même logique que le widget)
-        if p.last_read_at is None:
-            # Pour les nouveaux participants, compter tous les messages sauf ceux de l'utilisateur
-            unread_count = ConversationMessage.query.filter(
-                ConversationMessage.conversation_id == p.conversation_id,
-                or_(ConversationMessage.sender_id.is_(None), ConversationMessage.sender_id != user.id)
-            ).count()
-        else:
-            # Pour les participants existants, compter les messages après last_read_at
-            unread_count = ConversationMessage.query.filter(
-                ConversationMessage.conversation_id == p.conversation_id,
-                ConversationMessage.created_at > p.last_read_at,
-                or_(ConversationMessage.sender_id.is_(None), ConversationMessage.sender_id != user.id)
-            ).count()
-
-        items.append((conv, last_msg, unread_count))
-
-    # Trier par date du dernier message descendant (plus récent en premier)
-    items.sort(key=lambda x: x[1].created_at if x[1] else datetime.min, reverse=True)
-
-    return render_template('partials/messages_list.html', items=items)
+    # Une requête groupée par page (dernier message, non lus), triée par dernière activité
+    cursor = (request.args.get('cursor') or '').strip() or None
+    items, next_cursor = fetch_inbox(user.id, limit=app.config.get('MESSAGES_PAGE_SIZE') or 30, cursor=cursor)
+    if cursor:
+        # Page suivante: seulement les lignes, ajoutées à la liste existante
+        return render_template('partials/messages_list_items.html', items=items, next_cursor=next_cursor)
+    return render_template('partials/messages_list.html', items=items, next_cursor=next_cursor)
 
 
 @app.route('/api/messages/thread/<int:conv_id>')
@@ -1326,20 +1415,110 @@ def api_messages_thread(conv_id: int):
     if not conv:
         return "<div class='alert alert-danger'>Conversation introuvable.</div>", 200
 
-    print(f"[THREAD] Loading thread {conv_id} for user {user.username}, last_read_at was: {part.last_read_at}")
+    # Messages précédents (défilement vers le haut): seulement la page demandée
+    page_size = app.config.get('MESSAGES_THREAD_PAGE_SIZE') or 50
+    before = (request.args.get('before') or '').strip() or None
+    if before:
+        messages, older_cursor = fetch_thread_page(conv.id, limit=page_size, before=before)
+        return render_template('partials/conversation_messages_page.html', conversation=conv, messages=messages, older_cursor=older_cursor)
+
+    conversation_log.debug("Loading thread %s for user %s, last_read_at was: %s", conv_id, user.username, part.last_read_at)
 
     # Marquer comme lu
     try:
         old_last_read = part.last_read_at
-        part.last_read_at = datetime.utcnow()
+        mark_read(part)
+        db.session.commit()
+        conversation_log.debug("Updated last_read_at from %s to %s", old_last_read, part.last_read_at)
+    except Exception as e:
+        db.session.rollback()
+        conversation_log.warning("Error updating last_read_at: %s", e)
+
+    # Dernière page du fil (pagination par curseur sur la date et l'id des messages)
+    messages, older_cursor = fetch_thread_page(conv.id, limit=page_size)
+    return render_template('partials/conversation_thread.html', conversation=conv, messages=messages, older_cursor=older_cursor, me=user)
+
+
+@app.route('/api/messages/thread/<int:conv_id>/message/<int:msg_id>')
+def api_messages_thread_message(conv_id: int, msg_id: int):
+    """Un seul message, ajouté au fil ouvert à la réception d'un événement (voir /api/messages/events)."""
+    user = getattr(g, 'current_user', None)
+    if not user or not user.password_hash:
+        return "", 403
+
+    part = ConversationParticipant.query.filter_by(conversation_id=conv_id, user_id=user.id).first()
+    if not part:
+        return "", 403
+    msg = ConversationMessage.query.filter_by(id=msg_id, conversation_id=conv_id).first()
+    if not msg:
+        return "", 404
+
+    # Le fil est affiché: le message est lu
+    try:
+        mark_read(part)
         db.session.commit()
-        print(f"[THREAD] Updated last_read_at from {old_last_read} to {part.last_read_at}")
     except Exception as e:
         db.session.rollback()
-        print(f"[THREAD] Error updating last_read_at: {e}")
+        conversation_log.warning("Error updating last_read_at: %s", e)
 
-    messages = ConversationMessage.query.filter_by(conversation_id=conv.id).order_by(ConversationMessage.created_at.asc()).all()
-    return render_template('partials/conversation_thread.html', conversation=conv, messages=messages, me=user)
+    resp = make_response(render_template('partials/conversation_message.html', m=msg))
+    # Nouveau total pour le badge du widget
+    resp.headers['HX-Trigger'] = json.dumps({'messages-unread': {'unread': total_unread(user.id)}})
+    return resp
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/messages/events')
+def api_messages_events():
+    """Flux server-sent events des nouveaux messages de l'utilisateur (et total des non lus)."""
+    user = getattr(g, 'current_user', None)
+    if not app.config.get('MESSAGE_EVENTS_ENABLED') or not user or not user.password_hash:
+        # 204: EventSource ne se reconnecte pas (désactivé: serveur sans threads, voir config.py)
+        return "", 204
+
+    user_id = user.id
+    unread = total_unread(user_id)
+    broker = app.extensions['message_events']
+    max_seconds = app.config.get('MESSAGE_EVENTS_MAX_SECONDS') or 300
+    keepalive = app.config.get('MESSAGE_EVENTS_KEEPALIVE_SECONDS') or 15
+    subscription = broker.subscribe(user_id)
+
+    def stream():
+        # Exécuté après la fin de la requête: chaque lecture en base ouvre son propre contexte
+        try:
+            yield "retry: 5000\n\n"
+            yield _sse_event('unread', {'unread': unread})
+            deadline = time.monotonic() + max_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                event = subscription.get(timeout=min(keepalive, remaining))
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if event['type'] == 'resync':
+                    yield _sse_event('resync', {})
+                    continue
+                with app.app_context():
+                    event_unread = total_unread(user_id)
+                yield _sse_event('message', {
+                    'conversation_id': event['conversation_id'],
+                    'message_id': event['message_id'],
+                    'sender_id': event['sender_id'],
+                    'unread': event_unread,
+                })
+        finally:
+            broker.unsubscribe(subscription)
+
+    resp = Response(stream(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
 
 
 @app.route('/api/messages/mark-unread/<int:conv_id>', methods=['POST'])
@@ -1353,14 +1532,14 @@ def api_messages_mark_unread(conv_id: int):
         return "Access denied", 403
 
     try:
-        print(f"[MARK_UNREAD] User {user.username} marking conversation {conv_id} as unread")
-        part.last_read_at = None  # Remettre à None pour marquer comme non lu
+        conversation_log.debug("User %s marking conversation %s as unread", user.username, conv_id)
+        mark_unread(part)  # last_read_at à None, tous les messages des autres redeviennent non lus
         db.session.commit()
-        print(f"[MARK_UNREAD] Successfully marked conversation {conv_id} as unread for user {user.username}")
+        conversation_log.debug("Successfully marked conversation %s as unread for user %s", conv_id, user.username)
         return "", 200  # HTMX ne fait rien avec le contenu, juste le statut
     except Exception as e:
         db.session.rollback()
-        print(f"[MARK_UNREAD] Error marking as unread: {e}")
+        conversation_log.warning("Error marking as unread: %s", e)
         return "Error", 500
 
 
@@ -1377,7 +1556,7 @@ def api_messages_delete(conv_id: int):
         return render_template('messages_content.html')
 
     try:
-        print(f"[DELETE_CONV] User {user.username} deleting conversation {conv_id}")
+        conversation_log.debug("User %s deleting conversation %s", user.username, conv_id)
 
         # Supprimer la participation de l'utilisateur
         db.session.delete(part)
@@ -1387,9 +1566,10 @@ def api_messages_delete(conv_id: int):
 
         if remaining_parts == 0:
             # Plus de participants, supprimer complètement la conversation et ses messages
-            print(f"[DELETE_CONV] No more participants, deleting conversation {conv_id} completely")
+            conversation_log.debug("No more participants, deleting conversation %s completely", conv_id)
 
-            # Supprimer les messages
+            # Supprimer les messages (et leurs notifications en attente de résumé)
+            PendingNotification.query.filter_by(conversation_id=conv_id).delete()
             ConversationMessage.query.filter_by(conversation_id=conv_id).delete()
 
             # Supprimer les rapports/questions liés si c'est un signalement
@@ -1402,10 +1582,10 @@ def api_messages_delete(conv_id: int):
             # Supprimer la conversation
             db.session.delete(conv)
         else:
-            print(f"[DELETE_CONV] {remaining_parts} participants remaining, keeping conversation {conv_id}")
+            conversation_log.debug("%s participants remaining, keeping conversation %s", remaining_parts, conv_id)
 
         db.session.commit()
-        print(f"[DELETE_CONV] Successfully deleted conversation {conv_id} for user {user.username}")
+        conversation_log.debug("Successfully deleted conversation %s for user %s", conv_id, user.username)
 
         # Retourner directement le HTML de la page messages rechargée avec un message de succès
         flash("Conversation supprimée de votre boîte de réception.", "success")
@@ -1413,7 +1593,7 @@ def api_messages_delete(conv_id: int):
 
     except Exception as e:
         db.session.rollback()
-        print(f"[DELETE_CONV] Error deleting conversation: {e}")
+        conversation_log.warning("Error deleting conversation: %s", e)
         flash("Erreur lors de la suppression de la conversation.", "danger")
         return render_template('messages_content.html')
 
@@ -1437,29 +1617,26 @@ def api_messages_send():
     try:
         msg = ConversationMessage(conversation_id=conv_id, sender_id=user.id, content=content)
         db.session.add(msg)
-        db.session.commit()
+        record_new_message(conv_id, user.id)
 
-        # Notifier les autres participants
+        # Notifier les autres participants (email ou résumé selon leurs préférences, dans la même transaction)
         other_parts = ConversationParticipant.query.filter(ConversationParticipant.conversation_id == conv_id, ConversationParticipant.user_id != user.id).all()
         if other_parts:
             recipients = User.query.filter(User.id.in_([p.user_id for p in other_parts])).all()
             conv = Conversation.query.get(conv_id)
             for r in recipients:
-                prefs = r.get_preferences()
-                if prefs.get('notify_email_on_message') and r.email:
-                    try:
-                        send_email_optional(
-                            to_email=r.email,
-                            subject=f"Nouveau message: {conv.subject or 'Conversation'}",
-                            body=f"{user.username} a envoyé un nouveau message.\n\n{content}\n\nAccéder à la conversation: {request.host_url.rstrip('/')}/messages"
-                        )
-                    except Exception:
-                        pass
+                queue_message_notification(
+                    r, conv_id, msg,
+                    subject=f"Nouveau message: {conv.subject or 'Conversation'}",
+                    body=f"{user.username} a envoyé un nouveau message.\n\n{content}\n\nAccéder à la conversation: {request.host_url.rstrip('/')}/messages",
+                    messages_url=f"{request.host_url.rstrip('/')}/messages"
+                )
+        db.session.commit()
+        app.extensions['email_outbox'].wake()
+        app.extensions['message_events'].publish_message(conv_id, msg.id, user.id, [p.user_id for p in other_parts])
 
-        # Réafficher le fil
-        messages = ConversationMessage.query.filter_by(conversation_id=conv_id).order_by(ConversationMessage.created_at.asc()).all()
-        conv = Conversation.query.get(conv_id)
-        return render_template('partials/conversation_thread.html', conversation=conv, messages=messages, me=user)
+        # Seulement le nouveau message, ajouté en bas du fil affiché
+        return render_template('partials/conversation_message.html', m=msg)
     except Exception as e:
         db.session.rollback()
         return f"<div class='alert alert-danger'>Erreur lors de l'envoi: {str(e)}</div>", 200
@@ -1969,7 +2146,7 @@ def get_question_detail(question_id):
         return question.to_dict()
     
     except Exception as e:
-        print(f"Erreur lors de la récupération de la question {question_id}: {e}")
+        log.error("Erreur lors de la récupération de la question %s: %s", question_id, e)
         return {'error': str(e)}, 500
 
 
@@ -3039,29 +3216,19 @@ def play_quiz_with_rules(slug: str):
     """Redirige vers la page de jeu avec un set de règles prédéfini."""
     return redirect(f'/play?rule_set={slug}')
 
+# Mode sans fin: état de quiz dédié (un slug de set ne peut pas contenir '~') et filtres reconnus
+ENDLESS_STATE_SLUG = '~endless'
+ENDLESS_FILTER_PARAMS = ('broad_theme_id', 'specific_theme_id', 'country_id', 'difficulty_level')
+
+
 def _apply_quiz_filters(query, params):
     """Appliquer les filtres du quiz (thèmes, pays, difficulté) au query de base."""
     rule_set_slug = (params.get('rule_set') or '').strip()
     if rule_set_slug:
         # Appliquer les règles du set
-        rule_set = QuizRuleSet.query.filter_by(slug=rule_set_slug, is_active=True).first()
+        rule_set = get_compiled_rule_set(rule_set_slug)
         if rule_set:
-            # Difficultés autorisées
-            allowed_diffs = rule_set.get_allowed_difficulties()
-            if allowed_diffs:
-                query = query.filter(Question.difficulty_level.in_(allowed_diffs))
-
-            # Thèmes larges
-            if not rule_set.use_all_broad_themes and rule_set.allowed_broad_themes:
-                theme_ids = [t.id for t in rule_set.allowed_broad_themes]
-                query = query.filter(Question.broad_theme_id.in_(theme_ids))
-
-            # Sous-thèmes
-            if not rule_set.use_all_specific_themes and rule_set.allowed_specific_themes:
-                sub_theme_ids = [st.id for st in rule_set.allowed_specific_themes]
-                query = query.filter(Question.specific_theme_id.in_(sub_theme_ids))
-
-            # Note: pas de filtre pays pour l'instant dans les sets de règles
+            query = apply_rule_set_filters(query, rule_set)
     else:
         # Mode manuel - appliquer les filtres classiques
         broad_theme_id = (params.get('broad_theme_id') or '').strip()
@@ -3105,182 +3272,100 @@ def _interleave_round_robin(lists_by_difficulty):
     return result
 
 
-def _quiz_session_keys(rule_set_slug: str):
-    """Construit des clés de session isolées par utilisateur et par set.
-    Retourne (playlist_key, index_key, score_key, correct_key, breakdown_key, streak_key, perfect_key, user_id_str)
+def _quiz_state_key(rule_set_slug: str):
+    """Construit la clé d'état de quiz isolée par utilisateur et par set.
+    Retourne (state_key, user_id_str)
     """
     user_id_str = str(g.current_user.id) if getattr(g, 'current_user', None) else 'anon'
-    prefix = f"{user_id_str}:{rule_set_slug}"
-    playlist_key = f"quiz_playlist:{prefix}"
-    index_key = f"quiz_playlist_index:{prefix}"
-    score_key = f"quiz_score:{prefix}"
-    correct_key = f"quiz_correct_answers:{prefix}"
-    breakdown_key = f"quiz_score_breakdown:{prefix}"
-    streak_key = f"quiz_combo_streak:{prefix}"
-    perfect_key = f"quiz_perfect_awarded:{prefix}"
-    return playlist_key, index_key, score_key, correct_key, breakdown_key, streak_key, perfect_key, user_id_str
-
-
-def _append_score_breakdown(breakdown_key: str, event: dict):
-    """Ajoute un événement de score dans la liste stockée en session."""
+    return f"{user_id_str}:{rule_set_slug}", user_id_str
+
+
+def _quiz_sid() -> str:
+    """Identifiant opaque de l'état de quiz, seule donnée de quiz conservée dans le cookie."""
+    sid = session.get('quiz_sid')
+    if not sid:
+        sid = uuid.uuid4().hex
+        session['quiz_sid'] = sid
+    return sid
+
+
+def _answer_order(question, shuffle_nonce: str = '', sid: str | None = None) -> list[int]:
+    """Ordre d'affichage des réponses (indices d'origine, 0-based) pour ce joueur et cette partie.
+
+    Dérivé d'un HMAC (SECRET_KEY, identifiant de quiz, graine de la partie, question):
+    /api/quiz/next et /api/quiz/answer le recalculent, rien n'est stocké par question.
+    """
+    num_answers = len(question.answers)
+    order = list(range(num_answers))
+    correct = question.correct_answer
+    if not correct.isdigit() or not 1 <= int(correct) <= num_answers:
+        shuffle_log.warning("Question %s has invalid correct_answer: %s (should be 1-%s), skipping shuffle", question.id, correct, num_answers)
+        return order
+    digest = hmac.new(
+        app.config['SECRET_KEY'].encode(),
+        f"{sid or _quiz_sid()}:{shuffle_nonce}:{question.id}".encode(),
+        hashlib.sha256
+    ).digest()
+    random.Random(digest).shuffle(order)
+    return order
+
+
+def _new_quiz_state(playlist: list[int]) -> dict:
+    return {
+        'playlist': playlist,
+        'index': 0,
+        'score': 0,
+        'correct': 0,
+        'breakdown': [],
+        'streak': 0,
+        'perfect': False,
+        'session_id': None,
+        # Graine du mélange des réponses propre à cette partie (voir _answer_order)
+        'shuffle_nonce': uuid.uuid4().hex if playlist else '',
+    }
+
+
+def _load_quiz_state(rule_set_slug: str) -> dict:
+    """Charge l'état de la partie en cours pour ce set (état vide si absent ou expiré)."""
+    state_key, _ = _quiz_state_key(rule_set_slug)
+    sid = session.get('quiz_sid')
+    state = None
+    if sid:
+        try:
+            state = app.extensions['quiz_state_store'].get(sid, state_key)
+        except Exception as exc:
+            quiz_state_log.warning("Lecture impossible: %s", exc)
+    return state or _new_quiz_state([])
+
+
+def _save_quiz_state(rule_set_slug: str, state: dict):
+    state_key, _ = _quiz_state_key(rule_set_slug)
     try:
-        history = session.get(breakdown_key)
-        if not isinstance(history, list):
-            history = []
-        history.append(event)
-        session[breakdown_key] = history
+        app.extensions['quiz_state_store'].set(_quiz_sid(), state_key, state)
     except Exception as exc:
-        print(f"[QUIZ SCORE] Impossible d'ajouter le breakdown: {exc}")
+        quiz_state_log.warning("Écriture impossible: %s", exc)
 
 
-def _get_user_answered_keywords(user_id: int) -> set[int]:
-    """Récupère les IDs de tous les keywords déjà répondus par l'utilisateur."""
-    if not user_id:
-        return set()
-    
+def _remember_quick_double_click(value: bool):
+    """Mémorise l'option double-clic en session sans réécrire le cookie si elle n'a pas changé."""
+    if session.get('quick_double_click_enabled') != value:
+        session['quick_double_click_enabled'] = value
+
+
+def _append_score_breakdown(quiz_state: dict, event: dict):
+    """Ajoute un événement de score dans le détail conservé dans l'état de quiz."""
     try:
-        # Récupérer toutes les questions déjà répondues
-        answered_question_ids = {row.question_id for row in 
-                                 UserQuestionStat.query.with_entities(UserQuestionStat.question_id)
-                                 .filter_by(user_id=user_id).all()}
-        
-        if not answered_question_ids:
-            return set()
-        
-        # Récupérer les keywords de ces questions
-        from sqlalchemy import select
-        keyword_ids = set()
-        result = db.session.execute(
-            select(db.literal_column('keyword_id'))
-            .select_from(db.text('question_keywords'))
-            .where(db.literal_column('question_id').in_(answered_question_ids))
-        )
-        keyword_ids = {row[0] for row in result}
-        return keyword_ids
-    except Exception as e:
-        print(f"[KEYWORDS] Erreur lors de la récupération des keywords répondus: {e}")
-        return set()
-
-
-def _select_questions_with_keyword_logic(
-    candidate_ids: list[int],
-    seen_question_ids: set[int],
-    used_keywords: set[int],
-    answered_keywords: set[int],
-    prevent_duplicate_keywords: bool,
-    quota: int
-) -> tuple[list[int], set[int], dict[str, any]]:
-    """
-    Sélectionne les questions en respectant la logique des keywords.
-    
-    Priorités (par ordre d'importance):
-    1. Condition QuizRuleSet (ABSOLU) - déjà appliqué dans candidate_ids
-    2. Pas de doublons de keywords dans le quiz (si prevent_duplicate_keywords)
-    3. Pas de questions déjà répondues
-    4. Pas de keywords déjà répondus
-    
-    Retourne: (selected_ids, used_keywords_updated, stats)
-    """
-    if not candidate_ids or quota <= 0:
-        return [], used_keywords, {'perfect': True, 'conditions_met': []}
-    
-    # Charger toutes les questions candidates avec leurs keywords
-    candidates = Question.query.filter(Question.id.in_(candidate_ids)).options(
-        db.joinedload(Question.keywords)
-    ).all()
-    
-    # Stats pour le debug
-    stats = {
-        'perfect': True,
-        'total_candidates': len(candidates),
-        'conditions_met': [],
-        'fallback_used': []
-    }
-    
-    selected_ids = []
-    current_used_keywords = set(used_keywords)
-    
-    # Fonction pour scorer une question selon les priorités
-    def score_question(q: Question) -> tuple:
-        """Retourne un tuple de score (plus élevé = meilleur). Format: (prio1, prio2, prio3, prio4)"""
-        q_keywords = {kw.id for kw in q.keywords}
-        
-        # Priorité 1: Pas de doublons de keywords (si activé)
-        if prevent_duplicate_keywords and q_keywords:
-            has_duplicate_keyword = bool(q_keywords & current_used_keywords)
-        else:
-            has_duplicate_keyword = False
-        
-        # Priorité 2: Question non répondue
-        is_unseen = q.id not in seen_question_ids
-        
-        # Priorité 3: Keywords non répondus
-        if q_keywords and answered_keywords:
-            has_unanswered_keywords = bool(q_keywords & answered_keywords)
-        else:
-            has_unanswered_keywords = False
-        
-        # Questions sans keywords ont un bonus (pas de risque de doublon)
-        no_keywords = len(q_keywords) == 0
-        
-        # Retourner score (format: pas de doublon keyword, non vue, pas keyword répondu, sans keyword)
-        return (
-            not has_duplicate_keyword,  # Vrai = 1, Faux = 0 (on veut True en premier)
-            is_unseen,
-            not has_unanswered_keywords,
-            no_keywords
-        )
-    
-    # Trier les candidats par score (du meilleur au pire)
-    sorted_candidates = sorted(candidates, key=score_question, reverse=True)
-    
-    # Sélectionner jusqu'au quota
-    for q in sorted_candidates:
-        if len(selected_ids) >= quota:
-            break
-        
-        q_keywords = {kw.id for kw in q.keywords}
-        
-        # Vérifier si on respecte toutes les conditions
-        conditions_perfect = True
-        
-        # Condition 2: Pas de doublons de keywords
-        if prevent_duplicate_keywords and q_keywords and (q_keywords & current_used_keywords):
-            conditions_perfect = False
-            stats['fallback_used'].append('keyword_duplicate')
-        
-        # Condition 3: Question non répondue
-        if q.id in seen_question_ids:
-            conditions_perfect = False
-            stats['fallback_used'].append('question_already_seen')
-        
-        # Condition 4: Keywords non répondus
-        if q_keywords and answered_keywords and (q_keywords & answered_keywords):
-            conditions_perfect = False
-            stats['fallback_used'].append('keyword_already_answered')
-        
-        if not conditions_perfect:
-            stats['perfect'] = False
-        
-        selected_ids.append(q.id)
-        current_used_keywords.update(q_keywords)
-    
-    # Statistiques finales
-    if stats['perfect']:
-        stats['conditions_met'] = ['Toutes les conditions respectées ✅']
-    else:
-        fallback_counts = {}
-        for fb in stats['fallback_used']:
-            fallback_counts[fb] = fallback_counts.get(fb, 0) + 1
-        stats['conditions_met'] = [
-            f"⚠️ {count}x {reason.replace('_', ' ')}" 
-            for reason, count in fallback_counts.items()
-        ]
-    
-    return selected_ids, current_used_keywords, stats
+        history = quiz_state.get('breakdown')
+        if not isinstance(history, list):
+            history = []
+        history.append(event)
+        quiz_state['breakdown'] = history
+    except Exception as exc:
+        score_log.warning("Impossible d'ajouter le breakdown: %s", exc)
 
 
-def _generate_quiz_playlist(rule_set: QuizRuleSet, current_user_id: int | None) -> list[int]:
+def _generate_quiz_playlist(rule_set: CompiledRuleSet | QuizRuleSet, current_user_id: int | None,
+                            history: tuple[frozenset[int], frozenset[int]] | None = None) -> list[int]:
     """
     Génère la playlist (liste d'IDs de questions) pour un quiz à longueur fixe.
     
@@ -3292,150 +3377,54 @@ def _generate_quiz_playlist(rule_set: QuizRuleSet, current_user_id: int | None)
     
     En mode 'manual': réordonne la liste sélectionnée en appliquant la logique keywords.
     En mode 'auto': respecte les quotas par difficulté avec gestion keywords.
+
+    `history`: (questions vues, keywords répondus) déjà lus par l'appelant (pré-génération),
+    pour que la playlist corresponde exactement à l'historique qu'il conserve.
     """
     try:
-        print(f"\n[QUIZ PLAYLIST] === Génération playlist pour {rule_set.name} ===")
-        
+        rule_set = compile_rule_set(rule_set)
+
         # Récupérer les IDs déjà vus par l'utilisateur (si connecté)
         seen_ids = set()
         answered_keywords = set()
         if current_user_id:
-            seen_ids = {row.question_id for row in 
-                       UserQuestionStat.query.with_entities(UserQuestionStat.question_id)
-                       .filter_by(user_id=current_user_id).all()}
-            answered_keywords = _get_user_answered_keywords(current_user_id)
-            print(f"[QUIZ PLAYLIST] Utilisateur {current_user_id}: {len(seen_ids)} questions vues, {len(answered_keywords)} keywords répondus")
-        
-        prevent_duplicate_keywords = rule_set.prevent_duplicate_keywords
-        print(f"[QUIZ PLAYLIST] Prévention doublons keywords: {'OUI' if prevent_duplicate_keywords else 'NON'}")
-
-        # Mode manuel: partir de la sélection explicite
-        if rule_set.question_selection_mode == 'manual' and rule_set.selected_questions:
-            print(f"[QUIZ PLAYLIST] Mode MANUEL: {len(rule_set.selected_questions)} questions sélectionnées")
-            selected = [q for q in rule_set.selected_questions if q.is_published]
-            candidate_ids = [q.id for q in selected]
-            
-            # Appliquer la logique keywords sur toute la sélection
-            playlist, _, stats = _select_questions_with_keyword_logic(
-                candidate_ids=candidate_ids,
-                seen_question_ids=seen_ids,
-                used_keywords=set(),
-                answered_keywords=answered_keywords,
-                prevent_duplicate_keywords=prevent_duplicate_keywords,
-                quota=len(candidate_ids)
-            )
-            
-            # Logs
-            if stats['perfect']:
-                print(f"[QUIZ PLAYLIST] ✅ CONDITIONS PARFAITES: {', '.join(stats['conditions_met'])}")
-            else:
-                print(f"[QUIZ PLAYLIST] ⚠️ COMPROMIS NÉCESSAIRES:")
-                for condition in stats['conditions_met']:
-                    print(f"[QUIZ PLAYLIST]    {condition}")
-            
-            print(f"[QUIZ PLAYLIST] Playlist générée: {len(playlist)} questions")
-            return playlist
-
-        # Mode auto: quotas par difficulté et filtres de thèmes
-        qmap = rule_set.get_questions_per_difficulty() or {}
-        allowed_diffs = rule_set.get_allowed_difficulties() or [1, 2, 3, 4, 5]
-        print(f"[QUIZ PLAYLIST] Mode AUTO: difficultés {allowed_diffs}, quotas {qmap}")
-        order_mode = getattr(rule_set, 'question_order_mode', 'difficulty_ascending') or 'difficulty_ascending'
-        if order_mode not in ['difficulty_ascending', 'full_shuffle']:
-            order_mode = 'difficulty_ascending'
-        print(f"[QUIZ PLAYLIST] Ordre des questions: {order_mode}")
-
-        # Construire la requête de base selon le set de règles
-        base_params = {'rule_set': rule_set.slug}
-        base_query = _apply_quiz_filters(Question.query.filter(Question.is_published.is_(True)), base_params)
-
-        # Préparer par difficulté avec logique keywords
-        per_diff_ids: dict[int, list[int]] = {}
-        used_keywords_global = set()
-        all_stats = []
-        
-        for d in allowed_diffs:
-            quota = int(qmap.get(str(d), 0) or 0)
-            if quota <= 0:
-                per_diff_ids[d] = []
-                continue
-
-            print(f"[QUIZ PLAYLIST] Difficulté {d}: quota={quota}")
-            
-            q_for_diff = base_query.filter(Question.difficulty_level == d)
-            candidates = q_for_diff.with_entities(Question.id).all()
-            candidate_ids = [row.id for row in candidates]
-            
-            print(f"[QUIZ PLAYLIST]   Candidats disponibles: {len(candidate_ids)}")
-            
-            # Appliquer la logique keywords
-            chosen, used_keywords_global, stats = _select_questions_with_keyword_logic(
-                candidate_ids=candidate_ids,
-                seen_question_ids=seen_ids,
-                used_keywords=used_keywords_global,
-                answered_keywords=answered_keywords,
-                prevent_duplicate_keywords=prevent_duplicate_keywords,
-                quota=quota
-            )
-            
-            per_diff_ids[d] = chosen
-            all_stats.append({
-                'difficulty': d,
-                'quota': quota,
-                'selected': len(chosen),
-                'perfect': stats['perfect'],
-                'conditions': stats['conditions_met']
-            })
-            
-            print(f"[QUIZ PLAYLIST]   Sélectionnés: {len(chosen)}/{quota}")
-            if not stats['perfect']:
-                for condition in stats['conditions_met']:
-                    print(f"[QUIZ PLAYLIST]     {condition}")
-
-        # Construire la playlist selon le mode d'ordre choisi
-        if order_mode == 'full_shuffle':
-            playlist = []
-            for diff in per_diff_ids:
-                playlist.extend(per_diff_ids[diff])
-            random.shuffle(playlist)
-        else:
-            playlist = []
-            for diff in sorted(per_diff_ids.keys()):
-                bucket = list(per_diff_ids.get(diff) or [])
-                if len(bucket) > 1:
-                    random.shuffle(bucket)
-                playlist.extend(bucket)
-
-        expected_total = sum(int(qmap.get(str(d), 0) or 0) for d in allowed_diffs)
-        
-        # Logs finaux
-        print(f"\n[QUIZ PLAYLIST] === RÉSUMÉ FINAL ===")
-        print(f"[QUIZ PLAYLIST] Playlist générée: {len(playlist)}/{expected_total} questions")
-        
-        # Vérifier si toutes les conditions sont parfaites
-        all_perfect = all(stat['perfect'] for stat in all_stats)
-        if all_perfect:
-            print(f"[QUIZ PLAYLIST] ✅ CONDITIONS PARFAITES pour toutes les questions !")
-        else:
-            print(f"[QUIZ PLAYLIST] ⚠️ COMPROMIS NÉCESSAIRES:")
-            for stat in all_stats:
-                if not stat['perfect']:
-                    print(f"[QUIZ PLAYLIST]   Difficulté {stat['difficulty']}: {', '.join(stat['conditions'])}")
-        
-        if len(playlist) < expected_total:
-            print(f"[QUIZ PLAYLIST] ⚠️ Playlist incomplète. Pool insuffisant pour certains quotas.")
-        
-        print(f"[QUIZ PLAYLIST] Keywords uniques utilisés: {len(used_keywords_global)}")
-        print(f"[QUIZ PLAYLIST] ==================\n")
-
+            # Une ligne d'historique (ou le cache) au lieu de parcourir toutes les réponses
+            seen_ids, answered_keywords = history if history is not None else get_user_history(current_user_id)
+
+        # Sélection sur le pool en cache du set (quiz_playlist, aussi utilisé par le simulateur)
+        playlist, report = build_playlist(rule_set, seen_ids, answered_keywords)
+
+        perfect = all(group['stats']['perfect'] for group in report['groups'])
+        if len(playlist) < report['expected_total']:
+            playlist_log.warning("Playlist incomplète pour %s: %s/%s questions (pool insuffisant)",
+                                 rule_set.slug, len(playlist), report['expected_total'])
+        if playlist_log.isEnabledFor(logging.DEBUG):
+            _log_playlist_report(rule_set, current_user_id, seen_ids, answered_keywords, playlist, report, perfect)
         return playlist
     except Exception as e:
-        print(f"[QUIZ PLAYLIST] ❌ ERREUR génération playlist: {e}")
-        import traceback
-        traceback.print_exc()
+        playlist_log.exception("Erreur génération playlist: %s", e)
         return []
 
 
+def _log_playlist_report(rule_set, current_user_id, seen_ids, answered_keywords, playlist, report, perfect):
+    """Détail de la génération d'une playlist (niveau DEBUG de quiz.playlist)."""
+    playlist_log.debug(
+        "Playlist %s pour %s: %s/%s questions", 'manuelle' if report['manual'] else 'auto', rule_set.slug,
+        len(playlist), report['expected_total'],
+        extra={'user_id': current_user_id, 'seen': len(seen_ids), 'answered_keywords': len(answered_keywords),
+               'prevent_duplicate_keywords': rule_set.prevent_duplicate_keywords, 'order_mode': report['order_mode'],
+               'used_keywords': report['used_keywords'], 'perfect': perfect},
+    )
+    for group in report['groups']:
+        stats = group['stats']
+        playlist_log.debug(
+            "Difficulté %s: quota=%s, candidats disponibles: %s, sélectionnés: %s%s",
+            group['difficulty'] if group['difficulty'] is not None else 'sélection manuelle',
+            group['quota'], stats['total_candidates'], group['selected'],
+            '' if stats['perfect'] else ' (' + ', '.join(stats['conditions_met']) + ')',
+        )
+
+
 def _get_user_double_click_preference() -> bool:
     try:
         if getattr(g, 'current_user', None):
@@ -3447,6 +3436,15 @@ def _get_user_double_click_preference() -> bool:
     return True
 
 
+def _schedule_warm_playlist(rule_set: QuizRuleSet):
+    """Prépare en arrière-plan la playlist du bouton "Démarrer" pour ce set."""
+    warm_pool = app.extensions['quiz_warm_pool']
+    if getattr(g, 'current_user', None):
+        warm_pool.schedule_user(rule_set.id, g.current_user.id)
+    else:
+        warm_pool.schedule_anonymous(rule_set.id)
+
+
 @app.route('/play')
 def play_quiz():
     """Page pour choisir un set de règles et jouer au quiz."""
@@ -3462,7 +3460,7 @@ def play_quiz():
             try:
                 in_prog = UserQuizSession.query.filter_by(user_id=g.current_user.id, status='in_progress').all()
                 for s in in_prog:
-                    print(f"[QUIZ SESSION] Abandon session {s.id} while entering /play without specific rule_set (user={s.user_id})")
+                    session_log.info("Abandon session %s while entering /play without specific rule_set (user=%s)", s.id, s.user_id)
                     s.status = 'abandoned'
                     s.updated_at = datetime.utcnow()
                 if in_prog:
@@ -3480,6 +3478,9 @@ def play_quiz():
         quick_double_click_enabled = quick_double_click_pref
         session['quick_double_click_enabled'] = quick_double_click_enabled
 
+    if rule_set:
+        _schedule_warm_playlist(rule_set)
+
     return render_template('play.html',
                            rule_sets=rule_sets,
                            rule_set=rule_set,
@@ -3511,6 +3512,8 @@ def play_quiz_by_slug(slug):
     
     # Auto-démarrage activé par défaut pour cette route
     auto_start = True
+
+    _schedule_warm_playlist(rule_set)
     
     return render_template('play.html',
                            rule_sets=rule_sets,
@@ -3519,6 +3522,132 @@ def play_quiz_by_slug(slug):
                            auto_start=auto_start)
 
 
+def _quiz_player_overlay(rule_set, history: str, current_question_num: int, total_questions: int,
+                         total_score: int, quick_double_click: bool) -> dict:
+    """Valeurs propres au joueur injectées dans les fragments de question/résultat."""
+    user = getattr(g, 'current_user', None)
+    double_click_preference = bool(user.get_preferences().get('double_click_validation', False)) if user else False
+    progress_percent = (current_question_num / total_questions * 100) if total_questions > 0 else 0
+    return {
+        'history': history or '',
+        'current_question_num': current_question_num,
+        'total_questions': total_questions,
+        'total_score': total_score,
+        'progress_percent': progress_percent,
+        'quick_double_click_value': 'true' if (quick_double_click or double_click_preference) else 'false',
+        'double_click_preference_json': Markup('true' if double_click_preference else 'false'),
+        'quick_double_click_json': Markup('true' if quick_double_click else 'false'),
+    }
+
+
+def _can_report_question() -> bool:
+    user = getattr(g, 'current_user', None)
+    return bool(user and user.password_hash)
+
+
+def _render_quiz_question(question, rule_set, answer_order, overlay: dict) -> str:
+    """Rend une question depuis le cache de fragments (ordre des réponses 0-based dans `answer_order`)."""
+    fragments = app.extensions['quiz_fragments']
+    version = catalog_version()
+    choices = fragments.get_or_build(
+        ('quiz_answer_choices', question.id, version),
+        lambda: tuple(
+            compile_fragment('partials/quiz_answer_choice.html', ('position',), answer=answer,
+                             answer_image=question.answer_image_by_index.get(index))
+            for index, answer in enumerate(question.answers, start=1)
+        )
+    )
+    can_report = _can_report_question()
+    page = fragments.get_or_build(
+        ('quiz_question', question.id, version, rule_set.id if rule_set else None, can_report),
+        lambda: compile_fragment('quiz_question.html', tuple(overlay) + ('answer_choices',),
+                                 question=question, rule_set=rule_set, can_report=can_report)
+    )
+    answer_choices = Markup(''.join(
+        choices[original].render(position=position)
+        for position, original in enumerate(answer_order, start=1)
+    ))
+    return page.render(answer_choices=answer_choices, **overlay)
+
+
+def _render_quiz_result(question, rule_set, selected: str, is_correct: bool, is_timeout: bool,
+                        score: int, combo_bonus: int, combo_streak: int,
+                        times_answered: int, success_rate: float, overlay: dict,
+                        embedded_next: Markup = Markup('')) -> str:
+    """Rend le résultat d'une réponse depuis le cache de fragments."""
+    fragments = app.extensions['quiz_fragments']
+    version = catalog_version()
+    correct_index = int(question.correct_answer) if question.correct_answer.isdigit() else None
+    # Deux variantes par réponse: non choisie / choisie par le joueur
+    summaries = fragments.get_or_build(
+        ('quiz_answer_summaries', question.id, version),
+        lambda: tuple(
+            tuple(
+                render_template('partials/quiz_answer_summary.html', index=index, answer=answer,
+                                answer_image=question.answer_image_by_index.get(index),
+                                is_correct_answer=index == correct_index, is_selected=is_selected)
+                for is_selected in (False, True)
+            )
+            for index, answer in enumerate(question.answers, start=1)
+        )
+    )
+    selected_index = int(selected) if selected and selected.isdigit() else None
+    answer_summaries = Markup(''.join(
+        variants[index == selected_index] for index, variants in enumerate(summaries, start=1)
+    ))
+    total_questions = overlay['total_questions']
+    variant = {
+        'can_report': _can_report_question(),
+        'has_progress': total_questions > 0,
+        'is_correct': is_correct,
+        'is_timeout': is_timeout,
+        'show_score': bool(rule_set and score > 0),
+        'show_combo': combo_bonus > 0,
+    }
+    values = dict(overlay)
+    values.update(
+        next_label='Voir mon score' if (total_questions > 0 and overlay['current_question_num'] >= total_questions) else 'Question suivante',
+        score=score,
+        combo_bonus=combo_bonus,
+        combo_streak=combo_streak,
+        answer_summaries=answer_summaries,
+        times_answered=times_answered,
+        success_rate='%.1f' % success_rate,
+        embedded_next=embedded_next,
+    )
+    page = fragments.get_or_build(
+        ('quiz_result', question.id, version, rule_set.id if rule_set else None) + tuple(variant.values()),
+        lambda: compile_fragment('quiz_result.html', tuple(values), question=question, rule_set=rule_set, **variant)
+    )
+    return page.render(**values)
+
+
+def _render_embedded_next_question(rule_set, quiz_state: dict, history: str, quick_double_click: bool) -> Markup:
+    """Question suivante de la playlist pré-rendue pour la réponse (vide si c'était la dernière)."""
+    playlist = quiz_state.get('playlist') or []
+    index = int(quiz_state.get('index', 0) or 0)
+    if index >= len(playlist):
+        return Markup('')
+    question = get_question_snapshot(playlist[index])
+    if question is None:
+        return Markup('')
+    overlay = _quiz_player_overlay(rule_set, history, index + 1, len(playlist),
+                                   int(quiz_state.get('score', 0) or 0), quick_double_click)
+    question_html = _render_quiz_question(
+        question, rule_set, _answer_order(question, quiz_state.get('shuffle_nonce', '')), overlay
+    )
+    images = [img.filename for img in question.images]
+    images.extend(img.filename for img in question.answer_image_by_index.values())
+    embed = app.extensions['quiz_fragments'].get_or_build(
+        ('quiz_next_embed',),
+        lambda: compile_fragment('partials/quiz_next_embed.html', ('question_html', 'prefetch_images_json'))
+    )
+    return embed.render(
+        question_html=question_html,
+        prefetch_images_json=json.dumps([f"/uploads/{filename}" for filename in images]),
+    )
+
+
 @app.route('/api/quiz/next')
 def next_quiz_question():
     """Retourne la prochaine question du quiz en consommant une playlist pré-générée.
@@ -3531,57 +3660,37 @@ def next_quiz_question():
         quick_double_click_param = params.get('quick_double_click')
         if quick_double_click_param is not None:
             quick_double_click = quick_double_click_param.lower() == 'true'
-            session['quick_double_click_enabled'] = quick_double_click
+            _remember_quick_double_click(quick_double_click)
         elif 'quick_double_click_enabled' in session:
             quick_double_click = bool(session.get('quick_double_click_enabled'))
         else:
             quick_double_click = _get_user_double_click_preference()
-            session['quick_double_click_enabled'] = quick_double_click
-        history_ids = []
-        if history_raw:
-            for token in history_raw.split(','):
-                token = token.strip()
-                if token.isdigit():
-                    history_ids.append(int(token))
+            _remember_quick_double_click(quick_double_click)
 
-        rule_set = None
-        if rule_set_slug:
-            rule_set = QuizRuleSet.query.filter_by(slug=rule_set_slug, is_active=True).first()
+        rule_set = get_compiled_rule_set(rule_set_slug)
 
-        # Mode playlist: construire/charger la playlist en session (clé par utilisateur)
-        playlist_session_key = playlist_index_key = score_session_key = correct_answers_session_key = breakdown_session_key = streak_session_key = perfect_session_key = user_ns = None
+        # Mode playlist: construire/charger la playlist dans l'état de quiz côté serveur (clé par utilisateur)
+        user_ns = None
+        quiz_state = None
         if rule_set:
-            (
-                playlist_session_key,
-                playlist_index_key,
-                score_session_key,
-                correct_answers_session_key,
-                breakdown_session_key,
-                streak_session_key,
-                perfect_session_key,
-                user_ns,
-            ) = _quiz_session_keys(rule_set.slug)
+            _, user_ns = _quiz_state_key(rule_set.slug)
 
         question = None
         total_questions = 0
         if rule_set:
+            quiz_state = _load_quiz_state(rule_set.slug)
             # Si pas encore de playlist, la générer
-            playlist: list[int] = session.get(playlist_session_key) or []
+            playlist: list[int] = quiz_state.get('playlist') or []
             # Si démarrage d'une nouvelle partie (history vide) OU playlist absente, régénérer
             if (not history_raw) or (not playlist):
-                playlist = _generate_quiz_playlist(rule_set, g.current_user.id if getattr(g, 'current_user', None) else None)
-                session[playlist_session_key] = playlist
-                session[playlist_index_key] = 0
-                # Reset score/correct pour ce namespace utilisateur+set
-                session[score_session_key] = 0
-                session[correct_answers_session_key] = 0
-                if breakdown_session_key:
-                    session[breakdown_session_key] = []
-                if streak_session_key:
-                    session[streak_session_key] = 0
-                if perfect_session_key:
-                    session[perfect_session_key] = False
-                print(f"[QUIZ PLAYLIST] Générée (reset={not bool(history_raw)}) pour user={user_ns} set='{rule_set.slug}' (len={len(playlist)}): {playlist}")
+                current_user_id = g.current_user.id if getattr(g, 'current_user', None) else None
+                # Playlist pré-générée si disponible, sinon génération immédiate
+                playlist = app.extensions['quiz_warm_pool'].take(rule_set, current_user_id)
+                if playlist is None:
+                    playlist = _generate_quiz_playlist(rule_set, current_user_id)
+                # Reset score/correct/combo pour ce namespace utilisateur+set
+                quiz_state = _new_quiz_state(playlist)
+                playlist_log.debug("Générée (reset=%s) pour user=%s set='%s' (len=%s): %s", not bool(history_raw), user_ns, rule_set.slug, len(playlist), playlist)
 
                 # Démarrer une UserQuizSession si utilisateur connecté
                 if getattr(g, 'current_user', None):
@@ -3591,7 +3700,7 @@ def next_quiz_question():
                                 .filter_by(user_id=g.current_user.id, rule_set_id=rule_set.id, status='in_progress')
                                 .all())
                         for s in prev:
-                            print(f"[QUIZ SESSION] Abandon in-progress session {s.id} for rule_set {s.rule_set_id} before starting new session (user={s.user_id})")
+                            session_log.info("Abandon in-progress session %s for rule_set %s before starting new session (user=%s)", s.id, s.rule_set_id, s.user_id)
                             s.status = 'abandoned'
                             s.updated_at = datetime.utcnow()
                         # Créer une nouvelle session
@@ -3606,58 +3715,57 @@ def next_quiz_question():
                         )
                         db.session.add(new_session)
                         db.session.commit()
-                        print(f"[QUIZ SESSION] Started new session {new_session.id} for rule_set {rule_set.id} (user={new_session.user_id}, total_questions={new_session.total_questions})")
-                        # Stocker l'ID de session dans la session Flask pour ce namespace utilisateur+set
-                        session_key_session_id = f"quiz_session_id:{user_ns}:{rule_set.slug}"
-                        session[session_key_session_id] = new_session.id
-                        print(f"[QUIZ SESSION] Stored session id in flask session under key='{session_key_session_id}' -> {new_session.id}")
+                        session_log.info("Started new session %s for rule_set %s (user=%s, total_questions=%s)", new_session.id, rule_set.id, new_session.user_id, new_session.total_questions)
+                        # Conserver l'ID de session dans l'état de quiz pour ce namespace utilisateur+set
+                        quiz_state['session_id'] = new_session.id
                     except Exception:
                         db.session.rollback()
 
+                _save_quiz_state(rule_set.slug, quiz_state)
+
             total_questions = len(playlist)
-            index = int(session.get(playlist_index_key, 0) or 0)
+            index = int(quiz_state.get('index', 0) or 0)
 
             # Si terminé: fin du quiz
             if index >= total_questions:
-                # Récupérer le nombre de bonnes réponses depuis la session
-                total_correct_answers = int(session.get(correct_answers_session_key, 0) or 0)
-                total_score = int(session.get(score_session_key, 0) or 0)
+                # Récupérer le nombre de bonnes réponses depuis l'état de quiz
+                total_correct_answers = int(quiz_state.get('correct', 0) or 0)
+                total_score = int(quiz_state.get('score', 0) or 0)
                 total_questions = len(playlist)
 
                 perfect_bonus_added = False
                 perfect_bonus_value = 0
-                if rule_set and rule_set.perfect_quiz_bonus and perfect_session_key:
-                    perfect_bonus_value = int(rule_set.perfect_quiz_bonus or 0)
+                if rule_set and rule_set.perfect_quiz_bonus:
+                    perfect_bonus_value = rule_set.perfect_quiz_bonus
                     is_perfect = total_questions > 0 and total_correct_answers == total_questions
-                    already_awarded = bool(session.get(perfect_session_key))
+                    already_awarded = bool(quiz_state.get('perfect'))
                     if is_perfect and perfect_bonus_value > 0 and not already_awarded:
                         total_score += perfect_bonus_value
-                        session[score_session_key] = total_score
-                        session[perfect_session_key] = True
+                        quiz_state['score'] = total_score
+                        quiz_state['perfect'] = True
                         perfect_bonus_added = True
-                        if breakdown_session_key:
-                            bonus_event = {
-                                'type': 'perfect_bonus',
-                                'label': 'Bonus quiz parfait',
-                                'value': perfect_bonus_value,
-                                'total_awarded': perfect_bonus_value,
-                            }
-                            _append_score_breakdown(breakdown_session_key, bonus_event)
-                score_breakdown = list(session.get(breakdown_session_key, [])) if breakdown_session_key else []
+                        bonus_event = {
+                            'type': 'perfect_bonus',
+                            'label': 'Bonus quiz parfait',
+                            'value': perfect_bonus_value,
+                            'total_awarded': perfect_bonus_value,
+                        }
+                        _append_score_breakdown(quiz_state, bonus_event)
+                        _save_quiz_state(rule_set.slug, quiz_state)
+                score_breakdown = list(quiz_state.get('breakdown') or [])
 
                 # Clore la UserQuizSession comme completed si présente
                 if getattr(g, 'current_user', None):
                     try:
-                        session_key_session_id = f"quiz_session_id:{user_ns}:{rule_set.slug}"
-                        sess_id = session.get(session_key_session_id)
+                        sess_id = quiz_state.get('session_id')
                         if not sess_id:
-                            print(f"[QUIZ SESSION] No session id found in flask session for key='{session_key_session_id}' during quiz completion.")
+                            session_log.warning("No session id found in quiz state for user=%s set='%s' during quiz completion.", user_ns, rule_set.slug)
                         if sess_id:
                             s = UserQuizSession.query.get(sess_id)
                             if s and s.status == 'in_progress':
-                                print(
-                                    f"[QUIZ SESSION] Updating session {s.id} (user={s.user_id}) before marking completed: "
-                                    f"answered={s.answered_count}, total={s.total_questions}, correct={s.correct_count}, score={s.total_score}"
+                                session_log.debug(
+                                    "Updating session %s (user=%s) before marking completed: answered=%s, total=%s, correct=%s, score=%s",
+                                    s.id, s.user_id, s.answered_count, s.total_questions, s.correct_count, s.total_score
                                 )
                                 s.status = 'completed'
                                 s.answered_count = s.total_questions
@@ -3665,15 +3773,19 @@ def next_quiz_question():
                                 s.total_score = total_score
                                 s.updated_at = datetime.utcnow()
                                 db.session.commit()
-                                print(
-                                    f"[QUIZ SESSION] Session {s.id} marked completed at quiz end: "
-                                    f"answered={s.answered_count}, correct={s.correct_count}, score={s.total_score}"
+                                session_log.info(
+                                    "Session %s marked completed at quiz end: answered=%s, correct=%s, score=%s",
+                                    s.id, s.answered_count, s.correct_count, s.total_score
                                 )
                             else:
-                                print(f"[QUIZ SESSION] Expected in-progress session for sess_id={sess_id}, found status={s.status if s else 'missing'} (user={g.current_user.id}).")
+                                session_log.warning("Expected in-progress session for sess_id=%s, found status=%s (user=%s).", sess_id, s.status if s else 'missing', g.current_user.id)
                     except Exception:
                         db.session.rollback()
                 
+                # Préparer la prochaine partie ("Rejouer") pendant que l'écran final s'affiche
+                if getattr(g, 'current_user', None):
+                    app.extensions['quiz_warm_pool'].schedule_user(rule_set.id, g.current_user.id)
+
                 # Si perfect bonus obtenu, afficher l'animation d'abord
                 if perfect_bonus_added:
                     return render_template(
@@ -3700,22 +3812,21 @@ def next_quiz_question():
 
             # Charger la prochaine question via l'ID de la playlist
             next_question_id = playlist[index]
-            question = Question.query.options(
-                db.joinedload(Question.images),
-                db.joinedload(Question.detailed_answer_image),
-                db.joinedload(Question.answer_image_links).joinedload(AnswerImageLink.image)
-            ).get(next_question_id)
+            question = get_question_snapshot(next_question_id)
         else:
-            # Mode sans set explicite: fallback à l'aléatoire historique (comme avant)
-            query = Question.query.filter(Question.is_published.is_(True))
-            query = _apply_quiz_filters(query, params)
-            if history_ids:
-                query = query.filter(~Question.id.in_(history_ids))
-            question = query.options(
-                db.joinedload(Question.images),
-                db.joinedload(Question.detailed_answer_image),
-                db.joinedload(Question.answer_image_links).joinedload(AnswerImageLink.image)
-            ).order_by(db.func.random()).first()
+            # Mode sans fin (sans set): curseur (graine, position) sur les questions éligibles
+            filters_key = tuple((params.get(name) or '').strip() for name in ENDLESS_FILTER_PARAMS)
+            eligible_ids = get_eligible_ids(
+                filters_key,
+                lambda: [row.id for row in _apply_quiz_filters(
+                    Question.query.filter(Question.is_published.is_(True)), params
+                ).with_entities(Question.id)]
+            )
+            endless_state = _load_quiz_state(ENDLESS_STATE_SLUG)
+            cursor = endless_state.setdefault('endless', {})
+            next_question_id = next_endless_question_id(cursor, filters_key, eligible_ids)
+            _save_quiz_state(ENDLESS_STATE_SLUG, endless_state)
+            question = get_question_snapshot(next_question_id) if next_question_id else None
 
         # Si on sort du mode set (pas de rule_set), marquer toute session in_progress comme abandonnée
         if not rule_set and getattr(g, 'current_user', None):
@@ -3723,7 +3834,7 @@ def next_quiz_question():
                 # Abandonner toutes sessions en cours (tous sets) si l'utilisateur a quitté le set
                 in_prog = UserQuizSession.query.filter_by(user_id=g.current_user.id, status='in_progress').all()
                 for s in in_prog:
-                    print(f"[QUIZ SESSION] Abandon session {s.id} after leaving rule_set context in /api/quiz/next (user={s.user_id})")
+                    session_log.info("Abandon session %s after leaving rule_set context in /api/quiz/next (user=%s)", s.id, s.user_id)
                     s.status = 'abandoned'
                     s.updated_at = datetime.utcnow()
                 if in_prog:
@@ -3732,87 +3843,38 @@ def next_quiz_question():
                 db.session.rollback()
 
         # Debug logging
-        print(f"[QUIZ NEXT] Rule set: {rule_set_slug}, History: {history_raw}")
-        print(f"[QUIZ NEXT] Selected question ID: {question.id if question else 'None'}")
-        print(f"[QUIZ NEXT] Question difficulty: {question.difficulty_level if question else 'N/A'}")
+        next_log.debug("Rule set: %s, History: %s", rule_set_slug, history_raw)
+        next_log.debug("Selected question ID: %s", question.id if question else 'None')
+        next_log.debug("Question difficulty: %s", question.difficulty_level if question else 'N/A')
 
-        # Calculer la progression et le score total (stocké en session)
+        # Calculer la progression et le score total (stocké dans l'état de quiz)
         total_score = 0
         current_question_num = 0
 
         if rule_set:
-            # Gestion du score en session (reset en début de session)
-            if not history_raw:
-                # Note: la playlist réinitialise déjà score/correct au moment de la génération
-                session[score_session_key] = session.get(score_session_key, 0) or 0
-                session[correct_answers_session_key] = session.get(correct_answers_session_key, 0) or 0
-            total_score = int(session.get(score_session_key, 0) or 0)
+            # Score courant (la playlist réinitialise déjà score/correct au moment de la génération)
+            total_score = int(quiz_state.get('score', 0) or 0)
 
             # Progression basée sur la playlist
-            playlist = session.get(playlist_session_key) or []
-            index = int(session.get(playlist_index_key, 0) or 0)
+            playlist = quiz_state.get('playlist') or []
+            index = int(quiz_state.get('index', 0) or 0)
             # Affichage utilisateur: index courant (1-based)
             current_question_num = min(index + 1, len(playlist)) if playlist else 1
             total_questions = len(playlist)
 
-        # Mélanger les propositions de réponses pour éviter que la bonne réponse soit toujours à la même position
-        if question and question.possible_answers:
-            try:
-                original_answers = question.possible_answers.split('|||')
-                num_answers = len(original_answers)
-
-                # Vérifications de sécurité
-                if num_answers == 0:
-                    print(f"[QUIZ SHUFFLE] Question {question.id} has no answers, skipping shuffle")
-                    return
+        if not question:
+            return render_template('quiz_question.html', question=None)
 
-                # Convertir correct_answer en int si c'est une chaîne
-                try:
-                    correct_answer_int = int(question.correct_answer)
-                    if correct_answer_int < 1 or correct_answer_int > num_answers:
-                        print(f"[QUIZ SHUFFLE] Question {question.id} has invalid correct_answer: {question.correct_answer} (should be 1-{num_answers}), skipping shuffle")
-                        return
-                    else:
-                        question.correct_answer = correct_answer_int  # Mettre à jour pour être sûr
-                except (ValueError, TypeError):
-                    print(f"[QUIZ SHUFFLE] Question {question.id} has invalid correct_answer type: {type(question.correct_answer)} value: {question.correct_answer}, skipping shuffle")
-                    return
-
-                # Créer une liste d'indices [0, 1, 2, ...] et la mélanger
-                answer_indices = list(range(num_answers))
-                random.shuffle(answer_indices)
-
-                # Créer les réponses dans l'ordre mélangé
-                shuffled_answers = [original_answers[i] for i in answer_indices]
-
-                # Stocker l'ordre de mélange en session pour cette question (clé par question_id)
-                shuffle_key = f"question_shuffle_{question.id}"
-                session[shuffle_key] = answer_indices
-
-                # Remplacer temporairement les réponses dans l'objet question pour le template
-                question._shuffled_answers = shuffled_answers
-
-                # Calculer la nouvelle position de la bonne réponse (1-based pour correspondre à correct_answer)
-                original_correct_index = question.correct_answer - 1  # 0-based
-                new_correct_position = answer_indices.index(original_correct_index) + 1  # 1-based
-                question._shuffled_correct_answer = new_correct_position
-
-                # Calculer les indices originaux pour chaque position mélangée (pour les images)
-                question._original_indices = answer_indices
-
-                print(f"[QUIZ SHUFFLE] Question {question.id}: shuffled {num_answers} answers, correct answer moved from position {question.correct_answer} to {new_correct_position}")
-            except Exception as e:
-                print(f"[QUIZ SHUFFLE] Error shuffling answers for question {question.id}: {str(e)}, skipping shuffle")
-                # En cas d'erreur, on continue sans mélanger
-
-        return render_template('quiz_question.html',
-                             question=question,
-                             history=history_raw,
-                             rule_set=rule_set,
-                             current_question_num=current_question_num,
-                             total_questions=total_questions,
-                             total_score=total_score,
-                             quick_double_click=quick_double_click)
+        # Mélanger les propositions de réponses pour éviter que la bonne réponse soit toujours à la même position
+        shuffle_nonce = quiz_state.get('shuffle_nonce', '') if rule_set else ''
+        answer_order = _answer_order(question, shuffle_nonce)
+        # Anciennes entrées de mélange par question (cookies antérieurs): plus utilisées
+        for legacy_key in [key for key in session if key.startswith('question_shuffle_')]:
+            session.pop(legacy_key, None)
+
+        overlay = _quiz_player_overlay(rule_set, history_raw, current_question_num, total_questions,
+                                       total_score, quick_double_click)
+        return _render_quiz_question(question, rule_set, answer_order, overlay)
     except Exception as e:
         return f"Erreur: {str(e)}", 400
 
@@ -3825,31 +3887,19 @@ def show_quiz_final():
         rule_set_slug = (params.get('rule_set') or '').strip()
         history_raw = (params.get('history') or '').strip()
         
-        rule_set = None
-        if rule_set_slug:
-            rule_set = QuizRuleSet.query.filter_by(slug=rule_set_slug, is_active=True).first()
-        
+        rule_set = get_compiled_rule_set(rule_set_slug)
         if not rule_set:
             return "Set de règles introuvable", 404
         
-        (
-            playlist_session_key,
-            playlist_index_key,
-            score_session_key,
-            correct_answers_session_key,
-            breakdown_session_key,
-            streak_session_key,
-            perfect_session_key,
-            user_ns,
-        ) = _quiz_session_keys(rule_set.slug)
+        quiz_state = _load_quiz_state(rule_set.slug)
         
-        total_correct_answers = int(session.get(correct_answers_session_key, 0) or 0)
-        total_score = int(session.get(score_session_key, 0) or 0)
-        playlist = session.get(playlist_session_key) or []
+        total_correct_answers = int(quiz_state.get('correct', 0) or 0)
+        total_score = int(quiz_state.get('score', 0) or 0)
+        playlist = quiz_state.get('playlist') or []
         total_questions = len(playlist)
-        score_breakdown = list(session.get(breakdown_session_key, [])) if breakdown_session_key else []
-        perfect_bonus_added = bool(session.get(perfect_session_key))
-        perfect_bonus_value = int(rule_set.perfect_quiz_bonus or 0) if perfect_bonus_added else 0
+        score_breakdown = list(quiz_state.get('breakdown') or [])
+        perfect_bonus_added = bool(quiz_state.get('perfect'))
+        perfect_bonus_value = rule_set.perfect_quiz_bonus if perfect_bonus_added else 0
         
         quick_double_click = bool(session.get('quick_double_click_enabled', False))
         
@@ -3878,17 +3928,15 @@ def cancel_quiz_session():
         rule_set_slug = (request.form.get('rule_set') or '').strip()
         if not rule_set_slug:
             return "Paramètre 'rule_set' manquant", 400
-        rule_set = QuizRuleSet.query.filter_by(slug=rule_set_slug, is_active=True).first()
+        rule_set = get_compiled_rule_set(rule_set_slug)
         if not rule_set:
             return "Set inconnu", 404
-        _, _, _, _, _, _, _, user_ns = _quiz_session_keys(rule_set.slug)
-        session_key_session_id = f"quiz_session_id:{user_ns}:{rule_set.slug}"
-        sess_id = session.get(session_key_session_id)
+        sess_id = _load_quiz_state(rule_set.slug).get('session_id')
         if not sess_id:
             return "Aucune session en cours", 200
         s = UserQuizSession.query.get(sess_id)
         if s and s.status == 'in_progress':
-            print(f"[QUIZ SESSION] Cancel request abandoning session {s.id} for rule_set {rule_set.id} (user={s.user_id})")
+            session_log.info("Cancel request abandoning session %s for rule_set %s (user=%s)", s.id, rule_set.id, s.user_id)
             s.status = 'abandoned'
             s.updated_at = datetime.utcnow()
             db.session.commit()
@@ -3967,7 +4015,7 @@ def create_quiz_share_link():
         
     except Exception as e:
         db.session.rollback()
-        print(f"Erreur création lien de partage: {str(e)}")
+        log.error("Erreur création lien de partage: %s", e)
         return {'error': f'Erreur serveur: {str(e)}'}, 500
 
 
@@ -4009,7 +4057,7 @@ def show_share_page(share_uuid):
         )
         
     except Exception as e:
-        print(f"Erreur affichage page de partage: {str(e)}")
+        log.error("Erreur affichage page de partage: %s", e)
         return f"Erreur: {str(e)}", 500
 
 
@@ -4032,19 +4080,59 @@ def track_share_click(share_uuid):
             return redirect(url_for('play_quiz'))
             
     except Exception as e:
-        print(f"Erreur tracking clic partage: {str(e)}")
+        log.error("Erreur tracking clic partage: %s", e)
         return redirect(url_for('play_quiz'))
 
 
-def _calculate_score(rule_set, question, is_correct):
-    """Calcule le score de la question et retourne le détail du calcul."""
+def _advance_combo(rule_set: CompiledRuleSet, streak: int, is_correct: bool) -> tuple[int, int]:
+    """Fait avancer la série de bonnes réponses; retourne (série après la réponse, bonus combo gagné)."""
+    if is_correct and rule_set.combo_bonus_enabled:
+        streak += 1
+        return streak, (rule_set.combo_bonus_points if streak % rule_set.combo_step == 0 else 0)
+    return 0, 0
+
+
+def _record_user_answer(user_id: int, question, selected_answer: str, is_correct: bool, now: datetime):
+    """UPSERT des statistiques utilisateur-question et historique de jeu (sans commit)."""
+    stats_table = UserQuestionStat.__table__
+    upsert = dialect_insert(stats_table).values(
+        user_id=user_id,
+        question_id=question.id,
+        times_answered=1,
+        success_count=1 if is_correct else 0,
+        last_selected_answer=selected_answer,
+        last_is_correct=is_correct,
+        last_answered_at=now,
+        created_at=now,
+        updated_at=now
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[stats_table.c.user_id, stats_table.c.question_id],
+        set_={
+            'times_answered': stats_table.c.times_answered + 1,
+            'success_count': stats_table.c.success_count + upsert.excluded.success_count,
+            'last_selected_answer': upsert.excluded.last_selected_answer,
+            'last_is_correct': upsert.excluded.last_is_correct,
+            'last_answered_at': upsert.excluded.last_answered_at,
+            'updated_at': upsert.excluded.updated_at,
+        }
+    ).returning(stats_table.c.times_answered)
+    user_times_answered = db.session.execute(upsert).scalar()
+
+    # Historique compact utilisé pour générer les prochaines playlists (première réponse seulement)
+    if user_times_answered == 1:
+        record_answer(user_id, question.id, question.keyword_ids)
+
+
+def _calculate_score(rule_set: CompiledRuleSet | None, question, is_correct):
+    """Calcule le score de la question et retourne le détail du calcul (lecture de la table du set compilé)."""
     breakdown = {
         'type': 'question',
         'question_id': question.id if question else None,
         'question_label': (question.question_text[:120] + '…') if (question and question.question_text and len(question.question_text) > 120) else (question.question_text if question else ''),
         'difficulty': question.difficulty_level if question else None,
         'was_correct': bool(is_correct),
-        'base_points': rule_set.scoring_base_points if rule_set and rule_set.scoring_base_points is not None else 0,
+        'base_points': rule_set.scoring_base_points if rule_set else 0,
         'difficulty_bonus': 0,
         'difficulty_multiplier': 1.0,
         'question_points': 0,
@@ -4057,135 +4145,91 @@ def _calculate_score(rule_set, question, is_correct):
     if not rule_set or not is_correct:
         return 0, breakdown
 
-    base_points = breakdown['base_points']
-    points = base_points
-
-    if rule_set.scoring_difficulty_bonus_type == 'add':
-        bonus_map = rule_set.get_difficulty_bonus_map()
-        bonus = bonus_map.get(str(question.difficulty_level), 0) if question else 0
-        breakdown['difficulty_bonus'] = bonus
-        points += bonus
-    elif rule_set.scoring_difficulty_bonus_type == 'mult':
-        coeff_map = rule_set.get_difficulty_bonus_map()
-        coeff = coeff_map.get(str(question.difficulty_level), 1.0) if question else 1.0
-        try:
-            coeff = float(coeff)
-        except (TypeError, ValueError):
-            coeff = 1.0
-        points = int(round(base_points * coeff))
-        breakdown['difficulty_multiplier'] = coeff
-        breakdown['difficulty_bonus'] = points - base_points
+    entry = rule_set.score_for(question.difficulty_level if question else None)
+    breakdown['difficulty_bonus'] = entry.difficulty_bonus
+    breakdown['difficulty_multiplier'] = entry.difficulty_multiplier
+    breakdown['question_points'] = entry.points
+    breakdown['total_awarded'] = entry.points
 
-    breakdown['question_points'] = int(points)
-    breakdown['total_awarded'] = int(points)
+    return entry.points, breakdown
 
-    return int(points), breakdown
 
+@app.route('/api/quiz-rule/<int:rule_id>/simulate')
+def simulate_quiz_rule(rule_id: int):
+    """Simulation à blanc de la génération de playlists d'un set (remplacement de /api/debug/quiz-questions).
 
-@app.route('/api/debug/quiz-questions')
-def debug_quiz_questions():
-    """Route de debug pour afficher toutes les questions disponibles pour un quiz."""
+    Paramètres: runs (défaut 1000), history ('anonymous', 'progressive' ou 'user:<id>'),
+    seen_ratio (part du pool marquée comme déjà vue, 0 à 1) et seed.
+    Le set peut être inactif: la simulation sert à le calibrer avant publication.
+    """
+    denied = _ensure_perm_api()
+    if denied:
+        return denied
+    rule = QuizRuleSet.query.get_or_404(rule_id)
+    params = request.args
     try:
-        params = request.args
-        rule_set_slug = (params.get('rule_set') or '').strip()
-        history_raw = (params.get('history') or '').strip()
-        history_ids = []
-        if history_raw:
-            for token in history_raw.split(','):
-                token = token.strip()
-                if token.isdigit():
-                    history_ids.append(int(token))
-
-        # Construire la requête identique à /api/quiz/next
-        query = Question.query.filter(Question.is_published.is_(True))
-        query = _apply_quiz_filters(query, params)
-
-        if history_ids:
-            query = query.filter(~Question.id.in_(history_ids))
+        runs = max(1, min(int(params.get('runs') or 1000), SIMULATION_MAX_RUNS))
+        seen_ratio = max(0.0, min(float(params.get('seen_ratio') or 0), 1.0))
+        seed = int(params['seed']) if (params.get('seed') or '').strip() else None
+    except ValueError:
+        return {'error': "Paramètres 'runs', 'seen_ratio' ou 'seed' invalides"}, 400
+
+    history = (params.get('history') or 'anonymous').strip()
+    seen_ids, answered_keywords = (), ()
+    if history.startswith('user:'):
+        user_id = history[len('user:'):]
+        if not user_id.isdigit():
+            return {'error': "Historique 'user:<id>' invalide"}, 400
+        seen_ids, answered_keywords = get_user_history(int(user_id))
+        history = 'user'
+    elif history not in ('anonymous', 'progressive'):
+        return {'error': f"Historique inconnu: {history}"}, 400
 
-        # Exclure questions déjà vues par l'utilisateur connecté
-        if getattr(g, 'current_user', None):
-            seen_ids = [row.question_id for row in UserQuestionStat.query.with_entities(UserQuestionStat.question_id).filter_by(user_id=g.current_user.id).all()]
-            if seen_ids:
-                query = query.filter(~Question.id.in_(seen_ids))
-
-        # Appliquer la logique de set de règles si présent
-        rule_set = None
-        selected_diff = None
-        if rule_set_slug:
-            rule_set = QuizRuleSet.query.filter_by(slug=rule_set_slug, is_active=True).first()
-
-        if rule_set and rule_set.get_questions_per_difficulty():
-            # Logique de quotas par difficulté
-            qmap = rule_set.get_questions_per_difficulty()
-            allowed_diffs = rule_set.get_allowed_difficulties() or [1, 2, 3, 4, 5]
-
-            # Compter les questions déjà posées par difficulté dans cette session
-            history_questions = []
-            if history_ids:
-                history_questions = Question.query.filter(Question.id.in_(history_ids)).all()
-
-            diff_counts = {d: sum(1 for q in history_questions if q.difficulty_level == d) for d in allowed_diffs}
-
-            # Trouver les difficultés qui n'ont pas atteint leur quota
-            available_diffs = []
-            for d in allowed_diffs:
-                max_q = qmap.get(str(d), 0)
-                current_q = diff_counts.get(d, 0)
-                if current_q < max_q:
-                    available_diffs.append(d)
-
-            if available_diffs:
-                # Trier les difficultés par ordre croissant (1, 2, 3, 4, 5)
-                available_diffs_sorted = sorted(available_diffs)
-                # Sélectionner la difficulté la plus basse disponible
-                selected_diff = available_diffs_sorted[0]
-                query = query.filter(Question.difficulty_level == selected_diff)
-
-        # Récupérer toutes les questions disponibles (sans random)
-        questions = query.options(
-            db.joinedload(Question.broad_theme),
-            db.joinedload(Question.specific_theme),
-            db.joinedload(Question.countries)
-        ).order_by(Question.id).all()
-
-        # Préparer les données de debug
-        debug_data = {
-            'rule_set': rule_set.name if rule_set else None,
-            'rule_set_slug': rule_set_slug,
-            'history_ids': history_ids,
-            'selected_difficulty': selected_diff,
-            'total_available_questions': len(questions),
-            'questions': []
-        }
+    try:
+        report = simulate_playlists(
+            compile_rule_set(rule), runs=runs, history_mode=history,
+            seen_question_ids=seen_ids, answered_keywords=answered_keywords,
+            seen_ratio=seen_ratio, seed=seed,
+        )
+    except Exception as e:
+        return {'error': str(e)}, 400
 
-        for q in questions:
-            question_data = {
-                'id': q.id,
-                'question_text': q.question_text[:100] + '...' if len(q.question_text) > 100 else q.question_text,
-                'difficulty_level': q.difficulty_level,
-                'correct_answer': q.correct_answer,
-                'broad_theme': q.broad_theme.name if q.broad_theme else None,
-                'specific_theme': q.specific_theme.name if q.specific_theme else None,
-                'countries': [c.name for c in q.countries] if q.countries else [],
-                'times_answered': q.times_answered,
-                'success_count': q.success_count
-            }
-            debug_data['questions'].append(question_data)
+    playlists = report['playlists']
+    simulation_log.info(
+        "Set '%s': %s playlists (%s), remplissage %.1f%%, incomplètes %s, parfaites %s, %.2f ms/playlist",
+        rule.slug, runs, history, playlists['fill_rate'] * 100, playlists['incomplete_runs'],
+        playlists['perfect_runs'], report['timings']['total']['mean_ms']
+    )
+    return report
 
-        # Afficher aussi dans la console du serveur
-        print(f"\n=== DEBUG QUIZ QUESTIONS ===")
-        print(f"Rule set: {debug_data['rule_set']} ({rule_set_slug})")
-        print(f"History IDs: {history_ids}")
-        print(f"Selected difficulty: {selected_diff}")
-        print(f"Total available questions: {len(questions)}")
-        print(f"Questions: {[q['id'] for q in debug_data['questions']]}")
-        print("===========================\n")
 
-        return debug_data
+@app.route('/api/admin/logging', methods=['GET', 'POST'])
+def admin_logging():
+    """Niveaux des loggers et statistiques de la file de journalisation.
 
-    except Exception as e:
-        return {'error': str(e)}, 400
+    POST (formulaire ou JSON): logger + level (ex: quiz.playlist=DEBUG, sans
+    redémarrage) et/ou debug_sample_rate (0 à 1).
+    """
+    denied = _ensure_perm_api()
+    if denied:
+        return denied
+    app_logging = app.extensions['app_logging']
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        name = (data.get('logger') or '').strip()
+        level = (data.get('level') or '').strip()
+        rate = data.get('debug_sample_rate')
+        try:
+            if level:
+                if not name:
+                    return {'error': "Paramètre 'logger' requis"}, 400
+                app_logging.set_level(name, level)
+                log.info("Niveau du logger %s: %s", name, level.upper())
+            if rate not in (None, ''):
+                app_logging.set_debug_sample_rate(float(rate))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+    return {'levels': app_logging.levels(), 'stats': app_logging.stats()}
 
 
 @app.route('/api/quiz/answer', methods=['POST'])
@@ -4200,27 +4244,29 @@ def submit_quiz_answer():
         quick_double_click_raw = request.form.get('quick_double_click')
         if quick_double_click_raw is not None:
             quick_double_click = quick_double_click_raw.strip().lower() == 'true'
-            session['quick_double_click_enabled'] = quick_double_click
+            _remember_quick_double_click(quick_double_click)
         elif 'quick_double_click_enabled' in session:
             quick_double_click = bool(session.get('quick_double_click_enabled'))
         else:
             quick_double_click = _get_user_double_click_preference()
-            session['quick_double_click_enabled'] = quick_double_click
+            _remember_quick_double_click(quick_double_click)
 
         if not question_id_raw.isdigit():
             return "Identifiant de question invalide", 400
 
-        question = Question.query.options(
-            db.joinedload(Question.images),
-            db.joinedload(Question.detailed_answer_image),
-            db.joinedload(Question.answer_image_links).joinedload(AnswerImageLink.image)
-        ).get_or_404(int(question_id_raw))
+        question = get_question_snapshot(int(question_id_raw))
+        if question is None:
+            return "Question introuvable", 404
 
-        # Vérifier si les réponses ont été mélangées pour cette question
-        shuffle_key = f"question_shuffle_{question.id}"
-        shuffle_order = session.get(shuffle_key)
+        # Charger le set de règles si spécifié
+        quiz_state = None
+        rule_set = get_compiled_rule_set(rule_set_slug)
+        if rule_set:
+            quiz_state = _load_quiz_state(rule_set.slug)
 
-        if shuffle_order and selected_answer and selected_answer.isdigit():
+        # Recalculer l'ordre de mélange affiché par /api/quiz/next pour retrouver la réponse d'origine
+        shuffle_order = _answer_order(question, quiz_state.get('shuffle_nonce', '') if rule_set else '')
+        if selected_answer and selected_answer.isdigit() and 1 <= int(selected_answer) <= len(shuffle_order):
             # Convertir l'index sélectionné (dans l'ordre mélangé, 1-based) vers l'index original (1-based)
             selected_index_mixed = int(selected_answer) - 1  # 0-based
             original_index = shuffle_order[selected_index_mixed] + 1  # 1-based
@@ -4228,29 +4274,12 @@ def submit_quiz_answer():
         else:
             selected_answer_original = selected_answer
 
-        correct_value = (question.correct_answer or '').strip()
+        correct_value = question.correct_answer
         # Si pas de réponse (timer expiré ou non sélection), considérer comme faux
         is_correct = bool(selected_answer_original) and (selected_answer_original == correct_value)
 
         # Debug logging
-        print(f"[QUIZ ANSWER] Question ID: {question_id_raw}, Selected: '{selected_answer}', Correct: '{correct_value}', Is correct: {is_correct}")
-
-        # Charger le set de règles si spécifié
-        rule_set = None
-        playlist_session_key = playlist_index_key = score_session_key = correct_answers_session_key = breakdown_session_key = streak_session_key = perfect_session_key = user_ns = None
-        if rule_set_slug:
-            rule_set = QuizRuleSet.query.filter_by(slug=rule_set_slug, is_active=True).first()
-            if rule_set:
-                (
-                    playlist_session_key,
-                    playlist_index_key,
-                    score_session_key,
-                    correct_answers_session_key,
-                    breakdown_session_key,
-                    streak_session_key,
-                    perfect_session_key,
-                    user_ns,
-                ) = _quiz_session_keys(rule_set.slug)
+        answer_log.debug("Question ID: %s, Selected: '%s', Correct: '%s', Is correct: %s", question_id_raw, selected_answer, correct_value, is_correct)
 
         # Calculer le score selon les règles
         score = 0
@@ -4268,25 +4297,10 @@ def submit_quiz_answer():
             question_index = len(history_ids) + 1
             question_score, breakdown = _calculate_score(rule_set, question, is_correct)
 
-            streak_after = 0
-            if rule_set.combo_bonus_enabled and rule_set.combo_step and rule_set.combo_bonus_points:
-                combo_step = max(int(rule_set.combo_step), 0)
-                combo_points = int(rule_set.combo_bonus_points or 0)
-                current_streak = int(session.get(streak_session_key, 0) or 0) if streak_session_key else 0
-                if is_correct and combo_step > 0 and combo_points > 0:
-                    current_streak += 1
-                    if current_streak % combo_step == 0:
-                        combo_bonus = combo_points
-                        combo_triggered = True
-                else:
-                    current_streak = 0
-                streak_after = current_streak
-                combo_streak = streak_after
-                if streak_session_key:
-                    session[streak_session_key] = current_streak
-            else:
-                if streak_session_key:
-                    session[streak_session_key] = 0
+            streak_after, combo_bonus = _advance_combo(rule_set, int(quiz_state.get('streak', 0) or 0), is_correct)
+            combo_triggered = combo_bonus > 0
+            combo_streak = streak_after
+            quiz_state['streak'] = streak_after
 
             if breakdown:
                 breakdown['question_index'] = question_index
@@ -4298,100 +4312,96 @@ def submit_quiz_answer():
             else:
                 score = question_score + combo_bonus
 
-            if breakdown_session_key and breakdown:
-                _append_score_breakdown(breakdown_session_key, breakdown)
-
-        # Mettre à jour les statistiques globales de la question
-        question.times_answered = (question.times_answered or 0) + 1
-        if is_correct:
-            question.success_count = (question.success_count or 0) + 1
-        question.updated_at = datetime.utcnow()
-
-        # Mettre à jour les statistiques utilisateur-question
-        if getattr(g, 'current_user', None):
-            stat = UserQuestionStat.query.filter_by(user_id=g.current_user.id, question_id=question.id).first()
-            if not stat:
-                stat = UserQuestionStat(user_id=g.current_user.id, question_id=question.id)
-                db.session.add(stat)
-            stat.times_answered = (stat.times_answered or 0) + 1
-            if is_correct:
-                stat.success_count = (stat.success_count or 0) + 1
-            stat.last_selected_answer = selected_answer_original
-            stat.last_is_correct = is_correct
-            stat.last_answered_at = datetime.utcnow()
-
-        # Mettre à jour la distribution des réponses (QuestionAnswerStat)
-        try:
-            if selected_answer_original and selected_answer_original.isdigit():
-                idx = int(selected_answer_original)
-                qa = QuestionAnswerStat.query.filter_by(question_id=question.id, answer_index=idx).first()
-                if not qa:
-                    qa = QuestionAnswerStat(question_id=question.id, answer_index=idx, selected_count=0)
-                    db.session.add(qa)
-                qa.selected_count = (qa.selected_count or 0) + 1
-        except Exception:
-            # Ne pas bloquer la réponse si l'agg échoue
-            db.session.rollback()
-
-        db.session.commit()
-
-        # Mettre à jour le score total et le nombre de bonnes réponses en session (namespace user)
-        if rule_set and score_session_key and correct_answers_session_key:
-            total_score_session = int(session.get(score_session_key, 0) or 0)
+            if breakdown:
+                _append_score_breakdown(quiz_state, breakdown)
+
+        # Statistiques globales de la question et distribution des réponses: cumulées
+        # puis écrites par lots (hors de la transaction de la réponse)
+        answer_index = int(selected_answer_original) if selected_answer_original and selected_answer_original.isdigit() else None
+        counters = app.extensions['quiz_counters']
+        # Valeurs affichées dans le résultat (incréments en attente inclus); seuls les
+        # compteurs sont lus en base, le contenu de la question vient du catalogue.
+        # Lus avant add_answer, qui peut écrire le tampon en base
+        stored_answered, stored_correct = db.session.execute(
+            db.select(Question.times_answered, Question.success_count).where(Question.id == question.id)
+        ).one()
+        pending_answered, pending_correct = counters.pending(question.id)
+        counters.add_answer(question.id, is_correct, answer_index)
+        displayed_times_answered = (stored_answered or 0) + pending_answered + 1
+        displayed_success_count = (stored_correct or 0) + pending_correct + (1 if is_correct else 0)
+
+        # Mettre à jour le score total, le nombre de bonnes réponses et la progression (namespace user)
+        if rule_set:
+            total_score_state = int(quiz_state.get('score', 0) or 0)
             if score:
-                total_score_session += int(score)
-            session[score_session_key] = total_score_session
+                total_score_state += int(score)
+            quiz_state['score'] = total_score_state
 
             # Compter les bonnes réponses
-            total_correct_answers_session = int(session.get(correct_answers_session_key, 0) or 0)
+            total_correct_answers_state = int(quiz_state.get('correct', 0) or 0)
             if is_correct:
-                total_correct_answers_session += 1
-            session[correct_answers_session_key] = total_correct_answers_session
-
-        # Mettre à jour la progression de playlist (si set de règles, namespace user)
-        if rule_set and playlist_session_key and playlist_index_key:
-            index = int(session.get(playlist_index_key, 0) or 0)
-            playlist = session.get(playlist_session_key) or []
-            # Avancer l'index si la question correspond à l'élément courant
+                total_correct_answers_state += 1
+            quiz_state['correct'] = total_correct_answers_state
+
+            # Avancer l'index si la question correspond à l'élément courant de la playlist
+            index = int(quiz_state.get('index', 0) or 0)
+            playlist = quiz_state.get('playlist') or []
             if index < len(playlist) and playlist[index] == question.id:
-                session[playlist_index_key] = index + 1
+                quiz_state['index'] = index + 1
 
-            # Mettre à jour la UserQuizSession si présente
-            if getattr(g, 'current_user', None):
+        # Statistiques utilisateur-question, historique et UserQuizSession: une seule transaction,
+        # par UPSERT et incréments atomiques (pas de lecture préalable des lignes)
+        if getattr(g, 'current_user', None):
+            try:
+                user_id = g.current_user.id
+                now = datetime.utcnow()
+                _record_user_answer(user_id, question, selected_answer_original, is_correct, now)
+
+                sess_id = quiz_state.get('session_id') if rule_set else None
+                if rule_set and not sess_id:
+                    session_log.warning("No session id found in quiz state for set='%s' during answer update.", rule_set.slug)
+                if sess_id:
+                    sessions_table = UserQuizSession.__table__
+                    answered_after = sessions_table.c.answered_count + 1
+                    result = db.session.execute(
+                        sessions_table.update()
+                        .where(
+                            sessions_table.c.id == sess_id,
+                            sessions_table.c.user_id == user_id,
+                            sessions_table.c.status == 'in_progress'
+                        )
+                        .values(
+                            answered_count=db.case(
+                                (answered_after > sessions_table.c.total_questions, sessions_table.c.total_questions),
+                                else_=answered_after
+                            ),
+                            correct_count=sessions_table.c.correct_count + (1 if is_correct else 0),
+                            # total_score est aussi tenu dans l'état de quiz; l'appliquer si on a un score crédité
+                            total_score=sessions_table.c.total_score + int(score or 0),
+                            status=db.case(
+                                (db.and_(sessions_table.c.total_questions > 0, answered_after >= sessions_table.c.total_questions), 'completed'),
+                                else_=sessions_table.c.status
+                            ),
+                            updated_at=now
+                        )
+                    )
+                    if not result.rowcount:
+                        session_log.warning("Session %s not in progress during answer update (user=%s).", sess_id, user_id)
+
+                # Les objets chargés (set, utilisateur) ne sont pas modifiés par ces requêtes:
+                # inutile de les expirer et de les recharger pour le rendu du résultat
+                orm_session = db.session()
+                orm_session.expire_on_commit = False
                 try:
-                    session_key_session_id = f"quiz_session_id:{user_ns}:{rule_set.slug}"
-                    sess_id = session.get(session_key_session_id)
-                    if not sess_id:
-                        print(f"[QUIZ SESSION] No session id found in flask session for key='{session_key_session_id}' during answer update.")
-                    if sess_id:
-                        s = UserQuizSession.query.get(sess_id)
-                        if s and s.status == 'in_progress':
-                            before_answered = s.answered_count or 0
-                            before_correct = s.correct_count or 0
-                            before_score = s.total_score or 0
-                            print(
-                                f"[QUIZ SESSION] Answer update for session {s.id} (user={s.user_id}): "
-                                f"answered={before_answered}, total={s.total_questions}, correct={before_correct}, score={before_score}"
-                            )
-                            s.answered_count = min((s.answered_count or 0) + 1, s.total_questions or 0)
-                            if is_correct:
-                                s.correct_count = (s.correct_count or 0) + 1
-                            # total_score est déjà mis à jour en session; l'appliquer si on a un score crédité
-                            if score:
-                                s.total_score = (s.total_score or 0) + int(score)
-                            if (s.total_questions or 0) > 0 and s.answered_count >= (s.total_questions or 0):
-                                s.status = 'completed'
-                                print(f"[QUIZ SESSION] Session {s.id} reached completion via answer handler.")
-                            s.updated_at = datetime.utcnow()
-                            db.session.commit()
-                            print(
-                                f"[QUIZ SESSION] Post-answer session {s.id}: "
-                                f"status={s.status}, answered={s.answered_count}, correct={s.correct_count}, score={s.total_score}"
-                            )
-                        else:
-                            print(f"[QUIZ SESSION] Retrieved session {getattr(s, 'id', None)} but status={getattr(s, 'status', None)} during answer update (expected in_progress).")
-                except Exception:
-                    db.session.rollback()
+                    orm_session.commit()
+                finally:
+                    orm_session.expire_on_commit = True
+            except Exception as e:
+                db.session.rollback()
+                answer_log.error("Erreur lors de l'enregistrement des statistiques: %s", e)
+
+        if rule_set:
+            _save_quiz_state(rule_set.slug, quiz_state)
 
         # Mettre à jour l'historique côté client (ajouter la question actuelle)
         history_ids = []
@@ -4402,7 +4412,8 @@ def submit_quiz_answer():
                     history_ids.append(int(token))
         if question.id not in history_ids:
             history_ids.append(question.id)
-        next_history = ','.join(str(i) for i in history_ids)
+        # Mode sans fin: le serveur garde le curseur, inutile de faire grossir l'historique client
+        next_history = ','.join(str(i) for i in history_ids) if rule_set else ''
 
         # Calculer la progression et le score total mis à jour
         total_questions = 0
@@ -4411,46 +4422,260 @@ def submit_quiz_answer():
 
         if rule_set:
             # Progression basée sur la playlist
-            (
-                playlist_session_key,
-                playlist_index_key,
-                score_session_key,
-                correct_answers_session_key,
-                breakdown_session_key,
-                streak_session_key,
-                perfect_session_key,
-                user_ns,
-            ) = _quiz_session_keys(rule_set.slug)
-            index = int(session.get(playlist_index_key, 0) or 0)
-            playlist = session.get(playlist_session_key) or []
+            index = int(quiz_state.get('index', 0) or 0)
+            playlist = quiz_state.get('playlist') or []
             total_questions = len(playlist)
             current_question_num = min(index, total_questions)
 
-            # Score total depuis la session
-            score_session_key = score_session_key
-            total_score = int(session.get(score_session_key, 0) or 0)
+            # Score total depuis l'état de quiz
+            total_score = int(quiz_state.get('score', 0) or 0)
 
-        return render_template(
-            'quiz_result.html',
-            question=question,
-            is_correct=is_correct,
+        # Protocole optionnel: embarquer la question suivante (un seul aller-retour par étape)
+        embedded_next = Markup('')
+        if rule_set and (request.form.get('embed_next') or '').strip() == '1':
+            embedded_next = _render_embedded_next_question(rule_set, quiz_state, next_history, quick_double_click)
+
+        overlay = _quiz_player_overlay(rule_set, next_history, current_question_num, total_questions,
+                                       total_score, quick_double_click)
+        return _render_quiz_result(
+            question, rule_set,
             selected=selected_answer_original,
-            history=next_history,
-            rule_set=rule_set,
-            score=score,
-            combo_triggered=combo_triggered,
-            combo_bonus=combo_bonus,
-            combo_streak=combo_streak,
-            current_question_num=current_question_num,
-            total_questions=total_questions,
-            total_score=total_score,
+            is_correct=is_correct,
             is_timeout=is_timeout,
-            quick_double_click=quick_double_click
+            score=int(score or 0),
+            combo_bonus=combo_bonus if combo_triggered else 0,
+            combo_streak=combo_streak,
+            times_answered=displayed_times_answered,
+            success_rate=(displayed_success_count / displayed_times_answered) * 100.0,
+            overlay=overlay,
+            embedded_next=embedded_next
         )
     except Exception as e:
         return f"Erreur: {str(e)}", 400
 
 
+# ============ Quiz hors ligne (pack + envoi groupé des réponses) ============
+
+def _quiz_pack_serializer():
+    return URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='quiz-pack')
+
+
+def _image_url(image):
+    return f"/uploads/{image.filename}" if image else None
+
+
+@app.route('/api/quiz/pack/<slug>')
+def quiz_pack(slug):
+    """Compile la playlist d'un set en un pack autonome (questions, réponses mélangées, images, barème).
+
+    Le pack se joue sans réseau; les réponses sont envoyées en une fois à /api/quiz/pack/submit
+    avec le jeton signé du pack.
+    """
+    try:
+        rule_set = get_compiled_rule_set(slug)
+        if not rule_set:
+            return {'error': 'Quiz introuvable'}, 404
+
+        current_user_id = g.current_user.id if getattr(g, 'current_user', None) else None
+        playlist = app.extensions['quiz_warm_pool'].take(rule_set, current_user_id)
+        if playlist is None:
+            playlist = _generate_quiz_playlist(rule_set, current_user_id)
+
+        sid = _quiz_sid()
+        nonce = uuid.uuid4().hex
+        questions = []
+        images = []
+        for question_id in playlist:
+            question = get_question_snapshot(question_id)
+            if question is None:
+                continue
+            order = _answer_order(question, nonce, sid)
+            answers = []
+            correct_position = None
+            for position, original in enumerate(order, start=1):
+                answer_image = question.answer_image_by_index.get(original + 1)
+                answers.append({'text': question.answers[original], 'image': _image_url(answer_image)})
+                if str(original + 1) == question.correct_answer:
+                    correct_position = position
+            question_images = [_image_url(img) for img in question.images]
+            images.extend(question_images)
+            images.extend(answer['image'] for answer in answers if answer['image'])
+            if question.detailed_answer_image:
+                images.append(_image_url(question.detailed_answer_image))
+            questions.append({
+                'id': question.id,
+                'question_text': question.question_text,
+                'difficulty_level': question.difficulty_level,
+                'theme': {'name': question.theme.name, 'icon': question.theme.icon, 'color': question.theme.color} if question.theme else None,
+                'images': question_images,
+                'answers': answers,
+                'correct_answer': correct_position,
+                'hint': question.hint,
+                'detailed_answer': question.detailed_answer,
+                'detailed_answer_image': _image_url(question.detailed_answer_image),
+                'source': question.source,
+            })
+
+        token = _quiz_pack_serializer().dumps({
+            'sid': sid,
+            'user_id': current_user_id,
+            'rule_set_id': rule_set.id,
+            'playlist': [q['id'] for q in questions],
+            'nonce': nonce,
+        })
+        pack_log.info("Pack généré pour set='%s' user=%s (%s questions)", rule_set.slug, current_user_id or 'anon', len(questions))
+        return {
+            'token': token,
+            'rule_set': {
+                'slug': rule_set.slug,
+                'name': rule_set.name,
+                'timer_seconds': rule_set.timer_seconds,
+                'scoring': {
+                    'base_points': rule_set.scoring_base_points,
+                    'difficulty_bonus_type': rule_set.scoring_difficulty_bonus_type,
+                    'difficulty_bonus_map': dict(rule_set.difficulty_bonus_map),
+                    'combo_bonus_enabled': rule_set.combo_bonus_enabled,
+                    'combo_step': rule_set.combo_step,
+                    'combo_bonus_points': rule_set.combo_bonus_points,
+                    'perfect_quiz_bonus': rule_set.perfect_quiz_bonus,
+                },
+            },
+            'questions': questions,
+            'prefetch_images': list(dict.fromkeys(images)),
+        }
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@app.route('/api/quiz/pack/submit', methods=['POST'])
+def submit_quiz_pack():
+    """Applique en une transaction toutes les réponses d'un pack joué hors ligne.
+
+    Corps JSON: {"token": "...", "answers": [{"question_id": 12, "selected": 2, "timeout": false}, ...]}
+    `selected` est la position affichée dans le pack (1-based), absente/null si pas de réponse.
+    """
+    data = request.get_json(silent=True) or {}
+    state_store = app.extensions['quiz_state_store']
+    try:
+        # Le jeton n'est pas accepté plus longtemps que le marqueur anti-rejeu n'est conservé
+        payload = _quiz_pack_serializer().loads(data.get('token') or '', max_age=state_store.ttl_seconds)
+    except SignatureExpired:
+        return {'error': 'Pack expiré'}, 400
+    except BadSignature:
+        return {'error': 'Pack invalide'}, 400
+
+    current_user_id = g.current_user.id if getattr(g, 'current_user', None) else None
+    if payload.get('user_id') != current_user_id:
+        return {'error': 'Ce pack appartient à un autre joueur'}, 403
+    rule_set = db.session.get(QuizRuleSet, payload.get('rule_set_id'))
+    if not rule_set:
+        return {'error': 'Quiz introuvable'}, 404
+    rule_set = compile_rule_set(rule_set)
+
+    # Un pack ne s'envoie qu'une fois: marqueur posé de façon atomique (deux envois simultanés ne passent pas tous les deux)
+    pack_key = f"pack:{payload['nonce']}"
+    if not state_store.add(payload['sid'], pack_key, {'submitted_at': datetime.utcnow().isoformat()}):
+        return {'error': 'Réponses déjà envoyées pour ce pack'}, 409
+
+    answers_by_question = {}
+    for item in data.get('answers') or []:
+        if isinstance(item, dict) and str(item.get('question_id', '')).isdigit():
+            answers_by_question.setdefault(int(item['question_id']), item)
+
+    streak = 0
+    total_score = 0
+    correct_count = 0
+    results = []
+    breakdown_events = []
+    counter_questions = {}
+    counter_answers = {}
+    answered = []
+    for question_index, question_id in enumerate(payload['playlist'], start=1):
+        item = answers_by_question.get(question_id)
+        question = get_question_snapshot(question_id)
+        if item is None or question is None:
+            continue
+        order = _answer_order(question, payload['nonce'], payload['sid'])
+        selected = str(item.get('selected') or '')
+        selected_original = ''
+        if selected.isdigit() and 1 <= int(selected) <= len(order):
+            selected_original = str(order[int(selected) - 1] + 1)
+        is_correct = bool(selected_original) and selected_original == question.correct_answer
+
+        question_score, breakdown = _calculate_score(rule_set, question, is_correct)
+        streak, combo_bonus = _advance_combo(rule_set, streak, is_correct)
+        breakdown.update(
+            question_index=question_index,
+            combo_bonus=combo_bonus,
+            combo_triggered=combo_bonus > 0,
+            combo_streak=streak,
+            total_awarded=int(question_score + combo_bonus),
+        )
+        breakdown_events.append(breakdown)
+        total_score += breakdown['total_awarded']
+        correct_count += 1 if is_correct else 0
+
+        counts = counter_questions.setdefault(question_id, [0, 0])
+        counts[0] += 1
+        counts[1] += 1 if is_correct else 0
+        if selected_original:
+            key = (question_id, int(selected_original))
+            counter_answers[key] = counter_answers.get(key, 0) + 1
+        answered.append((question, selected_original, is_correct))
+        results.append({
+            'question_id': question_id,
+            'is_correct': is_correct,
+            'timeout': bool(item.get('timeout')),
+            'score': breakdown['total_awarded'],
+        })
+
+    total_questions = len(payload['playlist'])
+    perfect_bonus = 0
+    if rule_set.perfect_quiz_bonus and total_questions > 0 and correct_count == total_questions:
+        perfect_bonus = rule_set.perfect_quiz_bonus
+        total_score += perfect_bonus
+        breakdown_events.append({
+            'type': 'perfect_bonus',
+            'label': 'Bonus quiz parfait',
+            'value': perfect_bonus,
+            'total_awarded': perfect_bonus,
+        })
+
+    # Compteurs globaux, statistiques utilisateur et session: une seule transaction
+    try:
+        now = datetime.utcnow()
+        write_counter_batch(counter_questions, counter_answers)
+        if current_user_id:
+            for question, selected_original, is_correct in answered:
+                _record_user_answer(current_user_id, question, selected_original, is_correct, now)
+            db.session.add(UserQuizSession(
+                user_id=current_user_id,
+                rule_set_id=rule_set.id,
+                status='completed' if len(answered) >= total_questions else 'abandoned',
+                total_questions=total_questions,
+                answered_count=len(answered),
+                correct_count=correct_count,
+                total_score=total_score
+            ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        state_store.delete(payload['sid'], pack_key)
+        pack_log.error("Erreur lors de l'enregistrement des réponses: %s", e)
+        return {'error': 'Enregistrement impossible, réessayez'}, 500
+
+    pack_log.info("%s réponse(s) enregistrées pour set='%s' user=%s (score=%s)", len(answered), rule_set.slug, current_user_id or 'anon', total_score)
+    return {
+        'total_questions': total_questions,
+        'answered': len(answered),
+        'correct': correct_count,
+        'total_score': total_score,
+        'perfect_bonus': perfect_bonus,
+        'results': results,
+        'breakdown': breakdown_events,
+    }
+
+
 # ============ Routes pour la gestion des règles du Quiz ============
 
 def _slugify(value: str) -> str:
@@ -4543,7 +4768,7 @@ def _load_quiz_rule_defaults():
                 config = json.load(f)
                 return config.get('defaults', {})
     except Exception as e:
-        print(f"Erreur lors du chargement des valeurs par défaut: {e}")
+        log.error("Erreur lors du chargement des valeurs par défaut: %s", e)
     
     # Valeurs par défaut en dur si le fichier n'existe pas
     return {
@@ -4975,7 +5200,7 @@ def count_questions_for_rule():
         return {'count': count, 'message': message}
 
     except Exception as e:
-        print(f"Erreur lors du comptage des questions: {e}")
+        log.error("Erreur lors du comptage des questions: %s", e)
         return {'count': 0, 'message': 'Erreur lors du calcul'}
 
 
@@ -5022,7 +5247,7 @@ def get_questions_for_selection():
         return {'questions': questions_data, 'count': len(questions_data)}
 
     except Exception as e:
-        print(f"Erreur lors de la récupération des questions: {e}")
+        log.error("Erreur lors de la récupération des questions: %s", e)
         return {'questions': [], 'error': str(e)}
 
 
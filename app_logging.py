@@ -0,0 +1,197 @@
+"""
+Journalisation structurée, par niveaux, des sous-systèmes de l'application.
+
+Les endpoints du quiz et le widget de messagerie écrivaient plusieurs lignes par
+requête avec `print` (playlist complète, état de session, détail du mélange),
+de façon synchrone sur la sortie standard.
+
+Chaque sous-système a désormais son logger (`quiz.playlist`, `quiz.session`,
+`messages.widget`...), rattaché à une racine de SUBSYSTEMS. Les messages sont
+formatés à la demande (arguments `%s`): un message sous le niveau configuré ne
+coûte qu'un test de niveau. Les enregistrements retenus sont placés dans une
+file bornée (QueueHandler) et écrits par un thread dédié; si la file est pleine,
+l'enregistrement est abandonné et compté plutôt que de bloquer la requête.
+
+- Niveaux: LOG_LEVEL (défaut pour toutes les racines) et LOG_LEVELS
+  ("quiz.playlist=DEBUG,messages.widget=WARNING"), modifiables à chaud
+  (`set_level`, route d'administration /api/admin/logging).
+- Échantillonnage des messages DEBUG: LOG_DEBUG_SAMPLE_RATE (0 à 1).
+- Format: 'text' (`horodatage NIVEAU logger message clé=valeur`) ou 'json'.
+  Les champs passés dans `extra=` sont ajoutés à la ligne.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+
+
+SUBSYSTEMS = ('app', 'images', 'messages', 'quiz')
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributs standard d'un LogRecord (les autres proviennent de `extra=`)
+_RESERVED_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger d'un sous-système (ex: 'quiz.playlist'); sa racine doit figurer dans SUBSYSTEMS."""
+    return logging.getLogger(name)
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRIBUTES}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Ligne texte `clé=valeur` ou objet JSON, avec les champs `extra`."""
+
+    def __init__(self, output: str = 'text'):
+        super().__init__()
+        self.output = output
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        fields = _extra_fields(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}'
+        if self.output == 'json':
+            payload = {'ts': timestamp, 'level': record.levelname, 'logger': record.name, 'msg': message}
+            payload.update(fields)
+            if record.exc_text:
+                payload['exc'] = record.exc_text
+            return json.dumps(payload, ensure_ascii=False, default=str)
+        line = f"{timestamp} {record.levelname:<7} {record.name} {message}"
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+class DebugSampler(logging.Filter):
+    """Ne laisse passer qu'une fraction `rate` des messages DEBUG."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui abandonne (et compte) les enregistrements quand la file est pleine."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Figer le message et les champs extra, mais laisser le formatage final au thread d'écriture
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AppLogging:
+    """Configuration des loggers de l'application (file d'attente, niveaux, échantillonnage)."""
+
+    def __init__(self, level: str = 'INFO', levels: str = '', debug_sample_rate: float = 1.0,
+                 output: str = 'text', queue_size: int = DEFAULT_QUEUE_SIZE, stream=None):
+        self._lock = threading.Lock()
+        self.sampler = DebugSampler(debug_sample_rate)
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=max(int(queue_size), 1)))
+        self.handler.addFilter(self.sampler)
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(StructuredFormatter(output))
+        self.listener = logging.handlers.QueueListener(self.handler.queue, writer, respect_handler_level=False)
+        for name in SUBSYSTEMS:
+            logger = logging.getLogger(name)
+            logger.handlers = [h for h in logger.handlers if not isinstance(h, DroppingQueueHandler)]
+            logger.addHandler(self.handler)
+            logger.propagate = False
+            logger.setLevel(_parse_level(level))
+        for name, value in _parse_levels(levels).items():
+            self.set_level(name, value)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def set_level(self, name: str, level) -> int:
+        """Change le niveau d'un logger (effet immédiat); retourne le niveau appliqué."""
+        levelno = _parse_level(level)
+        with self._lock:
+            logging.getLogger(name).setLevel(levelno)
+        return levelno
+
+    def set_debug_sample_rate(self, rate: float):
+        self.sampler.rate = max(0.0, min(float(rate), 1.0))
+
+    def levels(self) -> dict:
+        """Niveaux explicites des loggers de l'application (racines et sous-systèmes configurés)."""
+        result = {}
+        for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+            if not isinstance(logger, logging.Logger) or name.split('.')[0] not in SUBSYSTEMS:
+                continue
+            result[name] = logging.getLevelName(logger.getEffectiveLevel())
+        return result
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.handler.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'debug_sample_rate': self.sampler.rate,
+        }
+
+    def stop(self):
+        try:
+            self.listener.stop()
+        except AttributeError:
+            # Déjà arrêté
+            pass
+
+
+def _parse_level(level) -> int:
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Niveau de log inconnu: {level}")
+    return value
+
+
+def _parse_levels(spec: str) -> dict[str, str]:
+    """"quiz.playlist=DEBUG,messages.widget=WARNING" -> {nom: niveau}."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            if name.strip():
+                levels[name.strip()] = level.strip()
+    return levels
+
+
+def init_app_logging(config) -> AppLogging:
+    return AppLogging(
+        level=config.get('LOG_LEVEL') or 'INFO',
+        levels=config.get('LOG_LEVELS') or '',
+        debug_sample_rate=config.get('LOG_DEBUG_SAMPLE_RATE', 1.0),
+        output=config.get('LOG_FORMAT') or 'text',
+        queue_size=config.get('LOG_QUEUE_SIZE') or DEFAULT_QUEUE_SIZE,
+    )
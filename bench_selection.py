@@ -0,0 +1,94 @@
+"""
+Benchmark du moteur de sélection des questions (quiz_selection.py)
+
+Compare, sur un pool synthétique, l'ancien algorithme (score par question
+recalculé avec des ensembles Python puis tri complet du pool) au moteur à
+bitsets (construction de l'index, puis sélection avec index en cache).
+
+Usage:
+    python bench_selection.py [taille_pool] [quota]
+    python bench_selection.py 50000 20 > bench_output.txt
+"""
+
+import random
+import sys
+import time
+
+from quiz_selection import KeywordSelectionIndex
+
+
+def build_synthetic_pool(size: int, keyword_count: int, seed: int = 42):
+    rng = random.Random(seed)
+    candidate_ids = list(range(1, size + 1))
+    question_keywords = {}
+    for qid in candidate_ids:
+        # ~15% de questions sans keyword, sinon 1 à 3 keywords
+        if rng.random() < 0.15:
+            continue
+        question_keywords[qid] = frozenset(rng.sample(range(1, keyword_count + 1), rng.randint(1, 3)))
+    seen = set(rng.sample(candidate_ids, size // 3))
+    answered_keywords = set(rng.sample(range(1, keyword_count + 1), keyword_count // 4))
+    used_keywords = set(rng.sample(range(1, keyword_count + 1), 10))
+    return candidate_ids, question_keywords, seen, answered_keywords, used_keywords
+
+
+def legacy_select(candidate_ids, question_keywords, seen, used_keywords, answered_keywords, prevent_duplicate_keywords, quota):
+    """Reproduction de l'ancien algorithme (tri complet sur un tuple de score)."""
+    current_used_keywords = set(used_keywords)
+
+    def score_question(qid):
+        q_keywords = set(question_keywords.get(qid, ()))
+        has_duplicate_keyword = bool(prevent_duplicate_keywords and q_keywords and (q_keywords & current_used_keywords))
+        has_unanswered_keywords = bool(q_keywords and answered_keywords and (q_keywords & answered_keywords))
+        return (not has_duplicate_keyword, qid not in seen, not has_unanswered_keywords, len(q_keywords) == 0)
+
+    selected = []
+    for qid in sorted(candidate_ids, key=score_question, reverse=True):
+        if len(selected) >= quota:
+            break
+        selected.append(qid)
+        current_used_keywords.update(question_keywords.get(qid, ()))
+    return selected
+
+
+def timed(fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    quota = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    keyword_count = max(50, size // 25)
+    candidate_ids, question_keywords, seen, answered_keywords, used_keywords = build_synthetic_pool(size, keyword_count)
+
+    print(f"=== Benchmark sélection: {size} candidats, {keyword_count} keywords, quota {quota} ===")
+    print(f"Questions vues: {len(seen)}, keywords répondus: {len(answered_keywords)}, keywords déjà utilisés: {len(used_keywords)}")
+
+    legacy_ms = timed(lambda: legacy_select(candidate_ids, question_keywords, seen, used_keywords, answered_keywords, True, quota), 3)
+    print(f"Ancien algorithme (tri complet)         : {legacy_ms:8.2f} ms")
+
+    build_ms = timed(lambda: KeywordSelectionIndex(candidate_ids, question_keywords), 3)
+    print(f"Construction de l'index (une fois/pool) : {build_ms:8.2f} ms")
+
+    index = KeywordSelectionIndex(candidate_ids, question_keywords)
+    rng = random.Random(1)
+
+    def run():
+        return index.select(quota, seen, used_keywords, answered_keywords, True, rng=rng)
+
+    run()  # premier appel: calcul des masques de keywords mis en cache
+    select_ms = timed(run, 10)
+    print(f"Sélection avec index en cache           : {select_ms:8.2f} ms")
+
+    selected, _, stats = run()
+    print(f"Sélectionnés: {len(selected)}/{quota}, conditions parfaites: {'OUI' if stats['perfect'] else 'NON'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,54 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') or 'sqlite:///geocaching_quiz.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # État des parties de quiz côté serveur (sqlite|memory), voir quiz_state.py
+    QUIZ_STATE_BACKEND = os.environ.get('QUIZ_STATE_BACKEND') or 'sqlite'
+    QUIZ_STATE_DB_PATH = os.environ.get('QUIZ_STATE_DB_PATH')  # défaut: instance/quiz_state.db
+    QUIZ_STATE_TTL_SECONDS = int(os.environ.get('QUIZ_STATE_TTL_SECONDS') or 6 * 3600)
+    # Cache LRU de l'historique de jeu par utilisateur, voir quiz_history.py
+    QUIZ_HISTORY_CACHE_SIZE = int(os.environ.get('QUIZ_HISTORY_CACHE_SIZE') or 1024)
+    # Playlists pré-générées par set de règles (0 = désactivé), voir quiz_warmup.py
+    QUIZ_WARM_POOL_SIZE = int(os.environ.get('QUIZ_WARM_POOL_SIZE') or 3)
+    # Compteurs globaux des questions écrits par lots (secondes; 0 = écriture immédiate), voir quiz_counters.py
+    QUIZ_COUNTERS_FLUSH_INTERVAL = float(os.environ.get('QUIZ_COUNTERS_FLUSH_INTERVAL') or 0.3)
+    # Journal de sûreté optionnel: un fichier par processus (<chemin>.<pid>), ex: instance/quiz_counters.journal
+    QUIZ_COUNTERS_JOURNAL = os.environ.get('QUIZ_COUNTERS_JOURNAL')
+    # Fragments HTML rendus des questions/résultats (nombre d'entrées LRU), voir quiz_fragments.py
+    QUIZ_FRAGMENT_CACHE_SIZE = int(os.environ.get('QUIZ_FRAGMENT_CACHE_SIZE') or 2048)
+    # Journalisation: niveau par défaut, niveaux par logger ("quiz.playlist=DEBUG,messages=WARNING"),
+    # part des messages DEBUG conservés (0 à 1), format (text|json) et taille de la file, voir app_logging.py
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_LEVELS = os.environ.get('LOG_LEVELS') or ''
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE') or 1.0)
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or 'text'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000)
+    # Comptage des requêtes SQL par requête HTTP (en-têtes X-SQL-*, alertes N+1 et budget), voir sql_profiler.py
+    SQL_PROFILING = (os.environ.get('SQL_PROFILING') or '').lower() in ('1', 'true', 'yes', 'on')
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD') or 5)
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET') or 0)  # 0 = pas de budget
+    # Conversations par page de la boîte de réception (pagination par curseur), voir messages_inbox.py
+    MESSAGES_PAGE_SIZE = int(os.environ.get('MESSAGES_PAGE_SIZE') or 30)
+    # Messages par page d'un fil de discussion (les plus anciens sont chargés au défilement)
+    MESSAGES_THREAD_PAGE_SIZE = int(os.environ.get('MESSAGES_THREAD_PAGE_SIZE') or 50)
+    # Boîte d'envoi des emails (lots sur une connexion SMTP, nouveaux essais espacés), voir email_outbox.py
+    EMAIL_OUTBOX_POLL_INTERVAL = float(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL') or 5.0)  # 0 = envoi synchrone
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE') or 50)
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS') or 6)
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS = float(os.environ.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS') or 30)
+    # Résumés des nouveaux messages (préférence 'hourly' / 'daily'): vérification des échéances (secondes,
+    # 0 = désactivé) et heure (UTC) du résumé quotidien, voir email_digest.py
+    DIGEST_INTERVAL_SECONDS = float(os.environ.get('DIGEST_INTERVAL_SECONDS') or 60)
+    DIGEST_DAILY_HOUR = int(os.environ.get('DIGEST_DAILY_HOUR') or 7)
+    # Événements temps réel de la messagerie (SSE), désactivés par défaut: chaque onglet ouvert garde une
+    # réponse en cours, ce qui bloque un worker d'un serveur WSGI synchrone sans threads (PythonAnywhere).
+    # À activer seulement derrière un serveur threadé ou asynchrone (gunicorn --threads / gevent, ...).
+    MESSAGE_EVENTS_ENABLED = (os.environ.get('MESSAGE_EVENTS_ENABLED') or '').lower() in ('1', 'true', 'yes', 'on')
+    # 'local' (un processus) ou 'poll' (plusieurs workers, lecture des nouveaux messages en base toutes les
+    # N secondes); durée max d'une connexion (le navigateur se reconnecte) et intervalle des keepalive
+    MESSAGE_EVENTS_BACKEND = os.environ.get('MESSAGE_EVENTS_BACKEND') or 'local'
+    MESSAGE_EVENTS_POLL_INTERVAL = float(os.environ.get('MESSAGE_EVENTS_POLL_INTERVAL') or 2.0)
+    MESSAGE_EVENTS_MAX_SECONDS = float(os.environ.get('MESSAGE_EVENTS_MAX_SECONDS') or 300)
+    MESSAGE_EVENTS_KEEPALIVE_SECONDS = float(os.environ.get('MESSAGE_EVENTS_KEEPALIVE_SECONDS') or 15)
     
 class DevelopmentConfig(Config):
     """Configuration de développement"""
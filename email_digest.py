@@ -0,0 +1,206 @@
+"""
+Résumés email des nouveaux messages (immédiat / toutes les heures / quotidien).
+
+Un fil de signalement actif envoyait un email par réponse et par destinataire.
+Chaque utilisateur choisit désormais, à côté de `notify_email_on_message`, un
+mode `notify_email_digest` dans ses préférences:
+- 'immediate': un email par message (boîte d'envoi, comme avant);
+- 'hourly' / 'daily': le message est noté dans `pending_notifications`, et un
+  seul email regroupe, par conversation, tous les messages notés depuis le
+  résumé précédent.
+
+Un résumé couvre les messages notés avant la dernière échéance: l'heure pleine
+en mode 'hourly', DIGEST_DAILY_HOUR (UTC) en mode 'daily'. Les conversations
+lues entre-temps (plus aucun non lu) ne sont pas rappelées. Le passage au mode
+'immediate' envoie au tour suivant les messages encore en attente.
+
+Le planificateur (DigestScheduler) vérifie les échéances toutes les
+`interval` secondes dans un thread de fond; les emails passent par la boîte
+d'envoi (email_outbox). Sans threads (PythonAnywhere), une tâche planifiée
+lance `python scheduled_tasks.py`, qui appelle `run_due()`. Les lignes d'un résumé sont supprimées dans la
+transaction qui ajoute l'email: si un autre processus les a déjà traitées, la
+transaction est annulée (pas de doublon).
+"""
+
+import atexit
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, User, Conversation, ConversationMessage, ConversationParticipant, PendingNotification
+from email_outbox import enqueue_email
+from email_utils import smtp_settings
+from app_logging import get_logger
+
+
+log = get_logger('messages.digest')
+
+
+DIGEST_MODES = ('immediate', 'hourly', 'daily')
+DEFAULT_INTERVAL_SECONDS = 60
+DEFAULT_DAILY_HOUR = 7
+MESSAGES_PER_CONVERSATION = 3
+EXCERPT_LENGTH = 200
+
+
+def digest_mode(user: User) -> str:
+    mode = user.get_preferences().get('notify_email_digest')
+    return mode if mode in DIGEST_MODES else 'immediate'
+
+
+def queue_message_notification(recipient: User, conversation_id: int, message: ConversationMessage,
+                               subject: str, body: str, messages_url: str | None = None) -> bool:
+    """Notifie un destinataire d'un nouveau message selon ses préférences (dans la transaction courante).
+
+    Email immédiat (boîte d'envoi) ou entrée pour son prochain résumé; retourne False
+    si le destinataire n'a pas activé les notifications (ou pas d'email / de SMTP).
+    """
+    if not recipient.email or not recipient.get_preferences().get('notify_email_on_message'):
+        return False
+    if digest_mode(recipient) == 'immediate':
+        return enqueue_email(recipient.email, subject, body) is not None
+    if smtp_settings() is None:
+        return False
+    if message.id is None:
+        db.session.flush()
+    db.session.add(PendingNotification(user_id=recipient.id, conversation_id=conversation_id,
+                                       message_id=message.id, messages_url=messages_url))
+    return True
+
+
+def digest_cutoff(mode: str, now: datetime, daily_hour: int = DEFAULT_DAILY_HOUR) -> datetime:
+    """Dernière échéance du mode à `now`: les messages notés avant sont à envoyer."""
+    if mode == 'hourly':
+        return now.replace(minute=0, second=0, microsecond=0)
+    if mode == 'daily':
+        cutoff = now.replace(hour=daily_hour, minute=0, second=0, microsecond=0)
+        return cutoff if cutoff <= now else cutoff - timedelta(days=1)
+    return now
+
+
+def _excerpt(text: str) -> str:
+    text = ' '.join((text or '').split())
+    return text if len(text) <= EXCERPT_LENGTH else text[:EXCERPT_LENGTH - 1] + '…'
+
+
+def build_digest(username: str, conversations: list[dict], messages_url: str | None) -> tuple[str, str]:
+    """(sujet, corps) d'un résumé; `conversations`: [{'subject', 'messages': [(expéditeur, date, contenu)]}]."""
+    total = sum(len(c['messages']) for c in conversations)
+    subject = f"{total} nouveau(x) message(s) dans {len(conversations)} conversation(s)"
+    lines = [f"Bonjour {username},", "", f"Vous avez {subject} :", ""]
+    for conversation in conversations:
+        messages = conversation['messages']
+        lines.append(f"— {conversation['subject'] or 'Conversation'} ({len(messages)} message(s))")
+        for sender, created_at, content in messages[-MESSAGES_PER_CONVERSATION:]:
+            lines.append(f"  {sender} ({created_at.strftime('%d/%m/%Y %H:%M')}) : {_excerpt(content)}")
+        if len(messages) > MESSAGES_PER_CONVERSATION:
+            lines.append(f"  … et {len(messages) - MESSAGES_PER_CONVERSATION} message(s) plus ancien(s)")
+        lines.append("")
+    if messages_url:
+        lines.append(f"Accéder à la messagerie: {messages_url}")
+    return f"Résumé: {subject}", '\n'.join(lines)
+
+
+class DigestScheduler:
+    """Envoi périodique des résumés dus (thread de fond)."""
+
+    def __init__(self, app, outbox=None, interval: float = DEFAULT_INTERVAL_SECONDS, daily_hour: int = DEFAULT_DAILY_HOUR):
+        self.app = app
+        self.outbox = outbox
+        self.interval = float(interval)
+        self.daily_hour = int(daily_hour) % 24
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        atexit.register(self.stop)
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='email-digest', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_due()
+            except Exception as e:
+                log.exception("Erreur d'envoi des résumés: %s", e)
+
+    def stop(self):
+        self._stopped.set()
+
+    def run_due(self, now: datetime | None = None, wake_outbox: bool = True) -> int:
+        """Ajoute à la boîte d'envoi les résumés dus; retourne le nombre d'emails.
+
+        `wake_outbox=False`: la boîte d'envoi est vidée ensuite par l'appelant (tâche planifiée).
+        """
+        now = now or datetime.utcnow()
+        sent = 0
+        with self._run_lock, self.app.app_context():
+            user_ids = [row[0] for row in db.session.execute(select(PendingNotification.user_id).distinct())]
+            for user_id in user_ids:
+                try:
+                    if self._send_user_digest(user_id, now):
+                        sent += 1
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    log.warning("Résumé de l'utilisateur %s non envoyé: %s", user_id, e)
+        if sent and wake_outbox and self.outbox is not None:
+            self.outbox.wake()
+        if sent:
+            log.info("%s résumé(s) ajouté(s) à la boîte d'envoi", sent)
+        return sent
+
+    def _send_user_digest(self, user_id: int, now: datetime) -> bool:
+        user = db.session.get(User, user_id)
+        pending = PendingNotification.query.filter(PendingNotification.user_id == user_id)
+        if user is None:
+            # Compte supprimé
+            pending.delete(synchronize_session=False)
+            return False
+        cutoff = digest_cutoff(digest_mode(user), now, self.daily_hour)
+        due_ids = [row[0] for row in db.session.query(PendingNotification.id).filter(
+            PendingNotification.user_id == user_id, PendingNotification.created_at <= cutoff)]
+        if not due_ids:
+            return False
+
+        # Messages encore existants, dans des conversations que l'utilisateur n'a pas lues depuis
+        rows = db.session.execute(
+            select(Conversation.id, Conversation.subject, User.username, ConversationMessage.created_at,
+                   ConversationMessage.content, PendingNotification.messages_url)
+            .select_from(PendingNotification)
+            .join(ConversationMessage, ConversationMessage.id == PendingNotification.message_id)
+            .join(Conversation, Conversation.id == PendingNotification.conversation_id)
+            .join(ConversationParticipant, (ConversationParticipant.conversation_id == Conversation.id)
+                  & (ConversationParticipant.user_id == user_id))
+            .outerjoin(User, User.id == ConversationMessage.sender_id)
+            .where(PendingNotification.id.in_(due_ids), ConversationParticipant.unread_count > 0)
+            .order_by(ConversationMessage.created_at)
+        ).all()
+
+        conversations: dict[int, dict] = {}
+        messages_url = None
+        for conversation_id, subject, sender, created_at, content, url in rows:
+            entry = conversations.setdefault(conversation_id, {'subject': subject, 'messages': []})
+            entry['messages'].append((sender or 'Système', created_at, content))
+            messages_url = url or messages_url
+
+        queued = False
+        if conversations and user.email and user.get_preferences().get('notify_email_on_message'):
+            # Conversation la plus récemment active en premier
+            ordered = sorted(conversations.values(), key=lambda c: c['messages'][-1][1], reverse=True)
+            subject, body = build_digest(user.username, ordered, messages_url)
+            queued = enqueue_email(user.email, subject, body) is not None
+
+        deleted = PendingNotification.query.filter(PendingNotification.id.in_(due_ids)).delete(synchronize_session=False)
+        if deleted != len(due_ids):
+            raise RuntimeError("résumé déjà traité par un autre processus")
+        return queued
@@ -0,0 +1,285 @@
+"""
+Boîte d'envoi des emails de notification, vidée par un thread de fond.
+
+L'envoi d'un message (et la création d'un signalement ou d'un message de contact)
+appelait `send_email_optional` dans la requête: une connexion SMTP, STARTTLS et
+login par destinataire. Un serveur SMTP lent bloquait le worker HTTP.
+
+Les emails sont désormais ajoutés à la table `email_outbox` dans la transaction
+de la requête (`enqueue_email`): ils ne partent que si le message est bien
+enregistré, et ne sont pas perdus si le processus s'arrête avant l'envoi.
+
+Un thread de fond (OutboxSender) réclame les emails dus par lots (`locked_by`,
+utilisable par plusieurs processus), les envoie sur une seule connexion SMTP par
+lot, et les marque envoyés. En cas d'échec temporaire (connexion, code 4xx),
+l'email est reprogrammé avec un délai exponentiel (`retry_base_seconds`,
+doublé à chaque essai); un refus définitif (code 5xx) ou `max_attempts` essais
+le passent en 'failed'. Un lot réclamé par un processus arrêté en cours d'envoi
+est repris après `lock_timeout` secondes.
+
+Avec `poll_interval <= 0`, la boîte est vidée immédiatement après chaque requête
+(mode synchrone, tests).
+
+Sur un serveur WSGI sans threads (PythonAnywhere), le thread de fond ne démarre
+pas ou n'est jamais exécuté: `wake()` vide alors la boîte après le commit de la
+requête, comme en mode synchrone. Le thread est considéré arrêté s'il n'a pas
+tourné depuis `2 × poll_interval + HEARTBEAT_GRACE_SECONDS`. Les nouveaux
+essais (emails reprogrammés) n'attendent pas de requête si une tâche planifiée
+lance `python scheduled_tasks.py`.
+"""
+
+import atexit
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, update
+
+from models import db, EmailOutbox
+from email_utils import build_message, smtp_connection, smtp_settings
+from app_logging import get_logger
+
+
+log = get_logger('messages.outbox')
+
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_RETRY_BASE_SECONDS = 30
+MAX_RETRY_DELAY_SECONDS = 6 * 3600
+DEFAULT_LOCK_TIMEOUT = 600
+DEFAULT_RETENTION_DAYS = 7
+PURGE_INTERVAL_SECONDS = 3600
+HEARTBEAT_GRACE_SECONDS = 10
+
+
+def enqueue_email(to_email: str, subject: str, body: str) -> EmailOutbox | None:
+    """Ajoute un email à la boîte d'envoi, dans la transaction courante (sans commit).
+
+    Ne fait rien si l'envoi d'emails n'est pas configuré (comme send_email_optional).
+    """
+    if not to_email or smtp_settings() is None:
+        return None
+    entry = EmailOutbox(to_email=to_email, subject=subject, body=body, status=STATUS_PENDING,
+                        attempts=0, next_attempt_at=datetime.utcnow())
+    db.session.add(entry)
+    return entry
+
+
+def _smtp_code(error: Exception) -> int | None:
+    code = getattr(error, 'smtp_code', None)
+    if code is None and isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        code = next(iter(error.recipients.values()))[0]
+    return code
+
+
+class OutboxSender:
+    """Envoi par lots des emails de la boîte d'envoi (une connexion SMTP par lot)."""
+
+    def __init__(self, app, batch_size: int = DEFAULT_BATCH_SIZE, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, retry_base_seconds: float = DEFAULT_RETRY_BASE_SECONDS,
+                 lock_timeout: float = DEFAULT_LOCK_TIMEOUT, retention_days: int = DEFAULT_RETENTION_DAYS):
+        self.app = app
+        self.batch_size = max(int(batch_size), 1)
+        self.poll_interval = float(poll_interval)
+        self.max_attempts = max(int(max_attempts), 1)
+        self.retry_base_seconds = float(retry_base_seconds)
+        self.lock_timeout = float(lock_timeout)
+        self.retention_days = int(retention_days)
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Dernier tour de boucle du thread (time.monotonic)
+        self._heartbeat = 0.0
+        self._last_purge = 0.0
+        atexit.register(self.stop)
+
+    # ---------- Déclenchement ----------
+
+    def wake(self):
+        """À appeler après le commit d'une requête qui a ajouté des emails."""
+        if self.poll_interval <= 0:
+            # Mode synchrone: envoi immédiat
+            self.drain()
+            return
+        if self.start() and self.thread_running():
+            self._wake.set()
+            return
+        # Thread absent ou bloqué (serveur sans threads): envoi dans la requête, sauf si un envoi est en cours
+        try:
+            self.drain(wait=False)
+        except Exception as e:
+            log.exception("Erreur de la boîte d'envoi: %s", e)
+
+    def start(self) -> bool:
+        """Démarre le thread de fond (s'il n'est pas déjà lancé) si l'envoi d'emails est configuré.
+
+        Retourne False si le thread ne peut pas être lancé (mode synchrone, SMTP non configuré,
+        threads indisponibles).
+        """
+        if self.poll_interval <= 0 or smtp_settings() is None:
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            self._stopped.clear()
+            self._heartbeat = time.monotonic()
+            thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            try:
+                thread.start()
+            except RuntimeError as e:
+                log.warning("Thread de la boîte d'envoi non démarré, envoi dans les requêtes: %s", e)
+                return False
+            self._thread = thread
+            return True
+
+    def thread_running(self) -> bool:
+        """Le thread de fond tourne (vivant et passé dans sa boucle récemment)."""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        return time.monotonic() - self._heartbeat <= 2 * self.poll_interval + HEARTBEAT_GRACE_SECONDS
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._heartbeat = time.monotonic()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.drain()
+            except Exception as e:
+                log.exception("Erreur de la boîte d'envoi: %s", e)
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    # ---------- Envoi ----------
+
+    def drain(self, max_batches: int | None = None, wait: bool = True) -> int:
+        """Envoie les emails dus, lot par lot; retourne le nombre d'emails traités.
+
+        Avec `wait=False`, ne fait rien si un envoi est déjà en cours dans ce processus.
+        """
+        processed = 0
+        batches = 0
+        if not self._drain_lock.acquire(blocking=wait):
+            return 0
+        try:
+            while max_batches is None or batches < max_batches:
+                count = self.process_batch()
+                if not count:
+                    break
+                processed += count
+                batches += 1
+            if time.time() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.time()
+                self.purge_sent()
+        finally:
+            self._drain_lock.release()
+        return processed
+
+    def process_batch(self) -> int:
+        with self.app.app_context():
+            try:
+                entries = self._claim()
+                if not entries:
+                    return 0
+                self._send(entries)
+                db.session.commit()
+                return len(entries)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _claim(self) -> list[EmailOutbox]:
+        """Réserve un lot d'emails dus (ou abandonnés par un autre processus) pour ce thread."""
+        now = datetime.utcnow()
+        due = or_(
+            and_(EmailOutbox.status == STATUS_PENDING, EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == STATUS_SENDING, EmailOutbox.locked_at < now - timedelta(seconds=self.lock_timeout)),
+        )
+        ids = [row[0] for row in db.session.query(EmailOutbox.id).filter(due).order_by(EmailOutbox.id).limit(self.batch_size)]
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        # Même condition dans l'UPDATE: un autre processus a pu réserver ces lignes entre-temps
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids), due)
+            .values(status=STATUS_SENDING, locked_by=token, locked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return EmailOutbox.query.filter_by(locked_by=token, status=STATUS_SENDING).order_by(EmailOutbox.id).all()
+
+    def _send(self, entries: list[EmailOutbox]):
+        sent = 0
+        try:
+            with smtp_connection() as (smtp, sender):
+                for entry in entries:
+                    message = build_message(sender, entry.to_email, entry.subject, entry.body)
+                    try:
+                        smtp.sendmail(sender, [entry.to_email], message.as_string())
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        # Refus propre à cet email: la connexion reste utilisable pour les suivants
+                        self._failed_attempt(entry, e)
+                        continue
+                    self._mark_sent(entry)
+                    sent += 1
+        except Exception as e:
+            # Connexion, STARTTLS, login ou déconnexion en cours de lot: les emails restants sont reprogrammés
+            log.warning("Envoi SMTP interrompu après %s email(s): %s", sent, e)
+            for entry in entries:
+                if entry.status == STATUS_SENDING:
+                    self._failed_attempt(entry, e)
+        log.info("Boîte d'envoi: %s email(s) envoyé(s) sur %s", sent, len(entries))
+
+    def _mark_sent(self, entry: EmailOutbox):
+        entry.status = STATUS_SENT
+        entry.attempts += 1
+        entry.sent_at = datetime.utcnow()
+        entry.locked_by = None
+        entry.last_error = None
+
+    def _failed_attempt(self, entry: EmailOutbox, error: Exception):
+        entry.attempts += 1
+        entry.locked_by = None
+        entry.last_error = str(error)[:500]
+        code = _smtp_code(error)
+        if (code is not None and 500 <= code < 600) or entry.attempts >= self.max_attempts:
+            entry.status = STATUS_FAILED
+            log.warning("Email %s vers %s abandonné après %s essai(s): %s", entry.id, entry.to_email, entry.attempts, error)
+            return
+        delay = min(self.retry_base_seconds * (2 ** (entry.attempts - 1)), MAX_RETRY_DELAY_SECONDS)
+        entry.status = STATUS_PENDING
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    def purge_sent(self) -> int:
+        """Supprime les emails envoyés depuis plus de `retention_days` jours."""
+        if self.retention_days <= 0:
+            return 0
+        with self.app.app_context():
+            limit = datetime.utcnow() - timedelta(days=self.retention_days)
+            deleted = EmailOutbox.query.filter(EmailOutbox.status == STATUS_SENT, EmailOutbox.sent_at < limit).delete(synchronize_session=False)
+            db.session.commit()
+            return deleted
+
+    def stats(self) -> dict:
+        """Nombre d'emails par statut."""
+        with self.app.app_context():
+            rows = db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all()
+            return {status: count for status, count in rows}
@@ -1,5 +1,6 @@
 import os
 import smtplib
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 
 
@@ -7,35 +8,49 @@ def _smtp_configured():
     return bool(os.environ.get('MAIL_SERVER'))
 
 
-def send_email_optional(to_email: str, subject: str, body: str):
-    """
-    Envoie un email si la configuration SMTP est présente, sinon ne fait rien.
-    """
+def smtp_settings() -> dict | None:
+    """Paramètres SMTP lus dans l'environnement (None si l'envoi d'emails n'est pas configuré)."""
     if not _smtp_configured():
-        return
-
-    server = os.environ.get('MAIL_SERVER')
-    port = int(os.environ.get('MAIL_PORT') or 587)
+        return None
     username = os.environ.get('MAIL_USERNAME')
-    password = os.environ.get('MAIL_PASSWORD')
-    use_tls = os.environ.get('MAIL_USE_TLS', '1') == '1'
-    default_sender = os.environ.get('MAIL_DEFAULT_SENDER') or username
+    settings = {
+        'server': os.environ.get('MAIL_SERVER'),
+        'port': int(os.environ.get('MAIL_PORT') or 587),
+        'username': username,
+        'password': os.environ.get('MAIL_PASSWORD'),
+        'use_tls': os.environ.get('MAIL_USE_TLS', '1') == '1',
+        'sender': os.environ.get('MAIL_DEFAULT_SENDER') or username,
+        'timeout': float(os.environ.get('MAIL_TIMEOUT') or 30),
+    }
+    if not settings['sender']:
+        return None
+    return settings
 
-    if not (server and default_sender):
-        return
 
+def build_message(sender: str, to_email: str, subject: str, body: str) -> MIMEText:
     msg = MIMEText(body, _charset='utf-8')
     msg['Subject'] = subject
-    msg['From'] = default_sender
+    msg['From'] = sender
     msg['To'] = to_email
+    return msg
+
 
-    smtp = smtplib.SMTP(server, port)
+@contextmanager
+def smtp_connection(settings: dict | None = None):
+    """Connexion SMTP ouverte (STARTTLS et login selon la configuration), réutilisable pour plusieurs envois.
+
+    Produit (connexion, expéditeur); lève RuntimeError si l'envoi n'est pas configuré.
+    """
+    settings = settings or smtp_settings()
+    if settings is None:
+        raise RuntimeError("Envoi d'emails non configuré (MAIL_SERVER / MAIL_DEFAULT_SENDER)")
+    smtp = smtplib.SMTP(settings['server'], settings['port'], timeout=settings['timeout'])
     try:
-        if use_tls:
+        if settings['use_tls']:
             smtp.starttls()
-        if username and password:
-            smtp.login(username, password)
-        smtp.sendmail(default_sender, [to_email], msg.as_string())
+        if settings['username'] and settings['password']:
+            smtp.login(settings['username'], settings['password'])
+        yield smtp, settings['sender']
     finally:
         try:
             smtp.quit()
@@ -43,3 +58,13 @@ def send_email_optional(to_email: str, subject: str, body: str):
             pass
 
 
+def send_email_optional(to_email: str, subject: str, body: str):
+    """
+    Envoie un email si la configuration SMTP est présente, sinon ne fait rien.
+    """
+    settings = smtp_settings()
+    if settings is None:
+        return
+
+    with smtp_connection(settings) as (smtp, sender):
+        smtp.sendmail(sender, [to_email], build_message(sender, to_email, subject, body).as_string())
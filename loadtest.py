@@ -0,0 +1,351 @@
+"""
+Test de charge du parcours de quiz: N joueurs simulés en parallèle.
+
+Chaque joueur (un thread, avec ses propres cookies) enchaîne des parties comme
+un navigateur: `/play/<slug>`, puis `/api/quiz/next` et `/api/quiz/answer` en
+boucle jusqu'à l'écran final, avec un temps de réflexion aléatoire avant chaque
+réponse et avant de passer à la question suivante. Comme le navigateur, le
+joueur utilise la question suivante embarquée dans le résultat (`embed_next`)
+quand elle est présente; `--no-embed` force un appel à `/api/quiz/next`.
+
+Deux modes:
+- par défaut, l'application est appelée dans le processus via le test client
+  Flask (base et stockage configurés par les variables d'environnement habituelles:
+  pointer DATABASE_URI vers une copie de la base, les réponses y sont écrites);
+- avec `--url`, les requêtes sont envoyées en HTTP à un serveur déjà lancé.
+
+Rapport: débit, latences p50/p95/p99 par endpoint, erreurs, et (mode test client
+sur SQLite uniquement) les écritures SQLAlchemy ayant attendu plus de
+`--lock-threshold-ms` ainsi que les erreurs "database is locked". Le fichier du
+stockage d'état de quiz (quiz_state) n'est pas instrumenté.
+
+Usage:
+    python loadtest.py <slug> [--players 20] [--duration 60] [--think-min 1 --think-max 3]
+    python loadtest.py <slug> --url http://127.0.0.1:5000 --players 50 --duration 120
+    python loadtest.py <slug> --think-min 0 --think-max 0 --fail-p95-ms 250
+"""
+
+import argparse
+import html
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib import error as urlerror
+from urllib import parse as urlparse
+from urllib import request as urlrequest
+
+
+ENDPOINTS = ('play', 'next', 'answer')
+
+_FORM_PATTERN = re.compile(r'<form class="answers-grid".*?</form>', re.DOTALL)
+_HIDDEN_PATTERN = re.compile(r'<input type="hidden" name="(\w+)" value="([^"]*)">')
+_CHOICE_PATTERN = re.compile(r'name="selected_answer" value="(\d+)"')
+_EMBED_PATTERN = re.compile(r'<template id="quiz-next-question"[^>]*>(.*?)</template>', re.DOTALL)
+_NEXT_HISTORY_PATTERN = re.compile(r'"history": "([^"]*)"')
+
+
+# ---------- Analyse des pages ----------
+
+def parse_question(page: str) -> dict | None:
+    """Champs du formulaire de réponse (None si la page n'affiche pas de question)."""
+    match = _FORM_PATTERN.search(page)
+    if not match:
+        return None
+    form = match.group(0)
+    fields = {name: html.unescape(value) for name, value in _HIDDEN_PATTERN.findall(form)}
+    positions = _CHOICE_PATTERN.findall(form)
+    if 'question_id' not in fields or not positions:
+        return None
+    return {'fields': fields, 'positions': positions}
+
+
+def parse_embedded_next(page: str) -> str | None:
+    match = _EMBED_PATTERN.search(page)
+    return match.group(1) if match else None
+
+
+def parse_next_history(page: str) -> str:
+    match = _NEXT_HISTORY_PATTERN.search(page)
+    return html.unescape(match.group(1)) if match else ''
+
+
+# ---------- Transports ----------
+
+class TestClientTransport:
+    """Requêtes dans le processus, via le test client Flask (un client par joueur)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path: str, params: dict | None = None) -> tuple[int, str]:
+        response = self.client.get(path, query_string=params or {})
+        return response.status_code, response.get_data(as_text=True)
+
+    def post(self, path: str, data: dict) -> tuple[int, str]:
+        response = self.client.post(path, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpTransport:
+    """Requêtes HTTP vers un serveur lancé à part (cookies propres au joueur)."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urlrequest.build_opener(urlrequest.HTTPCookieProcessor(CookieJar()))
+
+    def _open(self, req) -> tuple[int, str]:
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urlerror.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+        except (urlerror.URLError, OSError) as e:
+            return 0, str(e)
+
+    def get(self, path: str, params: dict | None = None) -> tuple[int, str]:
+        url = self.base_url + path
+        if params:
+            url += '?' + urlparse.urlencode(params)
+        return self._open(urlrequest.Request(url))
+
+    def post(self, path: str, data: dict) -> tuple[int, str]:
+        body = urlparse.urlencode(data).encode('utf-8')
+        return self._open(urlrequest.Request(self.base_url + path, data=body, method='POST'))
+
+
+# ---------- Mesures ----------
+
+class LoadStats:
+    """Latences et statuts par endpoint, partagés entre les joueurs."""
+
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.games = 0
+        self.answers = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: int):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if status != 200:
+                self.errors[endpoint] += 1
+            if endpoint == 'answer' and status == 200:
+                self.answers += 1
+
+    def game_completed(self):
+        with self._lock:
+            self.games += 1
+
+
+class SQLiteLockMonitor:
+    """Compte les écritures SQLite lentes (attente du verrou) et les erreurs 'database is locked'."""
+
+    _WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+    def __init__(self, engine, threshold_ms: float):
+        from sqlalchemy import event
+
+        self.threshold = threshold_ms / 1000.0
+        self.slow_writes = 0
+        self.wait_seconds = 0.0
+        self.locked_errors = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'handle_error', self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('loadtest_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('loadtest_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if elapsed >= self.threshold and statement.lstrip().upper().startswith(self._WRITE_PREFIXES):
+            with self._lock:
+                self.slow_writes += 1
+                self.wait_seconds += elapsed
+
+    def _error(self, context):
+        started = context.connection.info.get('loadtest_started') if context.connection is not None else None
+        if started:
+            started.pop()
+        if 'database is locked' in str(context.original_exception):
+            with self._lock:
+                self.locked_errors += 1
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Percentile (rang le plus proche) d'une liste triée."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+# ---------- Joueur simulé ----------
+
+class Player(threading.Thread):
+    def __init__(self, number: int, transport, slug: str, stats: LoadStats, deadline: float,
+                 start_delay: float, think: tuple[float, float], use_embed: bool, seed: int):
+        super().__init__(name=f'player-{number}', daemon=True)
+        self.transport = transport
+        self.slug = slug
+        self.stats = stats
+        self.deadline = deadline
+        self.start_delay = start_delay
+        self.think_range = think
+        self.use_embed = use_embed
+        self.rng = random.Random(seed)
+
+    def _timed(self, endpoint: str, call, *args) -> tuple[int, str]:
+        started = time.perf_counter()
+        status, body = call(*args)
+        self.stats.record(endpoint, time.perf_counter() - started, status)
+        return status, body
+
+    def _think(self) -> bool:
+        """Attend le temps de réflexion; False si la durée du test est écoulée."""
+        low, high = self.think_range
+        if high > 0:
+            time.sleep(self.rng.uniform(low, high))
+        return time.time() < self.deadline
+
+    def run(self):
+        time.sleep(self.start_delay)
+        while time.time() < self.deadline:
+            if not self.play_game():
+                # Page inattendue (set introuvable, erreur serveur): éviter de boucler à vide
+                time.sleep(1.0)
+
+    def play_game(self) -> bool:
+        status, _ = self._timed('play', self.transport.get, f'/play/{self.slug}')
+        if status != 200:
+            return False
+        status, page = self._timed('next', self.transport.get, '/api/quiz/next',
+                                   {'rule_set': self.slug, 'history': ''})
+        while status == 200:
+            question = parse_question(page)
+            if question is None:
+                # Écran final (ou animation du quiz parfait)
+                self.stats.game_completed()
+                return True
+            if not self._think():
+                return True
+            data = dict(question['fields'])
+            if not self.use_embed:
+                data.pop('embed_next', None)
+            data['selected_answer'] = self.rng.choice(question['positions'])
+            status, result = self._timed('answer', self.transport.post, '/api/quiz/answer', data)
+            if status != 200 or not self._think():
+                return status == 200
+            embedded = parse_embedded_next(result) if self.use_embed else None
+            if embedded is not None:
+                page = embedded
+                continue
+            status, page = self._timed('next', self.transport.get, '/api/quiz/next',
+                                       {'rule_set': self.slug, 'history': parse_next_history(result)})
+        return False
+
+
+# ---------- Programme principal ----------
+
+def print_report(stats: LoadStats, elapsed: float, lock_monitor: SQLiteLockMonitor | None, mode: str) -> dict:
+    print(f"\n=== Résultats ({mode}, {elapsed:.1f} s) ===")
+    print(f"{'Endpoint':<10} {'requêtes':>9} {'erreurs':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    summary = {}
+    all_latencies = []
+    for name in ENDPOINTS + ('total',):
+        if name == 'total':
+            values = sorted(all_latencies)
+            errors = sum(stats.errors.values())
+        else:
+            values = sorted(stats.latencies[name])
+            errors = stats.errors[name]
+            all_latencies.extend(values)
+        row = {
+            'count': len(values),
+            'p50': percentile(values, 50) * 1000,
+            'p95': percentile(values, 95) * 1000,
+            'p99': percentile(values, 99) * 1000,
+        }
+        summary[name] = row
+        print(f"{name:<10} {len(values):>9} {errors:>8} {len(values) / elapsed:>8.1f} "
+              f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {(values[-1] * 1000 if values else 0):>8.1f}")
+    print(f"Parties terminées: {stats.games}, réponses enregistrées: {stats.answers} ({stats.answers / elapsed:.1f} réponses/s)")
+    if lock_monitor is not None:
+        print(f"Verrous SQLite: {lock_monitor.slow_writes} écriture(s) > {lock_monitor.threshold * 1000:.0f} ms "
+              f"(total {lock_monitor.wait_seconds * 1000:.0f} ms), {lock_monitor.locked_errors} erreur(s) 'database is locked'")
+    else:
+        print("Verrous SQLite: non mesurés (mode HTTP ou base non SQLite)")
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge du parcours de quiz")
+    parser.add_argument('slug', help="slug du set de règles à jouer")
+    parser.add_argument('--players', type=int, default=20, help="nombre de joueurs simultanés")
+    parser.add_argument('--duration', type=float, default=60.0, help="durée du test (secondes)")
+    parser.add_argument('--ramp-up', type=float, default=None, help="étalement des arrivées (secondes)")
+    parser.add_argument('--think-min', type=float, default=1.0, help="temps de réflexion minimum (secondes)")
+    parser.add_argument('--think-max', type=float, default=3.0, help="temps de réflexion maximum (secondes)")
+    parser.add_argument('--url', help="URL d'un serveur lancé à part (sinon test client Flask)")
+    parser.add_argument('--no-embed', action='store_true', help="toujours appeler /api/quiz/next")
+    parser.add_argument('--lock-threshold-ms', type=float, default=50.0, help="seuil d'une écriture SQLite 'en attente'")
+    parser.add_argument('--fail-p95-ms', type=float, default=None, help="code de sortie 1 si le p95 total dépasse ce seuil")
+    parser.add_argument('--seed', type=int, default=None, help="graine des choix des joueurs")
+    args = parser.parse_args(argv)
+
+    think = (max(0.0, args.think_min), max(0.0, args.think_min, args.think_max))
+    ramp_up = args.ramp_up if args.ramp_up is not None else min(args.players * 0.1, 5.0)
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+
+    lock_monitor = None
+    if args.url:
+        mode = f"HTTP {args.url}"
+        make_transport = lambda: HttpTransport(args.url)
+    else:
+        from app import app, db
+
+        mode = "test client"
+        with app.app_context():
+            if db.engine.dialect.name == 'sqlite':
+                lock_monitor = SQLiteLockMonitor(db.engine, args.lock_threshold_ms)
+        make_transport = lambda: TestClientTransport(app)
+
+    print(f"=== Test de charge: set '{args.slug}', {args.players} joueurs, {args.duration:.0f} s ({mode}) ===")
+    print(f"Réflexion {think[0]:.1f}-{think[1]:.1f} s, arrivées étalées sur {ramp_up:.1f} s, "
+          f"question suivante {'via /api/quiz/next' if args.no_embed else 'embarquée si disponible'}, graine {seed}")
+
+    stats = LoadStats()
+    started = time.time()
+    deadline = started + args.duration
+    players = [
+        Player(i, make_transport(), args.slug, stats, deadline,
+               start_delay=ramp_up * i / max(args.players, 1), think=think,
+               use_embed=not args.no_embed, seed=seed + i)
+        for i in range(args.players)
+    ]
+    for player in players:
+        player.start()
+    for player in players:
+        # Une requête en cours peut dépasser l'échéance: marge de 30 s
+        player.join(timeout=max(0.0, deadline - time.time()) + 30)
+    elapsed = max(time.time() - started, 1e-6)
+
+    summary = print_report(stats, elapsed, lock_monitor, mode)
+    if args.fail_p95_ms is not None and summary['total']['p95'] > args.fail_p95_ms:
+        print(f"ÉCHEC: p95 total {summary['total']['p95']:.1f} ms > {args.fail_p95_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
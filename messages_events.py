@@ -0,0 +1,183 @@
+"""
+Événements temps réel de la messagerie (server-sent events).
+
+Le badge des non lus ne changeait qu'au rechargement du widget, et un fil ouvert
+ne voyait les réponses qu'en le rouvrant. Le navigateur d'un utilisateur
+connecté garde désormais une connexion `/api/messages/events` (EventSource) et
+reçoit un événement `message` (conversation, message, nouveau total de non lus)
+à chaque nouveau message d'une de ses conversations: le badge est mis à jour et
+un fil ouvert ajoute uniquement ce message.
+
+Diffusion (MESSAGE_EVENTS_BACKEND):
+- 'local': publication en mémoire, après le commit de l'envoi, aux abonnés du
+  processus (un seul worker, ou développement);
+- 'poll': plusieurs workers. Un thread par processus lit les nouveaux messages
+  en base (id croissant) toutes les `poll_interval` secondes et les distribue
+  aux abonnés locaux concernés; la publication en mémoire est alors ignorée.
+
+Chaque abonnement a une file bornée: si un client ne lit plus, les événements
+en trop sont abandonnés et le client reçoit un événement `resync` (il recharge
+le widget et la liste).
+
+Désactivé par défaut (MESSAGE_EVENTS_ENABLED): une connexion SSE occupe le
+thread qui la sert jusqu'à MESSAGE_EVENTS_MAX_SECONDS. Sur un serveur WSGI
+synchrone à quelques workers sans threads (PythonAnywhere), quelques onglets
+ouverts suffisent à bloquer le site: n'activer qu'avec un serveur threadé ou
+asynchrone. Désactivé, l'endpoint répond 204 et le script n'est pas chargé.
+"""
+
+import atexit
+import queue
+import threading
+
+from sqlalchemy import func, select
+
+from models import db, ConversationMessage, ConversationParticipant
+from app_logging import get_logger
+
+
+log = get_logger('messages.events')
+
+
+BACKENDS = ('local', 'poll')
+DEFAULT_POLL_INTERVAL = 2.0
+SUBSCRIPTION_QUEUE_SIZE = 100
+POLL_BATCH_SIZE = 500
+
+
+class Subscription:
+    """Flux d'événements d'un utilisateur (une connexion SSE)."""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._queue: queue.Queue = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event: dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> dict | None:
+        """Prochain événement, ou None après `timeout` secondes (keepalive)."""
+        if self.overflowed:
+            self.overflowed = False
+            # Des événements ont été perdus: le client resynchronise tout
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return {'type': 'resync'}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MessageEventBroker:
+    """Abonnements SSE du processus et diffusion des nouveaux messages."""
+
+    def __init__(self, app, backend: str = 'local', poll_interval: float = DEFAULT_POLL_INTERVAL):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend d'événements inconnu: {backend}")
+        self.app = app
+        self.backend = backend
+        self.poll_interval = float(poll_interval)
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._poller: threading.Thread | None = None
+        self._last_message_id: int | None = None
+        atexit.register(self.stop)
+
+    # ---------- Abonnements ----------
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        if self.backend == 'poll':
+            self._ensure_poller()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    # ---------- Publication ----------
+
+    def publish_message(self, conversation_id: int, message_id: int, sender_id: int | None, recipient_ids):
+        """Nouveau message (après commit): un événement pour chaque destinataire abonné à ce processus."""
+        if self.backend != 'local':
+            return
+        self._deliver(conversation_id, message_id, sender_id, recipient_ids)
+
+    def _deliver(self, conversation_id: int, message_id: int, sender_id: int | None, recipient_ids):
+        event = {'type': 'message', 'conversation_id': conversation_id, 'message_id': message_id, 'sender_id': sender_id}
+        with self._lock:
+            targets = [s for user_id in recipient_ids for s in self._subscriptions.get(user_id, ())]
+        for subscription in targets:
+            subscription.put(event)
+
+    # ---------- Repli multi-workers: lecture des nouveaux messages en base ----------
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            self._poller = threading.Thread(target=self._poll_loop, name='message-events', daemon=True)
+            self._poller.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _poll_loop(self):
+        while not self._stopped.wait(self.poll_interval):
+            with self._lock:
+                if not self._subscriptions:
+                    # Plus d'abonné: le thread s'arrête (relancé au prochain abonnement)
+                    self._poller = None
+                    self._last_message_id = None
+                    return
+            try:
+                self.poll_once()
+            except Exception as e:
+                log.warning("Lecture des nouveaux messages impossible: %s", e)
+
+    def poll_once(self) -> int:
+        """Distribue les messages créés depuis le dernier passage; retourne leur nombre."""
+        with self.app.app_context():
+            if self._last_message_id is None:
+                self._last_message_id = db.session.execute(select(func.max(ConversationMessage.id))).scalar() or 0
+                return 0
+            messages = db.session.execute(
+                select(ConversationMessage.id, ConversationMessage.conversation_id, ConversationMessage.sender_id)
+                .where(ConversationMessage.id > self._last_message_id)
+                .order_by(ConversationMessage.id)
+                .limit(POLL_BATCH_SIZE)
+            ).all()
+            if not messages:
+                return 0
+            with self._lock:
+                user_ids = list(self._subscriptions)
+            participants: dict[int, list[int]] = {}
+            if user_ids:
+                rows = db.session.execute(
+                    select(ConversationParticipant.conversation_id, ConversationParticipant.user_id)
+                    .where(ConversationParticipant.conversation_id.in_({m.conversation_id for m in messages}),
+                           ConversationParticipant.user_id.in_(user_ids))
+                ).all()
+                for conversation_id, user_id in rows:
+                    participants.setdefault(conversation_id, []).append(user_id)
+        for message_id, conversation_id, sender_id in messages:
+            recipients = [user_id for user_id in participants.get(conversation_id, ()) if user_id != sender_id]
+            self._deliver(conversation_id, message_id, sender_id, recipients)
+        self._last_message_id = messages[-1].id
+        return len(messages)
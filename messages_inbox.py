@@ -0,0 +1,189 @@
+"""
+Boîte de réception de la messagerie en une requête groupée, paginée par curseur.
+
+`/api/messages/list` chargeait chaque ConversationParticipant de l'utilisateur
+puis, par conversation, la conversation, son dernier message et un `count()`
+des non lus, avant de trier en Python: des centaines de requêtes pour un
+modérateur suivant de nombreux signalements.
+
+La page est désormais calculée par une seule requête: participations de
+l'utilisateur jointes aux conversations et (jointure externe) à leurs messages,
+groupées par conversation (date du dernier message). Les conversations sont
+triées par dernière activité (dernier message, sinon création de la
+conversation), puis par id.
+
+Pagination par curseur (keyset) sur (dernière activité, id): la page suivante
+reprend strictement après le dernier élément affiché, sans OFFSET, et reste
+stable si de nouveaux messages arrivent entre deux pages.
+
+Le nombre de non lus est dénormalisé par participation (`unread_count`):
+incrémenté pour les autres participants à chaque message (`record_new_message`,
+dans la transaction de l'insertion), remis à zéro à la lecture (`mark_read`).
+Le widget de connexion, chargé sur chaque page, n'en lit que la somme.
+La règle est celle de l'ancien calcul: messages des autres (ou système)
+postérieurs à `last_read_at`; `recount_unread_counters` la réapplique à toute
+la table (migration, réparation).
+
+Les fils de discussion sont paginés de la même façon (`fetch_thread_page`), sur
+(date, id) des messages: l'ouverture n'affiche que la dernière page, les
+messages plus anciens sont chargés au défilement vers le haut (index
+conversation_id, created_at).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select, text, update
+from sqlalchemy.orm import joinedload
+
+from models import db, Conversation, ConversationParticipant, ConversationMessage
+
+
+DEFAULT_PAGE_SIZE = 30
+DEFAULT_THREAD_PAGE_SIZE = 50
+
+
+def encode_cursor(activity: datetime, conversation_id: int) -> str:
+    return f"{activity.isoformat()}_{conversation_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    """Curseur 'AAAA-MM-JJTHH:MM:SS[.ffffff]_<id>' -> (activité, id); None si invalide."""
+    activity, _, conversation_id = (cursor or '').rpartition('_')
+    if not activity or not conversation_id.isdigit():
+        return None
+    try:
+        return datetime.fromisoformat(activity), int(conversation_id)
+    except ValueError:
+        return None
+
+
+def fetch_inbox(user_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None):
+    """Une page de la boîte de réception: (lignes, curseur de la page suivante ou None).
+
+    Chaque ligne expose `id`, `subject`, `last_at` (dernier message, None si
+    aucun), `unread_count` et `activity` (clé de tri).
+    """
+    message = ConversationMessage
+    participant = ConversationParticipant
+    conversation = Conversation
+
+    last_at = func.max(message.created_at)
+    activity = func.coalesce(last_at, conversation.created_at)
+
+    stmt = (
+        select(
+            conversation.id,
+            conversation.subject,
+            last_at.label('last_at'),
+            participant.unread_count,
+            activity.label('activity'),
+        )
+        .select_from(participant)
+        .join(conversation, conversation.id == participant.conversation_id)
+        .outerjoin(message, message.conversation_id == conversation.id)
+        .where(participant.user_id == user_id)
+        .group_by(conversation.id, conversation.subject, conversation.created_at, participant.unread_count)
+        .order_by(activity.desc(), conversation.id.desc())
+        .limit(limit + 1)
+    )
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        after_activity, after_id = position
+        stmt = stmt.having(or_(activity < after_activity, and_(activity == after_activity, conversation.id < after_id)))
+
+    rows = db.session.execute(stmt).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].activity, rows[-1].id)
+    return rows, next_cursor
+
+
+def fetch_thread_page(conversation_id: int, limit: int = DEFAULT_THREAD_PAGE_SIZE, before: str | None = None):
+    """Une page d'un fil: (messages du plus ancien au plus récent, curseur des messages précédents ou None).
+
+    Sans curseur, les `limit` derniers messages; avec `before`, ceux qui précèdent
+    strictement le message du curseur. Expéditeurs chargés dans la même requête.
+    """
+    message = ConversationMessage
+    stmt = (
+        select(message)
+        .options(joinedload(message.sender))
+        .where(message.conversation_id == conversation_id)
+        .order_by(message.created_at.desc(), message.id.desc())
+        .limit(limit + 1)
+    )
+    position = decode_cursor(before) if before else None
+    if position is not None:
+        before_at, before_id = position
+        stmt = stmt.where(or_(message.created_at < before_at, and_(message.created_at == before_at, message.id < before_id)))
+
+    messages = db.session.execute(stmt).scalars().all()
+    older_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        older_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+    messages.reverse()
+    return messages, older_cursor
+
+
+# ---------- Compteurs de non lus ----------
+
+def record_new_message(conversation_id: int, sender_id: int | None) -> int:
+    """Incrémente `unread_count` des participants autres que l'expéditeur (tous pour un message système).
+
+    À appeler dans la transaction qui insère le message; retourne le nombre de participations mises à jour.
+    """
+    participant = ConversationParticipant
+    stmt = (
+        update(participant)
+        .where(participant.conversation_id == conversation_id)
+        .values(unread_count=participant.unread_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if sender_id is not None:
+        stmt = stmt.where(participant.user_id != sender_id)
+    return db.session.execute(stmt).rowcount
+
+
+def count_unread_messages(conversation_id: int, user_id: int) -> int:
+    """Messages des autres (ou système) d'une conversation, recomptés depuis conversation_messages."""
+    return ConversationMessage.query.filter(
+        ConversationMessage.conversation_id == conversation_id,
+        or_(ConversationMessage.sender_id.is_(None), ConversationMessage.sender_id != user_id),
+    ).count()
+
+
+def mark_read(participant: ConversationParticipant):
+    participant.last_read_at = datetime.utcnow()
+    participant.unread_count = 0
+
+
+def mark_unread(participant: ConversationParticipant):
+    """Remet la conversation en non lue: tous les messages des autres redeviennent non lus."""
+    participant.last_read_at = None
+    participant.unread_count = count_unread_messages(participant.conversation_id, participant.user_id)
+
+
+def total_unread(user_id: int) -> int:
+    """Somme des non lus de l'utilisateur (index sur conversation_participants.user_id)."""
+    total = db.session.execute(
+        select(func.sum(ConversationParticipant.unread_count)).where(ConversationParticipant.user_id == user_id)
+    ).scalar()
+    return int(total or 0)
+
+
+def recount_unread_counters() -> int:
+    """Recalcule `unread_count` de toutes les participations depuis les messages; retourne le nombre de lignes."""
+    result = db.session.execute(text(
+        """
+        UPDATE conversation_participants SET unread_count = (
+            SELECT COUNT(*) FROM conversation_messages m
+            WHERE m.conversation_id = conversation_participants.conversation_id
+              AND (m.sender_id IS NULL OR m.sender_id != conversation_participants.user_id)
+              AND (conversation_participants.last_read_at IS NULL
+                   OR m.created_at > conversation_participants.last_read_at)
+        )
+        """
+    ))
+    return result.rowcount
@@ -0,0 +1,34 @@
+"""
+Migration: index de la messagerie pour la boîte de réception groupée
+
+Index:
+- conversation_messages (conversation_id, created_at): dernier message et non lus par conversation
+- conversation_participants (user_id): participations d'un utilisateur
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+
+def migrate():
+    with app.app_context():
+        print("[MIGRATION] Début migration index messagerie...")
+        try:
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_messages_conversation_created "
+                "ON conversation_messages (conversation_id, created_at)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_participants_user "
+                "ON conversation_participants (user_id)"
+            ))
+            db.session.commit()
+            print("[OK] Index de la messagerie prêts")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERREUR] Migration index messagerie: {e}")
+            raise
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,35 @@
+"""
+Migration: compteur de messages non lus par participation
+
+Champs:
+- conversation_participants.unread_count (INTEGER NOT NULL DEFAULT 0)
+
+Le compteur est ensuite initialisé depuis les messages (messages des autres,
+ou système, postérieurs à last_read_at), comme le calculait le widget.
+"""
+
+from app import app, db
+from messages_inbox import recount_unread_counters
+from sqlalchemy import text
+
+
+def migrate():
+    with app.app_context():
+        print("[MIGRATION] Début migration unread_count...")
+        try:
+            result = db.session.execute(text("PRAGMA table_info(conversation_participants)"))
+            existing_cols = {row[1] for row in result.fetchall()}
+            if 'unread_count' not in existing_cols:
+                db.session.execute(text("ALTER TABLE conversation_participants ADD COLUMN unread_count INTEGER NOT NULL DEFAULT 0"))
+                print("[OK] Colonne unread_count ajoutée")
+            updated = recount_unread_counters()
+            db.session.commit()
+            print(f"[OK] Compteurs recalculés pour {updated} participation(s)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERREUR] Migration unread_count: {e}")
+            raise
+
+
+if __name__ == '__main__':
+    migrate()
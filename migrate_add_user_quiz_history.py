@@ -0,0 +1,55 @@
+"""
+Migration: création de la table user_quiz_history (historique compact par utilisateur)
+
+Champs:
+- id
+- created_at, updated_at
+- user_id (FK users.id, unique)
+- seen_question_ids_csv (questions déjà répondues)
+- answered_keyword_ids_csv (keywords des questions déjà répondues)
+
+La table est ensuite remplie depuis user_question_stats pour tous les utilisateurs
+ayant déjà joué (sinon l'historique est reconstruit au premier quiz de chacun).
+"""
+
+from app import app, db
+from models import UserQuestionStat
+from quiz_history import rebuild_user_history
+from sqlalchemy import text
+
+
+def migrate():
+    with app.app_context():
+        print("[MIGRATION] Début migration user_quiz_history...")
+        try:
+            # Créer la table si absente
+            db.session.execute(text(
+                """
+                CREATE TABLE IF NOT EXISTS user_quiz_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at DATETIME NOT NULL,
+                    updated_at DATETIME NOT NULL,
+                    user_id INTEGER NOT NULL UNIQUE,
+                    seen_question_ids_csv TEXT NOT NULL DEFAULT '',
+                    answered_keyword_ids_csv TEXT NOT NULL DEFAULT '',
+                    FOREIGN KEY(user_id) REFERENCES users(id)
+                )
+                """
+            ))
+            db.session.commit()
+            print("[OK] Table user_quiz_history prête")
+
+            # Remplir l'historique des joueurs existants
+            user_ids = [row[0] for row in db.session.query(UserQuestionStat.user_id).distinct().all()]
+            for user_id in user_ids:
+                rebuild_user_history(user_id)
+            db.session.commit()
+            print(f"[OK] Historique reconstruit pour {len(user_ids)} utilisateur(s)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERREUR] Migration user_quiz_history: {e}")
+            raise
+
+
+if __name__ == '__main__':
+    migrate()
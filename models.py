@@ -5,6 +5,15 @@ import json
 db = SQLAlchemy()
 
 
+def dialect_insert(table):
+    """INSERT propre au dialecte de la base (SQLite/PostgreSQL), pour `on_conflict_do_update`."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 # Table d'association many-to-many entre Question et Country
 question_countries = db.Table('question_countries',
     db.Column('question_id', db.Integer, db.ForeignKey('questions.id'), primary_key=True),
@@ -781,6 +790,51 @@ class UserQuestionStat(db.Model):
         return f"<UserQuestionStat u={self.user_id} q={self.question_id} times={self.times_answered} success={self.success_count}>"
 
 
+# ===================== Historique compact par utilisateur =====================
+
+class UserQuizHistory(db.Model):
+    """Questions déjà répondues et keywords déjà rencontrés par un utilisateur.
+
+    Maintenu au fil des réponses pour que la génération d'une playlist lise une
+    seule ligne au lieu de parcourir user_question_stats et question_keywords.
+    """
+    __tablename__ = 'user_quiz_history'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Dates
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Lien (une ligne par utilisateur)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+
+    # Listes d'IDs au format CSV ("12,57,903"), complétées par ajout en fin de chaîne
+    seen_question_ids_csv = db.Column(db.Text, nullable=False, default='')
+    answered_keyword_ids_csv = db.Column(db.Text, nullable=False, default='')
+
+    user = db.relationship('User', backref=db.backref('quiz_history', uselist=False))
+
+    @staticmethod
+    def _parse_ids(csv_value):
+        if not csv_value:
+            return set()
+        return {int(x) for x in csv_value.split(',') if x.strip().isdigit()}
+
+    def get_seen_question_ids(self):
+        return self._parse_ids(self.seen_question_ids_csv)
+
+    def get_answered_keyword_ids(self):
+        return self._parse_ids(self.answered_keyword_ids_csv)
+
+    def set_ids(self, seen_question_ids, answered_keyword_ids):
+        self.seen_question_ids_csv = ','.join(str(int(x)) for x in sorted(seen_question_ids or []))
+        self.answered_keyword_ids_csv = ','.join(str(int(x)) for x in sorted(answered_keyword_ids or []))
+
+    def __repr__(self):
+        return f"<UserQuizHistory user={self.user_id}>"
+
+
 # ===================== Sessions de quiz par utilisateur =====================
 
 class UserQuizSession(db.Model):
@@ -879,9 +933,13 @@ class ConversationParticipant(db.Model):
 
     # Lecture
     last_read_at = db.Column(db.DateTime, nullable=True)
+    # Messages non lus (incrémenté à l'envoi, remis à zéro à la lecture), voir messages_inbox.py
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
 
     __table_args__ = (
         db.UniqueConstraint('conversation_id', 'user_id', name='uq_conversation_participant'),
+        # Boîte de réception: participations d'un utilisateur
+        db.Index('ix_conversation_participants_user', 'user_id'),
     )
 
     # Relations
@@ -889,7 +947,7 @@ class ConversationParticipant(db.Model):
     user = db.relationship('User')
 
     def __repr__(self):
-        return f"<ConversationParticipant conv={self.conversation_id} user={self.user_id} last_read_at={self.last_read_at}>"
+        return f"<ConversationParticipant conv={self.conversation_id} user={self.user_id} last_read_at={self.last_read_at} unread={self.unread_count}>"
 
 
 class ConversationMessage(db.Model):
@@ -908,6 +966,11 @@ class ConversationMessage(db.Model):
     # Contenu
     content = db.Column(db.Text, nullable=False)
 
+    __table_args__ = (
+        # Dernier message et non lus par conversation (messages_inbox.py), fils de discussion
+        db.Index('ix_conversation_messages_conversation_created', 'conversation_id', 'created_at'),
+    )
+
     # Relations
     conversation = db.relationship('Conversation', back_populates='messages')
     sender = db.relationship('User')
@@ -916,6 +979,61 @@ class ConversationMessage(db.Model):
         return f"<ConversationMessage conv={self.conversation_id} sender={self.sender_id} at={self.created_at}>"
 
 
+class EmailOutbox(db.Model):
+    """Email en attente d'envoi (boîte d'envoi vidée par un thread de fond, voir email_outbox.py)."""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Dates
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Contenu
+    to_email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.Text, nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    # Envoi: pending -> sending -> sent | failed (nouvel essai: retour à pending)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(32), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} to={self.to_email} status={self.status} attempts={self.attempts}>"
+
+
+class PendingNotification(db.Model):
+    """Nouveau message à inclure dans le prochain résumé email d'un utilisateur (voir email_digest.py)."""
+    __tablename__ = 'pending_notifications'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Liens
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    message_id = db.Column(db.Integer, db.ForeignKey('conversation_messages.id'), nullable=False)
+
+    # Lien vers la messagerie (l'URL de l'application n'est connue que pendant une requête)
+    messages_url = db.Column(db.String(255), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_pending_notifications_user_created', 'user_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<PendingNotification user={self.user_id} conv={self.conversation_id} msg={self.message_id}>"
+
+
 # ===================== Signalement des questions =====================
 
 class QuestionReport(db.Model):
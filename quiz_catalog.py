@@ -0,0 +1,200 @@
+"""
+Catalogue en mémoire (lecture seule) des questions publiées.
+
+`/api/quiz/next` et `/api/quiz/answer` chargeaient chaque question avec trois
+`joinedload` en plus des relations `lazy='subquery'` de Question (pays, images,
+keywords, images de réponses), puis redécoupaient `possible_answers` sur '|||'
+à chaque requête.
+
+Le catalogue est un instantané immuable de toutes les questions publiées, déjà
+prêtes pour le rendu: réponses découpées, images de réponses par index, images
+complémentaires, image de la réponse détaillée, thème et keywords. Il est
+reconstruit d'un bloc (puis substitué à l'ancien) dès que la version du catalogue
+de quiz_pool a changé, c'est-à-dire après un commit qui crée, modifie, publie ou
+dépublie une question (ou modifie une image, un lien d'image ou un thème).
+
+Les compteurs globaux (times_answered, success_count) ne font pas partie de
+l'instantané: ils changent à chaque réponse.
+"""
+
+import threading
+import time
+from types import MappingProxyType
+
+from models import db, Question, AnswerImageLink, question_keywords
+from app_logging import get_logger
+from quiz_pool import catalog_version
+
+
+log = get_logger('quiz.catalog')
+
+
+DEFAULT_MAX_AGE_SECONDS = 300
+
+_EMPTY_MAPPING = MappingProxyType({})
+
+
+class FrozenSnapshot:
+    """Base des instantanés: attributs fixés à la construction, puis lecture seule."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} est en lecture seule")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} est en lecture seule")
+
+
+class ImageSnapshot(FrozenSnapshot):
+    __slots__ = ('id', 'filename', 'title', 'alt_text')
+
+    @classmethod
+    def from_model(cls, image):
+        if image is None:
+            return None
+        return cls(id=image.id, filename=image.filename, title=image.title, alt_text=image.alt_text)
+
+
+class ThemeSnapshot(FrozenSnapshot):
+    __slots__ = ('id', 'name', 'icon', 'color')
+
+    @classmethod
+    def from_model(cls, theme):
+        if theme is None:
+            return None
+        return cls(id=theme.id, name=theme.name, icon=theme.icon, color=theme.color)
+
+
+class QuestionSnapshot(FrozenSnapshot):
+    """Contenu d'une question nécessaire au quiz (sans les compteurs)."""
+
+    __slots__ = (
+        'id', 'question_text', 'answers', 'correct_answer', 'detailed_answer',
+        'detailed_answer_image', 'hint', 'source', 'difficulty_level', 'theme',
+        'images', 'answer_image_by_index', 'keyword_ids', 'is_published',
+    )
+
+    @classmethod
+    def from_model(cls, question: Question, keyword_ids=None):
+        answers = tuple(question.possible_answers.split('|||')) if question.possible_answers else ()
+        answer_images = {
+            link.answer_index: ImageSnapshot.from_model(link.image)
+            for link in question.answer_image_links if link.image is not None
+        }
+        if keyword_ids is None:
+            keyword_ids = [kw.id for kw in question.keywords]
+        return cls(
+            id=question.id,
+            question_text=question.question_text,
+            answers=answers,
+            correct_answer=(question.correct_answer or '').strip(),
+            detailed_answer=question.detailed_answer,
+            detailed_answer_image=ImageSnapshot.from_model(question.detailed_answer_image),
+            hint=question.hint,
+            source=question.source,
+            difficulty_level=question.difficulty_level,
+            theme=ThemeSnapshot.from_model(question.theme),
+            images=tuple(ImageSnapshot.from_model(img) for img in question.images),
+            answer_image_by_index=MappingProxyType(answer_images) if answer_images else _EMPTY_MAPPING,
+            keyword_ids=frozenset(keyword_ids),
+            is_published=bool(question.is_published),
+        )
+
+    def __repr__(self):
+        return f'<QuestionSnapshot {self.id}: {(self.question_text or "")[:50]}...>'
+
+
+class QuestionCatalog:
+    """Instantané des questions publiées pour une version du catalogue."""
+
+    __slots__ = ('version', 'built_at', '_questions')
+
+    def __init__(self, version: int, questions: dict[int, QuestionSnapshot]):
+        self.version = version
+        self.built_at = time.time()
+        self._questions = MappingProxyType(questions)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __contains__(self, question_id):
+        return question_id in self._questions
+
+    def get(self, question_id: int) -> QuestionSnapshot | None:
+        return self._questions.get(question_id)
+
+
+_catalog: QuestionCatalog | None = None
+_build_lock = threading.Lock()
+
+
+def _question_load_options():
+    return (
+        db.lazyload(Question.countries),
+        db.lazyload(Question.keywords),
+        db.joinedload(Question.theme),
+        db.joinedload(Question.detailed_answer_image),
+        db.selectinload(Question.images),
+        db.selectinload(Question.answer_image_links).joinedload(AnswerImageLink.image),
+    )
+
+
+def build_question_catalog(version: int | None = None) -> QuestionCatalog:
+    """Construit l'instantané de toutes les questions publiées (requêtes groupées)."""
+    if version is None:
+        version = catalog_version()
+    questions = (
+        Question.query.filter(Question.is_published.is_(True))
+        .options(*_question_load_options())
+        .all()
+    )
+    keywords: dict[int, list[int]] = {}
+    for question_id, keyword_id in db.session.execute(
+        db.select(question_keywords.c.question_id, question_keywords.c.keyword_id)
+    ):
+        keywords.setdefault(question_id, []).append(keyword_id)
+    snapshots = {q.id: QuestionSnapshot.from_model(q, keywords.get(q.id, ())) for q in questions}
+    return QuestionCatalog(version, snapshots)
+
+
+def get_question_catalog(max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS) -> QuestionCatalog:
+    """Retourne le catalogue courant, reconstruit si la version a changé (ou trop ancien)."""
+    global _catalog
+    version = catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version and time.time() - catalog.built_at < max_age_seconds:
+        return catalog
+    with _build_lock:
+        # Un autre thread a pu reconstruire le catalogue pendant l'attente
+        catalog = _catalog
+        if catalog is not None and catalog.version == version and time.time() - catalog.built_at < max_age_seconds:
+            return catalog
+        catalog = build_question_catalog(version)
+        _catalog = catalog
+    log.info("Catalogue reconstruit (version %s): %s questions publiées", version, len(catalog))
+    return catalog
+
+
+def get_question_snapshot(question_id: int) -> QuestionSnapshot | None:
+    """Instantané d'une question: depuis le catalogue, sinon (question non publiée) depuis la base."""
+    snapshot = get_question_catalog().get(question_id)
+    if snapshot is not None:
+        return snapshot
+    question = Question.query.options(*_question_load_options()).get(question_id)
+    if question is None:
+        return None
+    keyword_ids = db.session.execute(
+        db.select(question_keywords.c.keyword_id).where(question_keywords.c.question_id == question_id)
+    ).scalars().all()
+    return QuestionSnapshot.from_model(question, keyword_ids)
+
+
+def clear_question_catalog():
+    global _catalog
+    with _build_lock:
+        _catalog = None
@@ -0,0 +1,324 @@
+"""
+Agrégation différée (write-behind) des compteurs globaux des questions.
+
+Chaque réponse incrémentait `questions.times_answered` / `success_count` et le
+compteur `question_answer_stats.selected_count` de la réponse choisie, dans la
+transaction de la requête. Sur SQLite, toutes les réponses à une même question
+populaire se sérialisaient ainsi sur le verrou d'écriture.
+
+Les incréments sont désormais cumulés en mémoire et appliqués par lots, dans une
+seule transaction, toutes les `flush_interval` secondes (et à l'arrêt du processus):
+un UPDATE `col = col + delta` par question et un UPSERT par (question, réponse).
+Avec `flush_interval <= 0`, chaque réponse est écrite immédiatement (mode synchrone).
+
+Le thread de fond n'est qu'une optimisation: sur un serveur WSGI sans threads
+(PythonAnywhere), il ne tourne pas. `add_answer` écrit donc lui-même le tampon
+si la dernière écriture date de plus de `flush_interval` secondes (sauf si une
+écriture est déjà en cours): les autres workers voient des compteurs à jour et
+un worker arrêté ne perd que les réponses du dernier intervalle.
+
+Option de sûreté (`journal_path`): chaque incrément est aussi ajouté à un journal
+sur disque, rejoué au démarrage suivant si le processus s'est arrêté avant
+l'écriture en base (au pire un lot est appliqué deux fois, jamais perdu).
+
+Avec plusieurs workers, chaque processus a son propre journal
+(`<journal_path>.<pid>`, lots en cours `<journal_path>.<pid>.<n>.flushing`).
+Au démarrage, un worker ne rejoue que les journaux dont le processus
+propriétaire n'existe plus (et l'ancien journal commun `<journal_path>`); il se
+les approprie d'abord par un renommage atomique, si bien que deux workers qui
+démarrent ensemble ne rejouent pas le même fichier. Un worker créé par fork
+après le chargement de l'application ouvre son propre journal et ignore le
+tampon hérité du processus parent. Sous Windows (pas de test de processus),
+les journaux des autres pid sont considérés abandonnés: un seul processus.
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db, dialect_insert, QuestionAnswerStat
+from app_logging import get_logger
+
+
+log = get_logger('quiz.counters')
+
+
+DEFAULT_FLUSH_INTERVAL = 0.3
+
+
+class QuestionCounterAggregator:
+    """Tampon des incréments de compteurs, vidé en base par un thread de fond."""
+
+    def __init__(self, app, flush_interval: float = DEFAULT_FLUSH_INTERVAL, journal_path: str | None = None):
+        self.app = app
+        self.flush_interval = float(flush_interval)
+        self.journal_path = journal_path
+        # question_id -> [réponses, bonnes réponses]
+        self._questions: dict[int, list[int]] = {}
+        # (question_id, answer_index) -> nombre de sélections
+        self._answers: dict[tuple[int, int], int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        # Journaux dont le contenu est repassé dans le tampon après un échec d'écriture
+        self._retained_journals: list[str] = []
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        # Dernière écriture du tampon (time.monotonic)
+        self._last_flush = time.monotonic()
+        self._pid = os.getpid()
+        if self.journal_path:
+            self._replay_journal()
+            self._journal = open(self._process_journal_path(), 'a', encoding='utf-8')
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.stop)
+
+    # ---------- Enregistrement (chemin critique) ----------
+
+    def add_answer(self, question_id: int, is_correct: bool, answer_index: int | None = None):
+        """Cumule une réponse pour la question (et l'index de réponse choisi)."""
+        with self._lock:
+            self._add(question_id, 1 if is_correct else 0, answer_index)
+            if self._journal is not None:
+                self._journal.write(f"{question_id},{1 if is_correct else 0},{answer_index or 0}\n")
+                self._journal.flush()
+        if self.flush_interval <= 0:
+            # Mode synchrone: écriture immédiate (pas de tampon)
+            self.flush()
+            return
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            # Thread de fond absent ou en retard: écriture dans la requête
+            self.flush(wait=False)
+        self._ensure_worker()
+
+    def _add(self, question_id: int, correct: int, answer_index: int | None, count: int = 1):
+        counts = self._questions.setdefault(question_id, [0, 0])
+        counts[0] += count
+        counts[1] += correct
+        if answer_index:
+            key = (question_id, answer_index)
+            self._answers[key] = self._answers.get(key, 0) + count
+
+    def pending(self, question_id: int) -> tuple[int, int]:
+        """Incréments pas encore écrits pour la question: (réponses, bonnes réponses)."""
+        with self._lock:
+            counts = self._questions.get(question_id)
+            return (counts[0], counts[1]) if counts else (0, 0)
+
+    # ---------- Écriture en base ----------
+
+    def flush(self, wait: bool = True) -> int:
+        """Écrit les incréments cumulés en une transaction; retourne le nombre de questions mises à jour.
+
+        Avec `wait=False`, ne fait rien si une écriture est déjà en cours.
+        """
+        if not self._flush_lock.acquire(blocking=wait):
+            return 0
+        try:
+            self._last_flush = time.monotonic()
+            with self._lock:
+                questions, self._questions = self._questions, {}
+                answers, self._answers = self._answers, {}
+                flushing_journal = self._rotate_journal() if (questions or answers) else None
+            if not questions and not answers:
+                return 0
+            try:
+                with self.app.app_context():
+                    self._write(questions, answers)
+            except Exception as e:
+                log.warning("Échec de l'écriture des compteurs, nouvel essai au prochain cycle: %s", e)
+                with self._lock:
+                    for question_id, (answered, correct) in questions.items():
+                        counts = self._questions.setdefault(question_id, [0, 0])
+                        counts[0] += answered
+                        counts[1] += correct
+                    for key, count in answers.items():
+                        self._answers[key] = self._answers.get(key, 0) + count
+                    # Le journal reste sur disque jusqu'à une écriture réussie
+                    if flushing_journal:
+                        self._retained_journals.append(flushing_journal)
+                return 0
+            with self._lock:
+                written_journals, self._retained_journals = self._retained_journals, []
+            if flushing_journal:
+                written_journals.append(flushing_journal)
+            for path in written_journals:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return len(questions)
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, questions: dict, answers: dict):
+        try:
+            write_counter_batch(questions, answers)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # ---------- Journal de sûreté (un fichier par processus) ----------
+
+    def _process_journal_path(self) -> str:
+        return f"{self.journal_path}.{self._pid}"
+
+    def _after_fork(self):
+        """Processus enfant: tampon, verrous et thread du parent abandonnés, journal propre à ce pid."""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._questions, self._answers = {}, {}
+        self._retained_journals = []
+        self._thread = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = open(self._process_journal_path(), 'a', encoding='utf-8')
+
+    def _rotate_journal(self) -> str | None:
+        """Ferme le journal courant (à vider) et en ouvre un nouveau; appelé sous verrou."""
+        if self._journal is None:
+            return None
+        self._journal.close()
+        path = self._process_journal_path()
+        flushing = f"{path}.{time.time_ns()}.flushing"
+        os.replace(path, flushing)
+        self._journal = open(path, 'a', encoding='utf-8')
+        return flushing
+
+    def _orphan_journals(self, directory: str, base: str) -> list[str]:
+        """Journaux sans processus propriétaire: ancien journal commun, pid terminé (ou ce pid, d'un processus précédent)."""
+        orphans = []
+        for name in sorted(os.listdir(directory)):
+            if name == base:
+                orphans.append(name)
+                continue
+            if not name.startswith(base + '.'):
+                continue
+            owner = name[len(base) + 1:].split('.', 1)[0]
+            if owner.isdigit() and (int(owner) == self._pid or not _process_alive(int(owner))):
+                orphans.append(name)
+        return orphans
+
+    def _replay_journal(self):
+        directory = os.path.dirname(os.path.abspath(self.journal_path))
+        base = os.path.basename(self.journal_path)
+        os.makedirs(directory, exist_ok=True)
+        # Appropriation par renommage atomique: un fichier déjà pris par un autre worker a disparu
+        pending_files = []
+        for name in self._orphan_journals(directory, base):
+            claimed = os.path.join(directory, f"{base}.{self._pid}.{time.time_ns()}.flushing")
+            try:
+                os.replace(os.path.join(directory, name), claimed)
+            except FileNotFoundError:
+                continue
+            pending_files.append(claimed)
+        replayed = 0
+        for path in pending_files:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split(',')
+                    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+                        continue
+                    question_id, correct, answer_index = (int(p) for p in parts)
+                    self._add(question_id, correct, answer_index or None)
+                    replayed += 1
+        if not replayed:
+            for path in pending_files:
+                os.remove(path)
+            return
+        log.info("Rejeu du journal: %s réponse(s) non écrites en base", replayed)
+        with self.app.app_context():
+            self._write(self._questions, self._answers)
+        self._questions, self._answers = {}, {}
+        for path in pending_files:
+            os.remove(path)
+
+    # ---------- Thread de fond ----------
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='quiz-counters', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Arrête le thread de fond et écrit les incréments restants."""
+        self._stopped.set()
+        self.flush()
+        if self._journal is not None:
+            with self._lock:
+                self._journal.close()
+                self._journal = None
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill(pid, 0) enverrait CTRL_C_EVENT sous Windows
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processus existant d'un autre utilisateur
+        return True
+    return True
+
+
+def write_counter_batch(questions: dict, answers: dict):
+    """Applique des incréments de compteurs dans la transaction courante (sans commit).
+
+    `questions`: {question_id: [réponses, bonnes réponses]}
+    `answers`: {(question_id, answer_index): nombre de sélections}
+    """
+    now = datetime.utcnow()
+    if questions:
+        db.session.execute(
+            text(
+                "UPDATE questions SET "
+                "times_answered = COALESCE(times_answered, 0) + :answered, "
+                "success_count = COALESCE(success_count, 0) + :correct, "
+                "updated_at = :now "
+                "WHERE id = :question_id"
+            ),
+            [
+                {'question_id': qid, 'answered': answered, 'correct': correct, 'now': now}
+                for qid, (answered, correct) in questions.items()
+            ],
+        )
+    if answers:
+        db.session.execute(
+            upsert_answer_stats_statement(),
+            [
+                {'question_id': qid, 'answer_index': idx, 'selected_count': count,
+                 'created_at': now, 'updated_at': now}
+                for (qid, idx), count in answers.items()
+            ],
+        )
+
+
+def upsert_answer_stats_statement():
+    """INSERT ... ON CONFLICT (question_id, answer_index) DO UPDATE selected_count = selected_count + n."""
+    table = QuestionAnswerStat.__table__
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.question_id, table.c.answer_index],
+        set_={
+            'selected_count': table.c.selected_count + stmt.excluded.selected_count,
+            'updated_at': stmt.excluded.updated_at,
+        },
+    )
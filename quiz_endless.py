@@ -0,0 +1,111 @@
+"""
+Mode sans fin (quiz sans set de règles): curseur sur une permutation pseudo-aléatoire.
+
+Sans set de règles, `/api/quiz/next` tirait chaque question par `ORDER BY random()`
+sur toutes les questions publiées, en excluant l'historique envoyé par le client
+(`NOT IN (...)`, paramètre qui grossissait à chaque question).
+
+Désormais la liste des questions éligibles (par filtres, pour une version du
+catalogue) est calculée une fois et mise en cache; chaque joueur la parcourt dans
+l'ordre d'une permutation déterminée par une graine. Le serveur ne conserve que
+`(graine, position)`: la question suivante est `ids[permutation(position)]`, en
+temps constant, sans matérialiser la permutation (réseau de Feistel sur le plus
+petit domaine 2^(2k) >= n, avec "cycle walking" pour rester dans [0, n)).
+
+Un cycle complet parcourt chaque question une seule fois; une nouvelle graine est
+ensuite tirée. Si le catalogue change en cours de cycle, la permutation porte sur
+la nouvelle liste (quelques questions peuvent alors revenir ou être sautées).
+"""
+
+import hashlib
+import random
+import threading
+import time
+
+from quiz_pool import catalog_version
+from app_logging import get_logger
+
+
+log = get_logger('quiz.endless')
+
+
+DEFAULT_MAX_AGE_SECONDS = 300
+FEISTEL_ROUNDS = 4
+
+_eligible: dict[tuple, tuple[int, float, tuple[int, ...]]] = {}
+_eligible_lock = threading.Lock()
+
+
+class SeededPermutation:
+    """Permutation de [0, size) définie par une graine, évaluée position par position."""
+
+    __slots__ = ('size', 'half_bits', 'half_mask', 'keys')
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        bits = max((size - 1).bit_length(), 2)
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        seed_bytes = int(seed).to_bytes(16, 'big', signed=False)
+        self.keys = tuple(
+            hashlib.blake2b(bytes([r]), key=seed_bytes, digest_size=16).digest()
+            for r in range(FEISTEL_ROUNDS)
+        )
+
+    def _round(self, key: bytes, value: int) -> int:
+        digest = hashlib.blake2b(value.to_bytes(8, 'big'), key=key, digest_size=8).digest()
+        return int.from_bytes(digest, 'big') & self.half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(key, right)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+        # Cycle walking: le domaine (<= 4 * size) est une puissance de 2
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+def new_seed() -> int:
+    return random.SystemRandom().getrandbits(64)
+
+
+def get_eligible_ids(filters_key: tuple, load_ids, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS) -> tuple[int, ...]:
+    """IDs éligibles (triés) pour ces filtres, recalculés par `load_ids()` si le catalogue a changé."""
+    version = catalog_version()
+    entry = _eligible.get(filters_key)
+    if entry is not None and entry[0] == version and time.time() - entry[1] < max_age_seconds:
+        return entry[2]
+    ids = tuple(sorted(load_ids()))
+    with _eligible_lock:
+        _eligible[filters_key] = (version, time.time(), ids)
+    log.info("Liste éligible reconstruite pour %s (version %s): %s questions", filters_key or 'sans filtre', version, len(ids))
+    return ids
+
+
+def next_endless_question_id(cursor: dict, filters_key: tuple, eligible_ids: tuple[int, ...]) -> int | None:
+    """Avance le curseur `{'filters', 'seed', 'offset'}` (modifié sur place) et retourne l'ID suivant."""
+    if not eligible_ids:
+        return None
+    if cursor.get('filters') != list(filters_key) or not cursor.get('seed'):
+        cursor.clear()
+        cursor.update({'filters': list(filters_key), 'seed': new_seed(), 'offset': 0})
+    offset = int(cursor.get('offset', 0) or 0)
+    if offset >= len(eligible_ids):
+        # Cycle terminé: nouvelle permutation
+        cursor['seed'] = new_seed()
+        offset = 0
+    position = SeededPermutation(len(eligible_ids), cursor['seed'])[offset]
+    cursor['offset'] = offset + 1
+    return eligible_ids[position]
+
+
+def clear_eligible_ids():
+    with _eligible_lock:
+        _eligible.clear()
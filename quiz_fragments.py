@@ -0,0 +1,94 @@
+"""
+Cache des fragments HTML rendus du quiz (question et résultat).
+
+`quiz_question.html` et `quiz_result.html` étaient rendus par Jinja à chaque étape
+de chaque partie, alors que seuls l'ordre des réponses, la progression, le score
+et quelques valeurs propres au joueur changent d'un rendu à l'autre.
+
+Un fragment est rendu une seule fois (par question et version du catalogue) avec,
+à la place de chaque valeur variable, un marqueur `\\x00nom\\x00`; le HTML obtenu
+est découpé sur ces marqueurs. Un rendu revient ensuite à une recherche dans le
+cache puis à l'assemblage des morceaux avec les valeurs du joueur (échappées,
+sauf si ce sont des `Markup`).
+
+Les longs morceaux statiques (styles et scripts) sont partagés entre tous les
+fragments (`sys.intern`), ce qui garde l'empreinte mémoire du cache modeste.
+"""
+
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup, escape
+
+
+DEFAULT_CACHE_SIZE = 2048
+
+_SLOT_PATTERN = re.compile('\x00([a-z_]+)\x00')
+# Taille à partir de laquelle un morceau statique est partagé entre fragments
+_INTERN_MIN_LENGTH = 512
+
+
+def slot(name: str) -> Markup:
+    """Marqueur inséré dans le rendu à la place d'une valeur variable."""
+    return Markup(f'\x00{name}\x00')
+
+
+class RenderedFragment:
+    """HTML rendu, découpé en morceaux statiques entre des emplacements nommés."""
+
+    __slots__ = ('parts', 'names')
+
+    def __init__(self, html: str):
+        pieces = _SLOT_PATTERN.split(html)
+        self.parts = tuple(sys.intern(p) if len(p) >= _INTERN_MIN_LENGTH else p for p in pieces[0::2])
+        self.names = tuple(pieces[1::2])
+
+    def render(self, **values) -> Markup:
+        out = [self.parts[0]]
+        for name, part in zip(self.names, self.parts[1:]):
+            out.append(str(escape(values[name])))
+            out.append(part)
+        return Markup(''.join(out))
+
+
+def compile_fragment(template_name: str, slot_names=(), **context) -> RenderedFragment:
+    """Rend un template avec des marqueurs pour `slot_names` et le découpe."""
+    for name in slot_names:
+        context[name] = slot(name)
+    return RenderedFragment(render_template(template_name, **context))
+
+
+class QuizFragmentCache:
+    """Cache LRU des fragments (ou groupes de fragments) rendus, par clé."""
+
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE):
+        self.size = int(size)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        """Retourne l'entrée `key`, construite par `build()` si absente."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = build()
+        if self.size > 0:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,216 @@
+"""
+Historique de jeu par utilisateur: questions déjà répondues et keywords déjà rencontrés.
+
+La génération d'une playlist a besoin de ces deux ensembles. Plutôt que de
+parcourir user_question_stats puis question_keywords à chaque début de quiz,
+ils sont conservés dans une ligne `user_quiz_history` par utilisateur, complétée
+à chaque réponse (`record_answer`), avec un cache LRU en mémoire du processus.
+
+Si la ligne n'existe pas encore (utilisateur antérieur à cette table), la
+lecture recalcule l'historique depuis user_question_stats sans rien écrire:
+la ligne est créée par la réponse suivante (`record_answer`), par un INSERT
+... ON CONFLICT DO NOTHING: deux premières réponses simultanées ne se heurtent
+pas à la contrainte d'unicité sur user_id.
+
+Les ids sont ajoutés en fin de liste par un seul UPDATE sur la valeur en base
+(`csv || ',' || ids`), jamais en réécrivant la liste lue: deux réponses
+simultanées du même utilisateur (PostgreSQL) ne perdent pas d'id. Un id ajouté
+deux fois est sans effet (listes lues comme des ensembles).
+
+Le cache d'un utilisateur est invalidé après le commit de la transaction qui a
+modifié sa ligne (hook `after_commit`), et non pendant: une lecture concurrente
+ne peut pas y remettre l'ancienne ligne. Un compteur de génération par
+utilisateur écarte aussi une lecture commencée avant l'invalidation.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import case, event, update
+from sqlalchemy.orm import Session
+
+from models import db, dialect_insert, UserQuestionStat, UserQuizHistory, question_keywords
+from app_logging import get_logger
+
+
+log = get_logger('quiz.history')
+
+
+DEFAULT_CACHE_SIZE = 1024
+# Durée de validité d'une entrée du cache: borne la désynchronisation entre workers
+DEFAULT_CACHE_TTL_SECONDS = 60
+
+_cache: OrderedDict[int, tuple[float, frozenset[int], frozenset[int]]] = OrderedDict()
+_cache_lock = threading.Lock()
+# Incrémenté à chaque invalidation: une lecture commencée avant n'est pas mise en cache
+_generations: dict[int, int] = {}
+cache_size = DEFAULT_CACHE_SIZE
+cache_ttl_seconds = DEFAULT_CACHE_TTL_SECONDS
+
+
+def configure_history_cache(size: int | None = None, ttl_seconds: int | None = None):
+    global cache_size, cache_ttl_seconds
+    if size is not None:
+        cache_size = int(size)
+    if ttl_seconds is not None:
+        cache_ttl_seconds = int(ttl_seconds)
+
+
+def invalidate_user_history(user_id: int):
+    with _cache_lock:
+        _cache.pop(user_id, None)
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+
+
+def _invalidate_after_commit(user_id: int):
+    """Invalide le cache maintenant et après le commit de la session courante."""
+    invalidate_user_history(user_id)
+    db.session.info.setdefault('quiz_history_invalidate', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop('quiz_history_invalidate', ()):
+        invalidate_user_history(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('quiz_history_invalidate', None)
+
+
+def _cache_get(user_id: int):
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del _cache[user_id]
+            return None
+        _cache.move_to_end(user_id)
+        return entry[1], entry[2]
+
+
+def _cache_put(user_id: int, seen: frozenset[int], keywords: frozenset[int], generation: int):
+    if cache_size <= 0:
+        return
+    with _cache_lock:
+        if _generations.get(user_id, 0) != generation:
+            # Ligne modifiée depuis la lecture
+            return
+        _cache[user_id] = (time.time() + cache_ttl_seconds, seen, keywords)
+        _cache.move_to_end(user_id)
+        while len(_cache) > cache_size:
+            _cache.popitem(last=False)
+
+
+def _keywords_of_questions(question_ids) -> set[int]:
+    keyword_ids = set()
+    question_ids = list(question_ids)
+    # Découper pour rester sous la limite de paramètres SQLite
+    for start in range(0, len(question_ids), 900):
+        part = question_ids[start:start + 900]
+        rows = db.session.execute(
+            db.select(question_keywords.c.keyword_id).where(question_keywords.c.question_id.in_(part))
+        )
+        keyword_ids.update(row[0] for row in rows)
+    return keyword_ids
+
+
+def _history_from_stats(user_id: int) -> tuple[set[int], set[int]]:
+    """(questions répondues, keywords de ces questions) recalculés depuis user_question_stats."""
+    seen = {row.question_id for row in
+            UserQuestionStat.query.with_entities(UserQuestionStat.question_id)
+            .filter_by(user_id=user_id).all()}
+    keywords = _keywords_of_questions(seen) if seen else set()
+    return seen, keywords
+
+
+def rebuild_user_history(user_id: int) -> UserQuizHistory:
+    """Reconstruit (ou crée) la ligne d'historique depuis user_question_stats, sans commit."""
+    seen, keywords = _history_from_stats(user_id)
+    history = UserQuizHistory.query.filter_by(user_id=user_id).first()
+    if not history:
+        history = _insert_history_row(user_id)
+    history.set_ids(seen, keywords)
+    return history
+
+
+def _insert_history_row(user_id: int) -> UserQuizHistory:
+    """Crée la ligne vide de l'utilisateur si elle n'existe pas (une autre requête a pu la créer) et la retourne."""
+    table = UserQuizHistory.__table__
+    db.session.execute(
+        dialect_insert(table).values(user_id=user_id, seen_question_ids_csv='', answered_keyword_ids_csv='')
+        .on_conflict_do_nothing(index_elements=[table.c.user_id])
+    )
+    return UserQuizHistory.query.filter_by(user_id=user_id).one()
+
+
+def _append_ids(column, ids):
+    """Expression SQL: liste CSV de la colonne complétée par `ids`."""
+    suffix = ','.join(str(int(x)) for x in sorted(ids))
+    return case((column == '', suffix), else_=column + ',' + suffix)
+
+
+def get_user_history(user_id: int) -> tuple[frozenset[int], frozenset[int]]:
+    """Retourne (questions déjà répondues, keywords déjà répondus) de l'utilisateur."""
+    if not user_id:
+        return frozenset(), frozenset()
+    cached = _cache_get(user_id)
+    if cached is not None:
+        return cached
+    with _cache_lock:
+        generation = _generations.get(user_id, 0)
+    history = UserQuizHistory.query.filter_by(user_id=user_id).first()
+    if history is None:
+        # Lecture seule (la session de l'appelant n'est ni validée ni annulée): la ligne
+        # sera créée par la prochaine réponse (record_answer)
+        seen_ids, keyword_ids = _history_from_stats(user_id)
+        seen, keywords = frozenset(seen_ids), frozenset(keyword_ids)
+    else:
+        seen = frozenset(history.get_seen_question_ids())
+        keywords = frozenset(history.get_answered_keyword_ids())
+    _cache_put(user_id, seen, keywords, generation)
+    return seen, keywords
+
+
+def record_answer(user_id: int, question_id: int, keyword_ids) -> bool:
+    """Ajoute une question répondue (et ses keywords) à l'historique, sans commit.
+
+    Retourne True si l'historique a été modifié. Le cache de l'utilisateur est
+    invalidé après le commit: la prochaine lecture relira la ligne à jour.
+    """
+    if not user_id or not question_id:
+        return False
+    question_ids = {question_id}
+    keywords = set(keyword_ids or ())
+    history = UserQuizHistory.query.filter_by(user_id=user_id).first()
+    if history is None:
+        # Ligne créée vide puis complétée comme pour une réponse (une requête simultanée a pu la créer)
+        log.info("Reconstruction de l'historique de l'utilisateur %s", user_id)
+        rebuilt_ids, rebuilt_keywords = _history_from_stats(user_id)
+        question_ids |= rebuilt_ids
+        keywords |= rebuilt_keywords
+        history = _insert_history_row(user_id)
+    new_ids = question_ids - history.get_seen_question_ids()
+    new_keywords = keywords - history.get_answered_keyword_ids()
+    if not new_ids and not new_keywords:
+        return False
+    table = UserQuizHistory.__table__
+    values = {'updated_at': datetime.utcnow()}
+    if new_ids:
+        values['seen_question_ids_csv'] = _append_ids(table.c.seen_question_ids_csv, new_ids)
+    if new_keywords:
+        values['answered_keyword_ids_csv'] = _append_ids(table.c.answered_keyword_ids_csv, new_keywords)
+    db.session.execute(update(table).where(table.c.user_id == user_id).values(**values))
+    db.session.expire(history, ['seen_question_ids_csv', 'answered_keyword_ids_csv', 'updated_at'])
+    _invalidate_after_commit(user_id)
+    return True
+
+
+def delete_user_history(user_id: int):
+    """Supprime l'historique d'un utilisateur (sans commit)."""
+    UserQuizHistory.query.filter_by(user_id=user_id).delete()
+    _invalidate_after_commit(user_id)
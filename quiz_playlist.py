@@ -0,0 +1,93 @@
+"""
+Génération d'une playlist de quiz à partir du pool en cache d'un set compilé.
+
+Cœur de `_generate_quiz_playlist` (app.py), sans journalisation ni lecture de
+l'historique du joueur: l'appelant fournit les questions vues et les keywords
+répondus, et reçoit la playlist avec un rapport (quotas, compromis de la
+sélection, durée de chaque étape). Le simulateur (quiz_simulation) exécute
+exactement ce code, des milliers de fois.
+"""
+
+import random
+import time
+
+from quiz_pool import get_candidate_pool
+from quiz_rules import ALL_DIFFICULTIES
+
+
+# Étapes chronométrées: récupération du pool, sélection (bitsets), mise en ordre
+STAGES = ('pool', 'selection', 'ordering')
+
+
+def build_playlist(rule_set, seen_ids=(), answered_keywords=(), rng=None) -> tuple[list[int], dict]:
+    """Génère une playlist pour un set compilé (quiz_rules.CompiledRuleSet).
+
+    Retourne (playlist, rapport); le rapport contient une entrée par groupe
+    sélectionné (difficulté en mode auto, toute la sélection en mode manuel):
+    quota, nombre de questions retenues et statistiques de quiz_selection.
+    """
+    rng = rng or random
+    started = time.perf_counter()
+    pool = get_candidate_pool(rule_set)
+    pool_done = time.perf_counter()
+    index = pool.selection_index()
+
+    if pool.manual:
+        # Mode manuel: toute la sélection explicite, réordonnée par la logique keywords
+        playlist, used_keywords, stats = index.select(
+            quota=len(pool),
+            seen_question_ids=seen_ids,
+            used_keywords=(),
+            answered_keywords=answered_keywords,
+            prevent_duplicate_keywords=rule_set.prevent_duplicate_keywords,
+            rng=rng,
+        )
+        selection_done = time.perf_counter()
+        groups = [{'difficulty': None, 'quota': len(pool), 'selected': len(playlist), 'stats': stats}]
+        expected_total = len(pool)
+        order_mode = None
+    else:
+        # Mode auto: tous les quotas en une passe sur le pool (keywords utilisés partagés)
+        allowed_diffs = list(rule_set.allowed_difficulties or ALL_DIFFICULTIES)
+        quotas = {d: rule_set.questions_per_difficulty.get(d, 0) for d in allowed_diffs}
+        chosen_by_diff, used_keywords, stats_by_diff = index.select_groups(
+            [(d, pool.difficulty_mask(d), quota) for d, quota in quotas.items() if quota > 0],
+            seen_question_ids=seen_ids,
+            answered_keywords=answered_keywords,
+            prevent_duplicate_keywords=rule_set.prevent_duplicate_keywords,
+            rng=rng,
+        )
+        selection_done = time.perf_counter()
+        groups = [
+            {'difficulty': d, 'quota': quota, 'selected': len(chosen_by_diff.get(d, [])), 'stats': stats_by_diff[d]}
+            for d, quota in quotas.items() if quota > 0
+        ]
+        expected_total = sum(quotas.values())
+        order_mode = rule_set.question_order_mode
+
+        if order_mode == 'full_shuffle':
+            playlist = [qid for d in allowed_diffs for qid in chosen_by_diff.get(d, [])]
+            rng.shuffle(playlist)
+        else:
+            playlist = []
+            for d in sorted(allowed_diffs):
+                bucket = list(chosen_by_diff.get(d) or [])
+                if len(bucket) > 1:
+                    rng.shuffle(bucket)
+                playlist.extend(bucket)
+
+    ordering_done = time.perf_counter()
+    report = {
+        'manual': pool.manual,
+        'pool_size': len(pool),
+        'order_mode': order_mode,
+        'expected_total': expected_total,
+        'groups': groups,
+        'used_keywords': len(used_keywords),
+        'timings': {
+            'pool': pool_done - started,
+            'selection': selection_done - pool_done,
+            'ordering': ordering_done - selection_done,
+        },
+    }
+    return playlist, report
@@ -0,0 +1,207 @@
+"""
+Cache en mémoire des questions candidates par set de règles (QuizRuleSet).
+
+Au démarrage d'un quiz, `_generate_quiz_playlist` a besoin des IDs des questions
+publiées qui respectent les conditions du set (difficultés, thèmes, sélection
+manuelle), groupés par difficulté, ainsi que des keywords de chaque question.
+Ce pool est construit une seule fois puis réutilisé tant que le catalogue n'a
+pas changé: un compteur de version est incrémenté à chaque commit qui crée,
+modifie ou supprime une Question, un QuizRuleSet ou un Keyword (ainsi qu'une
+image, un lien d'image de réponse ou un thème, affichés par quiz_catalog).
+
+Le compteur est propre au processus: avec plusieurs workers, un pool peut rester
+périmé au plus `max_age_seconds` après une modification faite dans un autre worker.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event, inspect
+
+from models import db, Question, QuizRuleSet, Keyword, ImageAsset, AnswerImageLink, BroadTheme, question_keywords
+from quiz_selection import KeywordSelectionIndex
+from app_logging import get_logger
+
+
+log = get_logger('quiz.pool')
+
+
+DEFAULT_MAX_AGE_SECONDS = 300
+
+# Modèles dont la modification invalide les pools (et le catalogue de quiz_catalog)
+_WATCHED_MODELS = (Question, QuizRuleSet, Keyword, ImageAsset, AnswerImageLink, BroadTheme)
+# Compteurs mis à jour à chaque réponse: sans effet sur la sélection, ne doivent pas invalider
+_IGNORED_ATTRIBUTES = {'times_answered', 'success_count', 'updated_at'}
+
+_version = 0
+_version_lock = threading.Lock()
+_pools: dict[int, 'QuizCandidatePool'] = {}
+_pools_lock = threading.Lock()
+
+
+def catalog_version() -> int:
+    """Version courante du catalogue (incrémentée à chaque modification suivie)."""
+    return _version
+
+
+def bump_catalog_version() -> int:
+    """Invalide tous les pools en incrémentant la version du catalogue."""
+    global _version
+    with _version_lock:
+        _version += 1
+        return _version
+
+
+class QuizCandidatePool:
+    """Questions candidates d'un set de règles, figées pour une version du catalogue."""
+
+    def __init__(self, rule_set_id: int, version: int, manual: bool,
+                 ordered_ids: list[int], difficulties: dict[int, int | None],
+                 keywords: dict[int, frozenset[int]]):
+        self.rule_set_id = rule_set_id
+        self.version = version
+        self.built_at = time.time()
+        # Mode manuel: ordre de la sélection explicite; mode auto: ordre des IDs
+        self.manual = manual
+        self.ordered_ids = ordered_ids
+        self.difficulties = difficulties
+        self.keywords = keywords
+        self.by_difficulty: dict[int, list[int]] = {}
+        for qid in ordered_ids:
+            self.by_difficulty.setdefault(difficulties.get(qid), []).append(qid)
+        self._index: KeywordSelectionIndex | None = None
+        self._difficulty_masks: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.ordered_ids)
+
+    def ids_for_difficulty(self, difficulty: int) -> list[int]:
+        return self.by_difficulty.get(difficulty, [])
+
+    def selection_index(self) -> KeywordSelectionIndex:
+        """Index de sélection (bitsets) du pool entier, construit à la demande."""
+        if self._index is None:
+            self._index = KeywordSelectionIndex(self.ordered_ids, self.keywords)
+        return self._index
+
+    def difficulty_mask(self, difficulty: int) -> int:
+        """Masque (dans l'index du pool) des questions d'une difficulté."""
+        mask = self._difficulty_masks.get(difficulty)
+        if mask is None:
+            mask = self.selection_index().question_mask(self.ids_for_difficulty(difficulty))
+            self._difficulty_masks[difficulty] = mask
+        return mask
+
+
+def apply_rule_set_filters(query, rule_set):
+    """Appliquer les conditions d'un set de règles compilé (quiz_rules) à une requête sur Question."""
+    # Difficultés autorisées
+    if rule_set.allowed_difficulties:
+        query = query.filter(Question.difficulty_level.in_(rule_set.allowed_difficulties))
+
+    # Thèmes larges (None = tous)
+    if rule_set.broad_theme_ids is not None:
+        query = query.filter(Question.broad_theme_id.in_(sorted(rule_set.broad_theme_ids)))
+
+    # Sous-thèmes (None = tous)
+    if rule_set.specific_theme_ids is not None:
+        query = query.filter(Question.specific_theme_id.in_(sorted(rule_set.specific_theme_ids)))
+
+    # Note: pas de filtre pays pour l'instant dans les sets de règles
+    return query
+
+
+def _load_keywords(question_ids: list[int]) -> dict[int, frozenset[int]]:
+    """Charge les keywords des questions via la table d'association (sans charger les ORM)."""
+    keywords: dict[int, set[int]] = {}
+    if not question_ids:
+        return {}
+    # Découper pour rester sous la limite de paramètres SQLite
+    chunk = 900
+    for start in range(0, len(question_ids), chunk):
+        part = question_ids[start:start + chunk]
+        rows = db.session.execute(
+            db.select(question_keywords.c.question_id, question_keywords.c.keyword_id)
+            .where(question_keywords.c.question_id.in_(part))
+        )
+        for question_id, keyword_id in rows:
+            keywords.setdefault(question_id, set()).add(keyword_id)
+    return {qid: frozenset(kws) for qid, kws in keywords.items()}
+
+
+def build_candidate_pool(rule_set, version: int | None = None) -> QuizCandidatePool:
+    """Construit le pool d'un set de règles compilé (2 requêtes: questions puis keywords)."""
+    if version is None:
+        version = catalog_version()
+    manual = rule_set.manual
+    if manual:
+        rows = (
+            Question.query.filter(Question.id.in_(rule_set.selected_question_ids), Question.is_published.is_(True))
+            .with_entities(Question.id, Question.difficulty_level).all()
+        )
+        difficulties = {row.id: row.difficulty_level for row in rows}
+        # Conserver l'ordre de la sélection explicite
+        ordered_ids = [qid for qid in rule_set.selected_question_ids if qid in difficulties]
+    else:
+        query = apply_rule_set_filters(
+            Question.query.filter(Question.is_published.is_(True)), rule_set
+        ).with_entities(Question.id, Question.difficulty_level).order_by(Question.id)
+        rows = query.all()
+        ordered_ids = [row.id for row in rows]
+        difficulties = {row.id: row.difficulty_level for row in rows}
+    keywords = _load_keywords(ordered_ids)
+    return QuizCandidatePool(rule_set.id, version, manual, ordered_ids, difficulties, keywords)
+
+
+def get_candidate_pool(rule_set, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS) -> QuizCandidatePool:
+    """Retourne le pool en cache du set de règles, reconstruit si la version a changé."""
+    version = catalog_version()
+    pool = _pools.get(rule_set.id)
+    if pool is not None and pool.version == version and time.time() - pool.built_at < max_age_seconds:
+        return pool
+    pool = build_candidate_pool(rule_set, version)
+    with _pools_lock:
+        # Ne pas écraser un pool construit entre-temps pour une version plus récente
+        current = _pools.get(rule_set.id)
+        if current is None or current.version <= version:
+            _pools[rule_set.id] = pool
+    log.info("Pool reconstruit pour set %s (version %s): %s questions", rule_set.id, version, len(pool))
+    return pool
+
+
+def clear_candidate_pools():
+    with _pools_lock:
+        _pools.clear()
+
+
+def _has_watched_changes(session) -> bool:
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, _WATCHED_MODELS):
+            return True
+    for obj in session.dirty:
+        if not isinstance(obj, _WATCHED_MODELS):
+            continue
+        state = inspect(obj)
+        for attr in state.attrs:
+            if attr.key not in _IGNORED_ATTRIBUTES and attr.history.has_changes():
+                return True
+    return False
+
+
+def install_pool_invalidation(session_class=None):
+    """Branche l'invalidation des pools sur les commits de la session SQLAlchemy."""
+    target = session_class or db.session
+
+    @event.listens_for(target, 'before_flush')
+    def _mark_before_flush(session, flush_context, instances):
+        if _has_watched_changes(session):
+            session.info['quiz_pool_dirty'] = True
+
+    @event.listens_for(target, 'after_commit')
+    def _bump_after_commit(session):
+        if session.info.pop('quiz_pool_dirty', False):
+            bump_catalog_version()
+
+    @event.listens_for(target, 'after_rollback')
+    def _reset_after_rollback(session):
+        session.info.pop('quiz_pool_dirty', None)
@@ -0,0 +1,196 @@
+"""
+Sets de règles compilés (lecture seule) pour le chemin critique du quiz.
+
+Chaque requête `/api/quiz/next` et `/api/quiz/answer` recherchait le QuizRuleSet
+par slug (requête + relations `lazy='subquery'`), puis `_calculate_score`
+re-décodait le JSON des bonus de difficulté à chaque réponse, comme la génération
+de playlist pour les quotas et les difficultés autorisées.
+
+Un set est désormais compilé une fois par version du catalogue (quiz_pool) en
+un objet immuable: table des points par difficulté, paramètres de combo, quotas,
+filtres (IDs de thèmes en frozenset) et textes/images de l'écran final. Le
+score d'une réponse et les filtres deviennent de simples lectures de table.
+Les slugs inconnus ou inactifs ne sont pas mis en cache (pas de croissance du
+cache sur des slugs arbitraires).
+"""
+
+import threading
+import time
+from types import MappingProxyType
+
+from models import QuizRuleSet
+from quiz_catalog import FrozenSnapshot, ImageSnapshot
+from quiz_pool import catalog_version
+from app_logging import get_logger
+
+
+log = get_logger('quiz.rules')
+
+
+DEFAULT_MAX_AGE_SECONDS = 300
+ALL_DIFFICULTIES = (1, 2, 3, 4, 5)
+ORDER_MODES = ('difficulty_ascending', 'full_shuffle')
+
+_compiled: dict[str, tuple[int, float, 'CompiledRuleSet']] = {}
+_compiled_lock = threading.Lock()
+
+
+class ScoreEntry(FrozenSnapshot):
+    """Points d'une bonne réponse pour une difficulté donnée."""
+
+    __slots__ = ('points', 'difficulty_bonus', 'difficulty_multiplier')
+
+
+class CompiledRuleSet(FrozenSnapshot):
+    """Set de règles figé: paramètres décodés une fois, prêts pour le scoring et les filtres."""
+
+    __slots__ = (
+        'id', 'slug', 'name', 'version', 'timer_seconds',
+        'question_selection_mode', 'question_order_mode', 'prevent_duplicate_keywords',
+        'selected_question_ids', 'questions_per_difficulty', 'allowed_difficulties',
+        'broad_theme_ids', 'specific_theme_ids',
+        'scoring_base_points', 'scoring_difficulty_bonus_type', 'difficulty_bonus_map',
+        'score_table', 'combo_step', 'combo_bonus_points', 'perfect_quiz_bonus',
+        'min_correct_answers_to_win', 'success_message', 'failure_message',
+        'success_image', 'failure_image',
+    )
+
+    @property
+    def combo_bonus_enabled(self) -> bool:
+        return self.combo_step > 0 and self.combo_bonus_points > 0
+
+    @property
+    def manual(self) -> bool:
+        """Sélection manuelle effective (mode 'manual' avec au moins une question choisie)."""
+        return self.question_selection_mode == 'manual' and bool(self.selected_question_ids)
+
+    def score_for(self, difficulty) -> ScoreEntry:
+        """Points d'une bonne réponse pour cette difficulté."""
+        entry = self.score_table.get(difficulty)
+        if entry is None:
+            # Difficulté hors table (valeur inattendue): même calcul, non mis en cache
+            entry = _score_entry(self.scoring_base_points, self.scoring_difficulty_bonus_type,
+                                 self.difficulty_bonus_map, difficulty)
+        return entry
+
+    def __repr__(self):
+        return f'<CompiledRuleSet {self.id}: {self.slug} (version {self.version})>'
+
+
+def _number(value, default):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _score_entry(base_points: int, bonus_type: str, bonus_map: dict, difficulty) -> ScoreEntry:
+    """Même calcul que l'ancien `_calculate_score`, pour une difficulté."""
+    if bonus_type == 'add':
+        bonus = _number(bonus_map.get(str(difficulty), 0), 0)
+        return ScoreEntry(points=int(base_points + bonus), difficulty_bonus=bonus, difficulty_multiplier=1.0)
+    if bonus_type == 'mult':
+        coeff = float(_number(bonus_map.get(str(difficulty), 1.0), 1.0))
+        points = int(round(base_points * coeff))
+        return ScoreEntry(points=points, difficulty_bonus=points - base_points, difficulty_multiplier=coeff)
+    return ScoreEntry(points=int(base_points), difficulty_bonus=0, difficulty_multiplier=1.0)
+
+
+def compile_rule_set(rule_set: QuizRuleSet, version: int | None = None) -> CompiledRuleSet:
+    """Compile un QuizRuleSet (ORM) en CompiledRuleSet."""
+    if isinstance(rule_set, CompiledRuleSet):
+        return rule_set
+    if version is None:
+        version = catalog_version()
+    base_points = rule_set.scoring_base_points if rule_set.scoring_base_points is not None else 0
+    bonus_type = rule_set.scoring_difficulty_bonus_type or 'none'
+    bonus_map = rule_set.get_difficulty_bonus_map()
+    if not isinstance(bonus_map, dict):
+        bonus_map = {}
+    difficulties = set(ALL_DIFFICULTIES)
+    difficulties.update(int(key) for key in bonus_map if str(key).isdigit())
+    score_table = {d: _score_entry(base_points, bonus_type, bonus_map, d) for d in difficulties}
+    score_table[None] = _score_entry(base_points, bonus_type, bonus_map, None)
+
+    quotas = rule_set.get_questions_per_difficulty()
+    if not isinstance(quotas, dict):
+        quotas = {}
+    questions_per_difficulty = {}
+    for key, quota in quotas.items():
+        if str(key).isdigit():
+            questions_per_difficulty[int(key)] = int(_number(quota, 0) or 0)
+
+    order_mode = rule_set.question_order_mode or 'difficulty_ascending'
+    if order_mode not in ORDER_MODES:
+        order_mode = 'difficulty_ascending'
+
+    combo_step = combo_points = 0
+    if rule_set.combo_bonus_enabled and rule_set.combo_step and rule_set.combo_bonus_points:
+        combo_step = max(int(rule_set.combo_step), 0)
+        combo_points = int(rule_set.combo_bonus_points or 0)
+
+    broad_theme_ids = None
+    if not rule_set.use_all_broad_themes and rule_set.allowed_broad_themes:
+        broad_theme_ids = frozenset(t.id for t in rule_set.allowed_broad_themes)
+    specific_theme_ids = None
+    if not rule_set.use_all_specific_themes and rule_set.allowed_specific_themes:
+        specific_theme_ids = frozenset(st.id for st in rule_set.allowed_specific_themes)
+
+    selected_question_ids = ()
+    if rule_set.question_selection_mode == 'manual':
+        selected_question_ids = tuple(q.id for q in rule_set.selected_questions)
+
+    return CompiledRuleSet(
+        id=rule_set.id,
+        slug=rule_set.slug,
+        name=rule_set.name,
+        version=version,
+        timer_seconds=rule_set.timer_seconds,
+        question_selection_mode=rule_set.question_selection_mode,
+        question_order_mode=order_mode,
+        prevent_duplicate_keywords=bool(rule_set.prevent_duplicate_keywords),
+        selected_question_ids=selected_question_ids,
+        questions_per_difficulty=MappingProxyType(questions_per_difficulty),
+        allowed_difficulties=tuple(rule_set.get_allowed_difficulties()),
+        broad_theme_ids=broad_theme_ids,
+        specific_theme_ids=specific_theme_ids,
+        scoring_base_points=base_points,
+        scoring_difficulty_bonus_type=bonus_type,
+        difficulty_bonus_map=MappingProxyType(dict(bonus_map)),
+        score_table=MappingProxyType(score_table),
+        combo_step=combo_step,
+        combo_bonus_points=combo_points,
+        perfect_quiz_bonus=int(rule_set.perfect_quiz_bonus or 0),
+        min_correct_answers_to_win=rule_set.min_correct_answers_to_win or 0,
+        success_message=rule_set.success_message,
+        failure_message=rule_set.failure_message,
+        success_image=ImageSnapshot.from_model(rule_set.success_image),
+        failure_image=ImageSnapshot.from_model(rule_set.failure_image),
+    )
+
+
+def get_compiled_rule_set(slug: str, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS) -> CompiledRuleSet | None:
+    """Set actif compilé pour ce slug (None si inconnu ou inactif), recompilé si le catalogue a changé."""
+    if not slug:
+        return None
+    version = catalog_version()
+    entry = _compiled.get(slug)
+    if entry is not None and entry[0] == version and time.time() - entry[1] < max_age_seconds:
+        return entry[2]
+    rule_set = QuizRuleSet.query.filter_by(slug=slug, is_active=True).first()
+    if rule_set is None:
+        with _compiled_lock:
+            _compiled.pop(slug, None)
+        return None
+    compiled = compile_rule_set(rule_set, version)
+    with _compiled_lock:
+        _compiled[slug] = (version, time.time(), compiled)
+    log.info("Set '%s' compilé (version %s)", slug, version)
+    return compiled
+
+
+def clear_compiled_rule_sets():
+    with _compiled_lock:
+        _compiled.clear()
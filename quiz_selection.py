@@ -0,0 +1,274 @@
+"""
+Moteur de sélection des questions d'un quiz avec gestion des keywords.
+
+Les candidats sont indexés une fois (position 0..n-1) et chaque ensemble utile
+(questions vues, questions portant un keyword déjà utilisé ou déjà répondu,
+questions sans keyword) est représenté par un masque de bits (entier Python).
+Les quatre critères de priorité se combinent alors par des opérations binaires
+sur ces masques, sans reconstruire d'ensembles Python par question.
+
+Priorités (par ordre d'importance):
+1. Condition QuizRuleSet (ABSOLU) - déjà appliquée dans les candidats
+2. Pas de doublons de keywords dans le quiz (si prevent_duplicate_keywords)
+3. Pas de questions déjà répondues
+4. Pas de keywords déjà répondus
+(à égalité, les questions sans keyword passent en premier)
+
+Les candidats sont répartis en 16 groupes selon ces critères; la sélection
+parcourt les groupes du meilleur au moins bon et tire au hasard dans chacun
+(Fisher-Yates partiel) jusqu'à atteindre le quota, sans trier tout le pool.
+"""
+
+import random
+from itertools import compress
+
+
+EMPTY_KEYWORDS = frozenset()
+
+# bin() -> octets 0/1 exploitables comme sélecteurs par itertools.compress
+_BIT_TABLE = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def mask_from_positions(positions, size: int) -> int:
+    """Construit un masque de bits à partir d'une liste de positions."""
+    if not positions:
+        return 0
+    # Chaîne binaire '0'/'1' (position 0 à gauche) puis conversion en base 2
+    buffer = bytearray(b'0') * size
+    for p in positions:
+        buffer[p] = 49  # '1'
+    return int(buffer[::-1], 2)
+
+
+def iter_positions(mask: int):
+    """Itère sur les positions des bits à 1 d'un masque (ordre croissant)."""
+    if mask <= 0:
+        return iter(())
+    bits = bin(mask)[:1:-1].encode('ascii').translate(_BIT_TABLE)
+    return compress(range(len(bits)), bits)
+
+
+def iter_random_positions(mask: int, rng):
+    """Itère sur les positions d'un masque dans un ordre aléatoire, paresseusement.
+
+    Tant que le masque est dense, on tire des positions au hasard et on garde
+    celles à 1 (sans extraire tout le masque); sinon on extrait les positions
+    restantes et on les mélange au fil de l'eau (Fisher-Yates partiel).
+    """
+    remaining = mask.bit_count()
+    width = mask.bit_length()
+    taken = 0
+    misses = 0
+    # Échantillonnage par rejet: rentable tant que peu de positions sont consommées
+    while remaining and misses < 32 and remaining * 4 >= width:
+        position = rng.randrange(width)
+        bit = 1 << position
+        if mask & bit and not taken & bit:
+            taken |= bit
+            remaining -= 1
+            misses = 0
+            yield position
+        else:
+            misses += 1
+    if not remaining:
+        return
+    positions = list(iter_positions(mask & ~taken))
+    count = len(positions)
+    for j in range(count):
+        k = rng.randrange(j, count)
+        positions[j], positions[k] = positions[k], positions[j]
+        yield positions[j]
+
+
+def _fallback_labels(fallbacks: list[str]) -> list[str]:
+    counts = {}
+    for fb in fallbacks:
+        counts[fb] = counts.get(fb, 0) + 1
+    return [f"⚠️ {count}x {reason.replace('_', ' ')}" for reason, count in counts.items()]
+
+
+class KeywordSelectionIndex:
+    """Index compact des candidats: positions, keywords par position et masques par keyword."""
+
+    def __init__(self, candidate_ids, question_keywords: dict[int, frozenset[int]]):
+        self.ids = list(candidate_ids)
+        self.size = len(self.ids)
+        self.position = {qid: i for i, qid in enumerate(self.ids)}
+        self.keywords = [question_keywords.get(qid) or EMPTY_KEYWORDS for qid in self.ids]
+        self.all_mask = (1 << self.size) - 1
+
+        postings: dict[int, list[int]] = {}
+        with_keywords = []
+        for i, kws in enumerate(self.keywords):
+            if kws:
+                with_keywords.append(i)
+                for kw in kws:
+                    postings.setdefault(kw, []).append(i)
+        self._postings = postings
+        # Masques par keyword, calculés à la demande puis conservés avec l'index
+        self._keyword_masks: dict[int, int] = {}
+        self.no_keyword_mask = self.all_mask & ~mask_from_positions(with_keywords, self.size)
+
+    def __len__(self):
+        return self.size
+
+    def keyword_mask(self, keyword_ids) -> int:
+        """Masque des candidats portant au moins un des keywords donnés."""
+        mask = 0
+        masks = self._keyword_masks
+        for kw in keyword_ids:
+            kw_mask = masks.get(kw)
+            if kw_mask is None:
+                positions = self._postings.get(kw)
+                if not positions:
+                    continue
+                kw_mask = mask_from_positions(positions, self.size)
+                masks[kw] = kw_mask
+            mask |= kw_mask
+        return mask
+
+    def question_mask(self, question_ids) -> int:
+        """Masque des candidats dont l'ID fait partie de `question_ids`."""
+        if len(question_ids) > self.size:
+            positions = [i for i, qid in enumerate(self.ids) if qid in question_ids]
+        else:
+            positions = [p for p in map(self.position.get, question_ids) if p is not None]
+        return mask_from_positions(positions, self.size)
+
+    def select(
+        self,
+        quota: int,
+        seen_question_ids=(),
+        used_keywords=(),
+        answered_keywords=(),
+        prevent_duplicate_keywords: bool = True,
+        restrict_mask: int | None = None,
+        rng=None,
+    ) -> tuple[list[int], set[int], dict]:
+        """Sélectionne jusqu'à `quota` candidats (parmi `restrict_mask` si fourni).
+
+        Retourne: (selected_ids, used_keywords_updated, stats)
+        """
+        selected, used, stats = self.select_groups(
+            [(None, restrict_mask, quota)],
+            seen_question_ids=seen_question_ids,
+            used_keywords=used_keywords,
+            answered_keywords=answered_keywords,
+            prevent_duplicate_keywords=prevent_duplicate_keywords,
+            rng=rng,
+        )
+        return selected[None], used, stats[None]
+
+    def select_groups(
+        self,
+        groups,
+        seen_question_ids=(),
+        used_keywords=(),
+        answered_keywords=(),
+        prevent_duplicate_keywords: bool = True,
+        rng=None,
+    ) -> tuple[dict, set[int], dict]:
+        """Remplit plusieurs quotas en une passe sur le même index.
+
+        `groups`: liste de (clé, masque de restriction ou None, quota), traités dans
+        l'ordre. Les masques des questions vues et des keywords répondus sont calculés
+        une seule fois et les keywords utilisés sont partagés entre les groupes.
+
+        Retourne: ({clé: selected_ids}, used_keywords_updated, {clé: stats})
+        """
+        rng = rng or random
+        current_used_keywords = set(used_keywords)
+        seen_mask = self.question_mask(seen_question_ids) if seen_question_ids else 0
+        answered_mask = self.keyword_mask(answered_keywords) if answered_keywords else 0
+
+        selected_by_group = {}
+        stats_by_group = {}
+        for key, restrict_mask, quota in groups:
+            candidates = self.all_mask if restrict_mask is None else (restrict_mask & self.all_mask)
+            selected_by_group[key], stats_by_group[key] = self._fill(
+                candidates, quota, seen_mask, answered_mask,
+                current_used_keywords, prevent_duplicate_keywords, rng,
+            )
+        return selected_by_group, current_used_keywords, stats_by_group
+
+    def _fill(self, candidates, quota, seen_mask, answered_mask, current_used_keywords, prevent_duplicate_keywords, rng):
+        """Sélection dans `candidates`; met à jour `current_used_keywords` en place."""
+        stats = {
+            'perfect': True,
+            'total_candidates': candidates.bit_count(),
+            'conditions_met': [],
+            'fallback_used': [],
+        }
+        selected_ids: list[int] = []
+        if quota <= 0 or not candidates:
+            return selected_ids, stats
+
+        seen_mask &= candidates
+        answered_mask &= candidates
+        dup_mask = 0
+        if prevent_duplicate_keywords and current_used_keywords:
+            dup_mask = self.keyword_mask(current_used_keywords) & candidates
+
+        # (masque du critère, critère respecté quand le bit est à 0)
+        criteria = (
+            (dup_mask, True),              # pas de doublon de keyword
+            (seen_mask, True),             # question non vue
+            (answered_mask, True),         # keywords non répondus
+            (self.no_keyword_mask, False), # sans keyword
+        )
+
+        deferred: list[int] = []
+        keywords = self.keywords
+        ids = self.ids
+
+        def take(position: int, allow_duplicate: bool) -> bool:
+            q_keywords = keywords[position]
+            duplicate = bool(prevent_duplicate_keywords and q_keywords and not current_used_keywords.isdisjoint(q_keywords))
+            if duplicate and not allow_duplicate:
+                return False
+            if duplicate:
+                stats['fallback_used'].append('keyword_duplicate')
+            mask_bit = 1 << position
+            if seen_mask & mask_bit:
+                stats['fallback_used'].append('question_already_seen')
+            if answered_mask & mask_bit:
+                stats['fallback_used'].append('keyword_already_answered')
+            selected_ids.append(ids[position])
+            current_used_keywords.update(q_keywords)
+            return True
+
+        # Parcourir les 16 groupes du meilleur (1111) au moins bon (0000)
+        for bucket in range(15, -1, -1):
+            if len(selected_ids) >= quota:
+                break
+            bucket_mask = candidates
+            for bit, (criterion_mask, wanted_clear) in zip((8, 4, 2, 1), criteria):
+                if bool(bucket & bit) == wanted_clear:
+                    bucket_mask &= ~criterion_mask
+                else:
+                    bucket_mask &= criterion_mask
+                if not bucket_mask:
+                    break
+            if not bucket_mask:
+                continue
+
+            # Tirage aléatoire partiel: on ne parcourt que ce qui est consommé
+            for position in iter_random_positions(bucket_mask, rng):
+                if len(selected_ids) >= quota:
+                    break
+                # Un keyword déjà pris dans ce quiz: reporter en fin de sélection
+                if not take(position, allow_duplicate=False):
+                    deferred.append(position)
+
+        # Compléter avec les doublons de keywords si le pool ne suffit pas
+        for position in deferred:
+            if len(selected_ids) >= quota:
+                break
+            take(position, allow_duplicate=True)
+
+        if stats['fallback_used']:
+            stats['perfect'] = False
+            stats['conditions_met'] = _fallback_labels(stats['fallback_used'])
+        else:
+            stats['conditions_met'] = ['Toutes les conditions respectées ✅']
+        return selected_ids, stats
@@ -0,0 +1,165 @@
+"""
+Simulation (à blanc) de la génération de playlists d'un set de règles.
+
+Exécute le vrai générateur (quiz_playlist.build_playlist) un grand nombre de
+fois, sans rien écrire en base, pour un historique de joueur:
+- 'anonymous': aucun historique (joueur non connecté);
+- 'user': l'historique réel d'un utilisateur, identique à chaque partie;
+- 'progressive': un joueur qui enchaîne les parties (chaque playlist s'ajoute à
+  son historique), pour voir au bout de combien de parties les questions non
+  vues s'épuisent.
+Un historique synthétique initial peut être ajouté (`seen_ratio`: part du pool
+marquée comme déjà vue, avec les keywords correspondants).
+
+Le rapport donne la capacité du pool, le taux de remplissage des quotas, les
+compromis de sélection (doublons de keywords, questions déjà vues, keywords déjà
+répondus) et la durée de chaque étape, ainsi que le coût d'une construction du
+pool à froid.
+"""
+
+import math
+import random
+import time
+
+from quiz_playlist import STAGES, build_playlist
+from quiz_pool import build_candidate_pool, get_candidate_pool
+
+
+HISTORY_MODES = ('anonymous', 'user', 'progressive')
+MAX_RUNS = 5000
+FALLBACK_REASONS = ('keyword_duplicate', 'question_already_seen', 'keyword_already_answered')
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(len(sorted_values) * pct / 100.0) - 1))
+    return sorted_values[rank]
+
+
+def _timing_summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p95_ms': round(_percentile(values, 95) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def simulate_playlists(rule_set, runs: int = 1000, history_mode: str = 'anonymous',
+                       seen_question_ids=(), answered_keywords=(), seen_ratio: float = 0.0,
+                       seed: int | None = None) -> dict:
+    """Génère `runs` playlists pour un set compilé et agrège les résultats."""
+    if history_mode not in HISTORY_MODES:
+        raise ValueError(f"Mode d'historique inconnu: {history_mode}")
+    runs = max(1, min(int(runs), MAX_RUNS))
+    rng = random.Random(seed)
+
+    # Coût d'une construction du pool à froid (le générateur utilise ensuite le cache)
+    started = time.perf_counter()
+    build_candidate_pool(rule_set)
+    cold_pool_seconds = time.perf_counter() - started
+    pool = get_candidate_pool(rule_set)
+
+    seen = set(seen_question_ids)
+    answered = set(answered_keywords)
+    if seen_ratio > 0 and len(pool):
+        synthetic = rng.sample(pool.ordered_ids, int(len(pool) * min(seen_ratio, 1.0)))
+        seen.update(synthetic)
+        for qid in synthetic:
+            answered.update(pool.keywords.get(qid, ()))
+    initial_seen, initial_answered = len(seen), len(answered)
+
+    timings = {stage: [] for stage in STAGES}
+    totals = []
+    groups: dict = {}
+    fallbacks = {reason: {'occurrences': 0, 'runs': 0} for reason in FALLBACK_REASONS}
+    lengths = []
+    expected_total = 0
+    incomplete_runs = 0
+    perfect_runs = 0
+    first_seen_run = None
+    first_incomplete_run = None
+    used_questions = set()
+
+    for run in range(1, runs + 1):
+        playlist, report = build_playlist(rule_set, seen, answered, rng=rng)
+        expected_total = report['expected_total']
+        lengths.append(len(playlist))
+        used_questions.update(playlist)
+        for stage in STAGES:
+            timings[stage].append(report['timings'][stage])
+        totals.append(sum(report['timings'].values()))
+
+        if len(playlist) < expected_total:
+            incomplete_runs += 1
+            if first_incomplete_run is None:
+                first_incomplete_run = run
+        run_reasons = set()
+        for group in report['groups']:
+            entry = groups.setdefault(group['difficulty'], {
+                'quota': group['quota'], 'candidates': group['stats']['total_candidates'],
+                'selected': 0, 'incomplete_runs': 0,
+            })
+            entry['selected'] += group['selected']
+            if group['selected'] < group['quota']:
+                entry['incomplete_runs'] += 1
+            for reason in group['stats']['fallback_used']:
+                fallbacks[reason]['occurrences'] += 1
+                run_reasons.add(reason)
+        for reason in run_reasons:
+            fallbacks[reason]['runs'] += 1
+        if not run_reasons:
+            perfect_runs += 1
+        if 'question_already_seen' in run_reasons and first_seen_run is None:
+            first_seen_run = run
+
+        if history_mode == 'progressive':
+            # Le joueur a répondu à toute la playlist avant la partie suivante
+            seen.update(playlist)
+            for qid in playlist:
+                answered.update(pool.keywords.get(qid, ()))
+
+    return {
+        'rule_set': {'id': rule_set.id, 'slug': rule_set.slug, 'name': rule_set.name},
+        'runs': runs,
+        'seed': seed,
+        'history': {
+            'mode': history_mode,
+            'initial_seen_questions': initial_seen,
+            'initial_answered_keywords': initial_answered,
+            'final_seen_questions': len(seen),
+        },
+        'pool': {
+            'size': len(pool),
+            'manual': pool.manual,
+            'by_difficulty': {str(d): len(ids) for d, ids in sorted(pool.by_difficulty.items(), key=lambda item: (item[0] is None, item[0] or 0))},
+            'cold_build_ms': round(cold_pool_seconds * 1000, 3),
+        },
+        'playlists': {
+            'expected_length': expected_total,
+            'mean_length': round(sum(lengths) / runs, 3),
+            'min_length': min(lengths),
+            'fill_rate': round(sum(lengths) / (expected_total * runs), 4) if expected_total else 1.0,
+            'incomplete_runs': incomplete_runs,
+            'first_incomplete_run': first_incomplete_run,
+            'perfect_runs': perfect_runs,
+            'distinct_questions_used': len(used_questions),
+            'pool_coverage': round(len(used_questions) / len(pool), 4) if len(pool) else 0.0,
+        },
+        'quotas': [
+            {
+                'difficulty': difficulty,
+                'quota': entry['quota'],
+                'candidates': entry['candidates'],
+                'fill_rate': round(entry['selected'] / (entry['quota'] * runs), 4) if entry['quota'] else 1.0,
+                'incomplete_runs': entry['incomplete_runs'],
+            }
+            for difficulty, entry in groups.items()
+        ],
+        'fallbacks': fallbacks,
+        # Première partie contenant une question déjà vue (épuisement des questions non vues)
+        'unseen_exhausted_at_run': first_seen_run,
+        'timings': dict({stage: _timing_summary(values) for stage, values in timings.items()},
+                        total=_timing_summary(totals)),
+    }
@@ -0,0 +1,213 @@
+"""
+Stockage côté serveur de l'état des parties de quiz.
+
+La playlist, l'index courant, le score, la série de bonnes réponses (combo) et le
+détail du score étaient auparavant conservés dans le cookie de session Flask, qui
+grossissait à chaque question et devait être re-signé à chaque requête.
+Le cookie ne contient désormais qu'un identifiant opaque (`quiz_sid`) et l'état
+est stocké ici, par couple (sid, clé d'état), avec une expiration glissante (TTL).
+
+Deux implémentations:
+- SQLiteQuizStateStore: fichier SQLite dédié (par défaut), partagé entre workers
+- MemoryQuizStateStore: dictionnaire en mémoire (tests, développement)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app_logging import get_logger
+
+
+log = get_logger('quiz.state')
+
+
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+
+class QuizStateStore:
+    """Interface commune: état JSON indexé par (sid, clé), expirant après `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS, purge_interval: int = 300):
+        self.ttl_seconds = int(ttl_seconds)
+        self.purge_interval = int(purge_interval)
+        self._last_purge = time.time()
+
+    def get(self, sid: str, key: str) -> dict | None:
+        raise NotImplementedError
+
+    def set(self, sid: str, key: str, state: dict):
+        raise NotImplementedError
+
+    def add(self, sid: str, key: str, state: dict) -> bool:
+        """Enregistre l'état seulement s'il n'en existe pas déjà un (non expiré), de façon atomique.
+
+        Retourne False si la clé existe: marqueurs à usage unique (anti-rejeu).
+        """
+        raise NotImplementedError
+
+    def delete(self, sid: str, key: str):
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Supprime les états expirés et retourne le nombre d'entrées supprimées."""
+        raise NotImplementedError
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            try:
+                self.purge_expired()
+            except Exception as e:
+                log.warning("Purge impossible: %s", e)
+
+
+class MemoryQuizStateStore(QuizStateStore):
+    """Stockage en mémoire du processus (non partagé entre workers)."""
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS, purge_interval: int = 300):
+        super().__init__(ttl_seconds, purge_interval)
+        self._data: dict[tuple[str, str], tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid, key):
+        with self._lock:
+            entry = self._data.get((sid, key))
+            if not entry:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._data[(sid, key)]
+                return None
+        # Sérialisé en JSON pour garder la même sémantique de copie que SQLite
+        return json.loads(payload)
+
+    def set(self, sid, key, state):
+        payload = json.dumps(state)
+        with self._lock:
+            self._data[(sid, key)] = (time.time() + self.ttl_seconds, payload)
+        self._maybe_purge()
+
+    def add(self, sid, key, state):
+        payload = json.dumps(state)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get((sid, key))
+            if entry and entry[0] >= now:
+                return False
+            self._data[(sid, key)] = (now + self.ttl_seconds, payload)
+        self._maybe_purge()
+        return True
+
+    def delete(self, sid, key):
+        with self._lock:
+            self._data.pop((sid, key), None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (expires_at, _) in self._data.items() if expires_at < now]
+            for k in expired:
+                del self._data[k]
+        return len(expired)
+
+
+class SQLiteQuizStateStore(QuizStateStore):
+    """Stockage dans un fichier SQLite dédié (WAL), distinct de la base principale
+    pour ne pas concurrencer son verrou d'écriture."""
+
+    def __init__(self, path: str, ttl_seconds: int = DEFAULT_TTL_SECONDS, purge_interval: int = 300):
+        super().__init__(ttl_seconds, purge_interval)
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_state (
+                sid TEXT NOT NULL,
+                state_key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (sid, state_key)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_quiz_state_expires_at ON quiz_state (expires_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Une connexion par thread (sqlite3 n'autorise pas le partage par défaut)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid, key):
+        row = self._conn().execute(
+            "SELECT data, expires_at FROM quiz_state WHERE sid = ? AND state_key = ?",
+            (sid, key),
+        ).fetchone()
+        if not row:
+            return None
+        data, expires_at = row
+        if expires_at < time.time():
+            self.delete(sid, key)
+            return None
+        return json.loads(data)
+
+    def set(self, sid, key, state):
+        conn = self._conn()
+        conn.execute(
+            """
+            INSERT INTO quiz_state (sid, state_key, data, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (sid, state_key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            """,
+            (sid, key, json.dumps(state), time.time() + self.ttl_seconds),
+        )
+        conn.commit()
+        self._maybe_purge()
+
+    def add(self, sid, key, state):
+        now = time.time()
+        conn = self._conn()
+        # Une seule instruction: insertion, ou remplacement d'un état expiré; rowcount 0 si la clé existe
+        cur = conn.execute(
+            """
+            INSERT INTO quiz_state (sid, state_key, data, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (sid, state_key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            WHERE quiz_state.expires_at < ?
+            """,
+            (sid, key, json.dumps(state), now + self.ttl_seconds, now),
+        )
+        conn.commit()
+        self._maybe_purge()
+        return cur.rowcount == 1
+
+    def delete(self, sid, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM quiz_state WHERE sid = ? AND state_key = ?", (sid, key))
+        conn.commit()
+
+    def purge_expired(self):
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM quiz_state WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+        return cur.rowcount or 0
+
+
+def create_quiz_state_store(config: dict, instance_path: str) -> QuizStateStore:
+    """Instancie le stockage d'état selon la configuration (QUIZ_STATE_BACKEND = sqlite|memory)."""
+    backend = (config.get('QUIZ_STATE_BACKEND') or 'sqlite').lower()
+    ttl = int(config.get('QUIZ_STATE_TTL_SECONDS') or DEFAULT_TTL_SECONDS)
+    if backend == 'memory':
+        return MemoryQuizStateStore(ttl_seconds=ttl)
+    path = config.get('QUIZ_STATE_DB_PATH') or os.path.join(instance_path, 'quiz_state.db')
+    return SQLiteQuizStateStore(path, ttl_seconds=ttl)
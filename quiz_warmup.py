@@ -0,0 +1,176 @@
+"""
+Réserve de playlists pré-générées pour démarrer (ou rejouer) un quiz sans attendre.
+
+La première requête `/api/quiz/next` d'une partie générait la playlist avant de
+pouvoir afficher quoi que ce soit. Un thread de fond prépare désormais:
+- pour les joueurs anonymes: jusqu'à N playlists prêtes par set de règles joué
+  récemment (la réserve est complétée à chaque prélèvement);
+- pour un utilisateur connecté: sa prochaine playlist, calculée dès l'affichage
+  de l'écran final (bouton "Rejouer") ou de la page du quiz (bouton "Démarrer").
+
+Une playlist en réserve n'est servie que si le catalogue (version de quiz_pool)
+et, pour un utilisateur, son historique de jeu n'ont pas changé depuis sa
+génération; sinon elle est ignorée et la génération se fait comme avant.
+L'historique est lu une seule fois, avant la génération, et c'est cet instantané
+qui est à la fois utilisé pour générer et conservé pour la comparaison: une
+réponse donnée pendant la génération rend la playlist périmée.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+from models import QuizRuleSet, db
+from quiz_pool import catalog_version
+from quiz_history import get_user_history
+from app_logging import get_logger
+
+
+log = get_logger('quiz.warmup')
+
+
+DEFAULT_POOL_SIZE = 3
+DEFAULT_USER_TTL_SECONDS = 15 * 60
+
+
+class PlaylistWarmPool:
+    """Playlists prêtes par set de règles (anonymes) et par (utilisateur, set)."""
+
+    def __init__(self, app, generate_playlist, size: int = DEFAULT_POOL_SIZE,
+                 user_ttl_seconds: int = DEFAULT_USER_TTL_SECONDS):
+        self.app = app
+        self.generate_playlist = generate_playlist
+        self.size = int(size)
+        self.user_ttl_seconds = int(user_ttl_seconds)
+        self._anonymous: dict[int, deque] = {}
+        self._users: dict[tuple[int, int], tuple[float, int, tuple[int, int], list[int]]] = {}
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._tasks: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    # ---------- Consommation (chemin critique) ----------
+
+    def take(self, rule_set: QuizRuleSet, user_id: int | None) -> list[int] | None:
+        """Retourne une playlist prête pour ce set (et cet utilisateur), ou None."""
+        if not self.enabled:
+            return None
+        version = catalog_version()
+        if user_id:
+            with self._lock:
+                entry = self._users.pop((user_id, rule_set.id), None)
+            if not entry:
+                return None
+            expires_at, entry_version, history_size, playlist = entry
+            if expires_at < time.time() or entry_version != version:
+                return None
+            seen, keywords = get_user_history(user_id)
+            if (len(seen), len(keywords)) != history_size:
+                return None
+            log.debug("Playlist pré-générée servie pour user=%s set=%s", user_id, rule_set.id)
+            return playlist
+
+        playlist = None
+        with self._lock:
+            ready = self._anonymous.setdefault(rule_set.id, deque())
+            while ready:
+                entry_version, candidate = ready.popleft()
+                if entry_version == version:
+                    playlist = candidate
+                    break
+        # Compléter la réserve en arrière-plan
+        self.schedule_anonymous(rule_set.id)
+        if playlist is not None:
+            log.debug("Playlist pré-générée servie pour set=%s (anonyme)", rule_set.id)
+        return playlist
+
+    # ---------- Planification ----------
+
+    def schedule_anonymous(self, rule_set_id: int):
+        self._schedule(('anonymous', rule_set_id, None))
+
+    def schedule_user(self, rule_set_id: int, user_id: int):
+        if user_id:
+            self._schedule(('user', rule_set_id, user_id))
+
+    def _schedule(self, task):
+        if not self.enabled:
+            return
+        with self._lock:
+            if task in self._pending:
+                return
+            self._pending.add(task)
+        self._ensure_worker()
+        self._tasks.put(task)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='quiz-warmup', daemon=True)
+            self._thread.start()
+
+    # ---------- Thread de fond ----------
+
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            try:
+                with self.app.app_context():
+                    self._process(task)
+            except Exception as e:
+                log.exception("Erreur pré-génération %s: %s", task, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(task)
+                self._tasks.task_done()
+
+    def _process(self, task):
+        kind, rule_set_id, user_id = task
+        rule_set = db.session.get(QuizRuleSet, rule_set_id)
+        if not rule_set or not rule_set.is_active:
+            return
+        version = catalog_version()
+        if kind == 'user':
+            self.purge_expired()
+            seen, keywords = get_user_history(user_id)
+            playlist = self.generate_playlist(rule_set, user_id, history=(seen, keywords))
+            if playlist:
+                with self._lock:
+                    self._users[(user_id, rule_set_id)] = (
+                        time.time() + self.user_ttl_seconds, version, (len(seen), len(keywords)), playlist
+                    )
+            return
+
+        # Anonyme: compléter jusqu'à `size` playlists à jour
+        while True:
+            with self._lock:
+                ready = self._anonymous.setdefault(rule_set_id, deque())
+                fresh = [entry for entry in ready if entry[0] == version]
+                ready.clear()
+                ready.extend(fresh)
+                missing = self.size - len(ready)
+            if missing <= 0:
+                return
+            playlist = self.generate_playlist(rule_set, None)
+            if not playlist:
+                return
+            with self._lock:
+                self._anonymous[rule_set_id].append((version, playlist))
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for key in [k for k, entry in self._users.items() if entry[0] < now]:
+                del self._users[key]
+
+    def wait_idle(self):
+        """Attend la fin des pré-générations en cours (tests, scripts)."""
+        self._tasks.join()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Tâches planifiées: résumés des nouveaux messages et envoi des emails en attente.
+
+Les threads de fond (email_digest, email_outbox) ne tournent pas sur un serveur
+WSGI sans threads (PythonAnywhere): les résumés horaires et quotidiens ne
+seraient jamais construits, et un email reprogrammé (serveur SMTP indisponible)
+attendrait la prochaine requête qui en ajoute un autre. Ce script ajoute les
+résumés dus à la boîte d'envoi puis la vide; à lancer par une tâche planifiée
+(onglet Tasks), toutes les heures pour les résumés horaires:
+
+    cd /home/votre-username/votre-projet && python scheduled_tasks.py
+"""
+
+from app_logging import get_logger
+
+
+log = get_logger('app.tasks')
+
+
+def run_scheduled_tasks(app) -> dict:
+    """Ajoute les résumés dus puis envoie les emails dus; retourne le nombre de résumés et d'emails traités."""
+    digests = app.extensions['email_digest'].run_due(wake_outbox=False)
+    emails = app.extensions['email_outbox'].drain()
+    log.info("Tâches planifiées: %s résumé(s), %s email(s) traité(s)", digests, emails)
+    return {'digests': digests, 'emails': emails}
+
+
+if __name__ == '__main__':
+    from app import app
+
+    result = run_scheduled_tasks(app)
+    print(f"[OK] {result['digests']} résumé(s), {result['emails']} email(s) traité(s)")
@@ -27,6 +27,14 @@ def show_pythonanywhere_setup():
     print("# export MAIL_USE_TLS=1")
     print("# export MAIL_DEFAULT_SENDER=votre-email@domain.com")
     print()
+    print("# Laisser MESSAGE_EVENTS_ENABLED désactivé : les messages en temps réel (SSE)")
+    print("# gardent un worker occupé par onglet ouvert (serveur threadé ou asynchrone requis)")
+    print()
+    print("# Workers sans threads : les emails partent après la requête qui les crée ;")
+    print("# résumés horaires / quotidiens et nouveaux essais : tâche planifiée")
+    print("# (onglet Tasks, toutes les heures) :")
+    print("#   cd /home/votre-username/votre-projet && python scheduled_tasks.py")
+    print()
 
     print("2. INITIALISER LA BASE DE DONNÉES :")
     print()
@@ -0,0 +1,229 @@
+"""
+Comptage des requêtes SQL par requête HTTP et détection des N+1.
+
+Plusieurs vues exécutent une requête par ligne affichée (`api_messages_list`:
+trois requêtes par conversation, `countries_list.html`: `country.questions.count()`
+par pays, relations `lazy='subquery'` de Question). Ce module s'abonne aux
+événements du moteur SQLAlchemy (toutes les instances d'Engine) et compte, pour
+chaque requête HTTP, les instructions exécutées et le temps passé en base.
+
+Les instructions sont regroupées par forme (littéraux et listes `IN (?, ?, ...)`
+normalisés): une même forme exécutée au moins SQL_N_PLUS_ONE_THRESHOLD fois
+dans une requête est signalée comme N+1 probable (log `app.sql`).
+
+- SQL_PROFILING: en-têtes X-SQL-Queries / X-SQL-Time-Ms / X-SQL-Repeated sur
+  chaque réponse et journalisation des N+1 et dépassements de SQL_QUERY_BUDGET.
+- Tests: `assert_max_queries(n)` fait échouer un test si le bloc exécute plus
+  de n instructions (ou une forme répétée au-delà de `max_repeats`);
+  `count_queries()` donne le détail sans assertion.
+
+Les requêtes des threads de fond (pré-génération, écriture des compteurs) ne
+sont attribuées à aucune requête HTTP.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app_logging import get_logger
+
+
+log = get_logger('app.sql')
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+# Collecteurs actifs du thread courant (requête HTTP, blocs de test imbriqués)
+_active = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+def normalize_statement(statement: str) -> str:
+    """Forme d'une instruction: littéraux remplacés par ?, listes IN réduites, espaces compactés."""
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('IN (?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryStats:
+    """Instructions SQL exécutées pendant une requête HTTP (ou un bloc de test)."""
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        # forme -> [nombre d'exécutions, temps cumulé]
+        self.shapes: dict[str, list] = {}
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.seconds += elapsed
+        entry = self.shapes.get(statement)
+        if entry is None:
+            self.shapes[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def repeated(self, threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int, float]]:
+        """Formes exécutées au moins `threshold` fois: [(forme, exécutions, secondes)], les plus fréquentes d'abord."""
+        grouped: dict[str, list] = {}
+        for statement, (count, seconds) in self.shapes.items():
+            entry = grouped.setdefault(normalize_statement(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        result = [(shape, count, seconds) for shape, (count, seconds) in grouped.items() if count >= threshold]
+        result.sort(key=lambda item: (-item[1], item[0]))
+        return result
+
+    def summary(self, threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD) -> dict:
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'time_ms': round(self.seconds * 1000, 3),
+            'repeated': [
+                {'statement': shape, 'count': count, 'time_ms': round(seconds * 1000, 3)}
+                for shape, count, seconds in self.repeated(threshold)
+            ],
+        }
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Un bloc a exécuté plus d'instructions SQL que son budget."""
+
+
+def _collectors() -> list:
+    stack = getattr(_active, 'stack', None)
+    if stack is None:
+        stack = _active.stack = []
+    return stack
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_active, 'stack', None):
+        conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('sql_profiler_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    for stats in getattr(_active, 'stack', None) or ():
+        stats.record(statement, elapsed)
+
+
+def _handle_error(context):
+    started = context.connection.info.get('sql_profiler_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def install_query_listeners():
+    """S'abonne (une seule fois) aux événements d'exécution de tous les moteurs."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _installed = True
+
+
+@contextmanager
+def count_queries(label: str = ''):
+    """Compte les instructions SQL exécutées par le thread courant dans le bloc."""
+    install_query_listeners()
+    stats = QueryStats(label)
+    stack = _collectors()
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, max_repeats: int | None = None, label: str = ''):
+    """Échoue (QueryBudgetExceeded) si le bloc dépasse `max_queries` instructions,
+    ou si une même forme y est exécutée plus de `max_repeats` fois (N+1).
+
+        with assert_max_queries(5):
+            client.get('/api/messages/list')
+    """
+    with count_queries(label) as stats:
+        yield stats
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} requêtes SQL (budget: {max_queries})")
+    if max_repeats is not None:
+        for shape, count, _seconds in stats.repeated(max_repeats + 1):
+            problems.append(f"{count}× {shape[:200]}")
+    if problems:
+        raise QueryBudgetExceeded(f"{label or 'Bloc'}: " + '; '.join(problems))
+
+
+class SQLProfiler:
+    """Statistiques SQL de chaque requête HTTP (en-têtes de debug, alertes N+1 et budget)."""
+
+    def __init__(self, app, enabled: bool = False, threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD,
+                 budget: int = 0):
+        self.enabled = enabled
+        self.threshold = max(int(threshold), 2)
+        self.budget = max(int(budget or 0), 0)
+        if not enabled:
+            return
+        install_query_listeners()
+        app.before_request(self._start)
+        app.after_request(self._report)
+        app.teardown_request(self._stop)
+
+    def _start(self):
+        stats = QueryStats(f"{request.method} {request.path}")
+        _collectors().append(stats)
+        request.environ['sql_profiler.stats'] = stats
+
+    def _report(self, response):
+        stats = request.environ.get('sql_profiler.stats')
+        if stats is None:
+            return response
+        repeated = stats.repeated(self.threshold)
+        response.headers['X-SQL-Queries'] = str(stats.count)
+        response.headers['X-SQL-Time-Ms'] = f"{stats.seconds * 1000:.2f}"
+        response.headers['X-SQL-Repeated'] = str(len(repeated))
+        if repeated:
+            shape, count, seconds = repeated[0]
+            log.warning("N+1 probable sur %s: %s requêtes, %s forme(s) répétée(s), la plus fréquente %s× (%.1f ms): %s",
+                        stats.label, stats.count, len(repeated), count, seconds * 1000, shape[:200],
+                        extra={'sql_queries': stats.count})
+        if self.budget and stats.count > self.budget:
+            log.warning("%s: %s requêtes SQL (budget: %s)", stats.label, stats.count, self.budget,
+                        extra={'sql_queries': stats.count})
+        return response
+
+    def _stop(self, exc=None):
+        stats = request.environ.pop('sql_profiler.stats', None)
+        stack = getattr(_active, 'stack', None)
+        if stats is not None and stack and stats in stack:
+            stack.remove(stats)
+
+
+def init_sql_profiler(app) -> SQLProfiler:
+    return SQLProfiler(
+        app,
+        enabled=bool(app.config.get('SQL_PROFILING')),
+        threshold=app.config.get('SQL_N_PLUS_ONE_THRESHOLD') or DEFAULT_N_PLUS_ONE_THRESHOLD,
+        budget=app.config.get('SQL_QUERY_BUDGET') or 0,
+    )
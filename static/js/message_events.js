@@ -0,0 +1,66 @@
+/**
+ * Nouveaux messages en temps réel (server-sent events, /api/messages/events).
+ * - badge des non lus du widget mis à jour à chaque événement;
+ * - fil ouvert de la conversation: ajout du seul nouveau message;
+ * - liste des conversations affichée: rechargement de la première page.
+ */
+(function () {
+  if (!window.EventSource || window.messageEvents) return;
+
+  function setUnread(count) {
+    const badge = document.getElementById('unread-badge');
+    const counter = document.getElementById('unread-count');
+    if (!badge || !counter) return;
+    counter.textContent = count;
+    badge.hidden = !(count > 0);
+  }
+
+  function reloadConversations() {
+    const list = document.getElementById('conversations');
+    if (!list) return;
+    const active = list.querySelector('.conv-item.active');
+    const activeId = active ? active.dataset.conversationId : null;
+    htmx.ajax('GET', '/api/messages/list', { target: '#conversations', swap: 'outerHTML' }).then(function () {
+      if (!activeId) return;
+      const item = document.querySelector('#conversations .conv-item[data-conversation-id="' + activeId + '"]');
+      if (item) item.classList.add('active');
+    });
+  }
+
+  function appendMessage(data) {
+    const thread = document.querySelector('.thread[data-conversation-id="' + data.conversation_id + '"] .thread-messages');
+    if (!thread) return false;
+    if (document.getElementById('msg-' + data.message_id)) return true;
+    const url = '/api/messages/thread/' + data.conversation_id + '/message/' + data.message_id;
+    htmx.ajax('GET', url, { target: thread, swap: 'beforeend' }).then(function () {
+      thread.scrollTop = thread.scrollHeight;
+    });
+    return true;
+  }
+
+  // Total renvoyé par le fragment d'un message (le fil ouvert marque la conversation lue)
+  document.body.addEventListener('messages-unread', function (event) {
+    setUnread(event.detail.unread);
+  });
+
+  const source = new EventSource('/api/messages/events');
+  window.messageEvents = source;
+
+  source.addEventListener('unread', function (event) {
+    setUnread(JSON.parse(event.data).unread);
+  });
+
+  source.addEventListener('message', function (event) {
+    const data = JSON.parse(event.data);
+    if (!appendMessage(data)) {
+      setUnread(data.unread);
+      reloadConversations();
+    }
+  });
+
+  // Événements perdus (client trop lent): tout recharger
+  source.addEventListener('resync', function () {
+    htmx.ajax('GET', '/auth/widget', { target: '#auth-widget', swap: 'outerHTML' });
+    reloadConversations();
+  });
+})();
@@ -0,0 +1,158 @@
+"""
+Tests pour les résumés email des nouveaux messages (email_digest.py)
+
+Usage:
+    python test_email_digest.py
+"""
+
+import os
+import socket
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, User, Conversation, ConversationParticipant, ConversationMessage, EmailOutbox, PendingNotification
+from email_digest import DigestScheduler, digest_cutoff, queue_message_notification
+from email_outbox import OutboxSender
+from scheduled_tasks import run_scheduled_tasks
+
+
+def test_digest_cutoff():
+    """Test 1 : Échéances des résumés"""
+    print("\n=== Test 1 : Échéances ===")
+    now = datetime(2026, 3, 10, 6, 45, 12)
+    assert digest_cutoff('hourly', now) == datetime(2026, 3, 10, 6, 0)
+    assert digest_cutoff('daily', now, daily_hour=7) == datetime(2026, 3, 9, 7, 0)
+    assert digest_cutoff('daily', now.replace(hour=8), daily_hour=7) == datetime(2026, 3, 10, 7, 0)
+    assert digest_cutoff('immediate', now) == now
+    print("✅ Échéances OK")
+
+
+def test_scheduler_groups_messages():
+    """Test 2 : Un email par utilisateur, messages groupés par conversation"""
+    print("\n=== Test 2 : Résumés ===")
+    saved = {key: os.environ.get(key) for key in ('MAIL_SERVER', 'MAIL_DEFAULT_SENDER')}
+    os.environ.update({'MAIL_SERVER': '127.0.0.1', 'MAIL_DEFAULT_SENDER': 'quiz@example.org'})
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = Flask(__name__)
+            app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'digest.db')}"
+            db.init_app(app)
+            with app.app_context():
+                db.create_all()
+                author = User(username='auteur', password_hash='x')
+                moderator = User(username='modo', password_hash='x', email='modo@example.org')
+                moderator.set_preferences({'notify_email_on_message': True, 'notify_email_digest': 'hourly'})
+                daily = User(username='quotidien', password_hash='x', email='daily@example.org')
+                daily.set_preferences({'notify_email_on_message': True, 'notify_email_digest': 'daily'})
+                db.session.add_all([author, moderator, daily])
+                db.session.flush()
+
+                base = datetime(2026, 3, 10, 9, 5)
+                conversations = []
+                for subject in ('Signalement A', 'Signalement B', 'Déjà lu'):
+                    conv = Conversation(subject=subject)
+                    db.session.add(conv)
+                    db.session.flush()
+                    conversations.append(conv)
+                    for user in (author, moderator, daily):
+                        db.session.add(ConversationParticipant(conversation_id=conv.id, user_id=user.id,
+                                                               unread_count=0 if subject == 'Déjà lu' else 5))
+                for index in range(5):
+                    conv = conversations[index % 3]
+                    msg = ConversationMessage(conversation_id=conv.id, sender_id=author.id,
+                                              content=f"Réponse {index}", created_at=base + timedelta(minutes=index))
+                    db.session.add(msg)
+                    for recipient in (moderator, daily):
+                        assert queue_message_notification(recipient, conv.id, msg, 'Nouveau message', 'Corps',
+                                                          messages_url='http://quiz.test/messages')
+                db.session.query(PendingNotification).update({'created_at': base})
+                db.session.commit()
+                daily_id = daily.id
+                assert PendingNotification.query.count() == 10
+                assert EmailOutbox.query.count() == 0
+
+            scheduler = DigestScheduler(app, interval=0, daily_hour=7)
+            # Avant l'échéance horaire: rien
+            assert scheduler.run_due(now=datetime(2026, 3, 10, 9, 50)) == 0
+            # Heure suivante: résumé du modérateur seulement (le quotidien attend 7h le lendemain)
+            assert scheduler.run_due(now=datetime(2026, 3, 10, 10, 1)) == 1
+            with app.app_context():
+                email = EmailOutbox.query.one()
+                assert email.to_email == 'modo@example.org'
+                assert email.subject == "Résumé: 4 nouveau(x) message(s) dans 2 conversation(s)"
+                assert 'Signalement A (2 message(s))' in email.body and 'Déjà lu' not in email.body
+                assert 'http://quiz.test/messages' in email.body
+                assert PendingNotification.query.filter_by(user_id=daily_id).count() == 5
+            assert scheduler.run_due(now=datetime(2026, 3, 11, 7, 0)) == 1
+            with app.app_context():
+                assert EmailOutbox.query.count() == 2
+                assert PendingNotification.query.count() == 0
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("✅ Résumés OK")
+
+
+def test_scheduled_task_sends_digests():
+    """Test 3 : Tâche planifiée (sans thread de fond): résumés dus ajoutés puis envoyés"""
+    print("\n=== Test 3 : Tâche planifiée ===")
+    saved = {key: os.environ.get(key) for key in ('MAIL_SERVER', 'MAIL_PORT', 'MAIL_USE_TLS', 'MAIL_DEFAULT_SENDER', 'MAIL_TIMEOUT')}
+    # Port fermé: l'envoi échoue et l'email est reprogrammé
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    os.environ.update({'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(port), 'MAIL_USE_TLS': '0',
+                       'MAIL_DEFAULT_SENDER': 'quiz@example.org', 'MAIL_TIMEOUT': '2'})
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = Flask(__name__)
+            app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'digest.db')}"
+            db.init_app(app)
+            with app.app_context():
+                db.create_all()
+                author = User(username='auteur', password_hash='x')
+                moderator = User(username='modo', password_hash='x', email='modo@example.org')
+                moderator.set_preferences({'notify_email_on_message': True, 'notify_email_digest': 'hourly'})
+                db.session.add_all([author, moderator])
+                db.session.flush()
+                conv = Conversation(subject='Signalement')
+                db.session.add(conv)
+                db.session.flush()
+                for user in (author, moderator):
+                    db.session.add(ConversationParticipant(conversation_id=conv.id, user_id=user.id, unread_count=1))
+                msg = ConversationMessage(conversation_id=conv.id, sender_id=author.id, content='Réponse')
+                db.session.add(msg)
+                assert queue_message_notification(moderator, conv.id, msg, 'Nouveau message', 'Corps')
+                db.session.query(PendingNotification).update({'created_at': datetime.utcnow() - timedelta(hours=2)})
+                db.session.commit()
+
+            # Threads jamais démarrés: seule la tâche planifiée traite les résumés
+            outbox = OutboxSender(app, poll_interval=60, retry_base_seconds=60)
+            app.extensions['email_outbox'] = outbox
+            app.extensions['email_digest'] = DigestScheduler(app, outbox=outbox, interval=60)
+            assert run_scheduled_tasks(app) == {'digests': 1, 'emails': 1}
+            with app.app_context():
+                assert PendingNotification.query.count() == 0
+                email = EmailOutbox.query.one()
+                assert (email.to_email, email.status, email.attempts) == ('modo@example.org', 'pending', 1)
+            assert run_scheduled_tasks(app) == {'digests': 0, 'emails': 0}
+            assert outbox._thread is None
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("✅ Tâche planifiée OK")
+
+
+if __name__ == '__main__':
+    test_digest_cutoff()
+    test_scheduler_groups_messages()
+    test_scheduled_task_sends_digests()
@@ -0,0 +1,220 @@
+"""
+Tests pour la boîte d'envoi des emails (email_outbox.py), contre un serveur SMTP local
+
+Usage:
+    python test_email_outbox.py
+"""
+
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, EmailOutbox
+from email_digest import DigestScheduler
+from email_outbox import OutboxSender, enqueue_email
+from scheduled_tasks import run_scheduled_tasks
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Serveur SMTP minimal: RCPT 'refuse*' -> 550, 'busy*' -> 451, sinon accepté."""
+
+    def _reply(self, line: str):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self._reply('220 localhost stand-in')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode('utf-8', 'replace').strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self._reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self._reply('250 OK')
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address.startswith('refuse'):
+                    self._reply('550 No such user')
+                elif address.startswith('busy'):
+                    self._reply('451 Try again later')
+                else:
+                    recipients.append(address)
+                    self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                server.delivered.extend(recipients)
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('250 OK')
+
+
+class _SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.delivered = []
+        self.connections = 0
+
+
+def _app(tmp):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'outbox.db')}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_outbox_batch_and_retries():
+    """Test 1 : Envoi par lot sur une connexion, nouveaux essais et refus définitifs"""
+    print("\n=== Test 1 : Boîte d'envoi ===")
+    smtp = _SMTPStandIn()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    saved = {key: os.environ.get(key) for key in ('MAIL_SERVER', 'MAIL_PORT', 'MAIL_USE_TLS', 'MAIL_DEFAULT_SENDER')}
+    os.environ.update({
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(smtp.server_address[1]),
+        'MAIL_USE_TLS': '0', 'MAIL_DEFAULT_SENDER': 'quiz@example.org',
+    })
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _app(tmp)
+            sender = OutboxSender(app, batch_size=10, poll_interval=0, max_attempts=3, retry_base_seconds=60)
+            with app.app_context():
+                for address in ('a@example.org', 'b@example.org', 'refuse@example.org', 'busy@example.org'):
+                    enqueue_email(address, 'Sujet', 'Corps')
+                db.session.commit()
+
+            assert sender.drain() == 4
+            assert sorted(smtp.delivered) == ['a@example.org', 'b@example.org']
+            assert smtp.connections == 1
+            with app.app_context():
+                statuses = {e.to_email: (e.status, e.attempts) for e in EmailOutbox.query}
+                assert statuses['refuse@example.org'] == ('failed', 1)
+                assert statuses['busy@example.org'] == ('pending', 1)
+                busy = EmailOutbox.query.filter_by(to_email='busy@example.org').one()
+                assert busy.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+
+            # Pas encore dû: rien à envoyer; puis échecs jusqu'à max_attempts
+            assert sender.drain() == 0
+            for _ in range(2):
+                with app.app_context():
+                    EmailOutbox.query.filter_by(to_email='busy@example.org').update({'next_attempt_at': datetime.utcnow()})
+                    db.session.commit()
+                sender.drain()
+            with app.app_context():
+                busy = EmailOutbox.query.filter_by(to_email='busy@example.org').one()
+                assert (busy.status, busy.attempts) == ('failed', 3)
+                assert sender.stats() == {'sent': 2, 'failed': 2}
+    finally:
+        smtp.shutdown()
+        smtp.server_close()
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("✅ Boîte d'envoi OK")
+
+
+def test_outbox_smtp_down():
+    """Test 2 : Serveur injoignable: le lot est reprogrammé"""
+    print("\n=== Test 2 : Serveur injoignable ===")
+    saved = {key: os.environ.get(key) for key in ('MAIL_SERVER', 'MAIL_PORT', 'MAIL_USE_TLS', 'MAIL_DEFAULT_SENDER', 'MAIL_TIMEOUT')}
+    # Port fermé: connexion refusée
+    probe = _SMTPStandIn()
+    port = probe.server_address[1]
+    probe.server_close()
+    os.environ.update({
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(port),
+        'MAIL_USE_TLS': '0', 'MAIL_DEFAULT_SENDER': 'quiz@example.org', 'MAIL_TIMEOUT': '2',
+    })
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _app(tmp)
+            sender = OutboxSender(app, poll_interval=0, retry_base_seconds=10)
+            with app.app_context():
+                enqueue_email('a@example.org', 'Sujet', 'Corps')
+                enqueue_email('b@example.org', 'Sujet', 'Corps')
+                db.session.commit()
+            assert sender.drain() == 2
+            with app.app_context():
+                assert {(e.status, e.attempts, e.locked_by) for e in EmailOutbox.query} == {('pending', 1, None)}
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("✅ Nouvel essai programmé OK")
+
+
+def test_outbox_without_thread():
+    """Test 3 : Thread de fond bloqué (serveur sans threads): envoi après la requête et tâche planifiée"""
+    print("\n=== Test 3 : Sans thread de fond ===")
+    smtp = _SMTPStandIn()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    saved = {key: os.environ.get(key) for key in ('MAIL_SERVER', 'MAIL_PORT', 'MAIL_USE_TLS', 'MAIL_DEFAULT_SENDER')}
+    os.environ.update({
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(smtp.server_address[1]),
+        'MAIL_USE_TLS': '0', 'MAIL_DEFAULT_SENDER': 'quiz@example.org',
+    })
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _app(tmp)
+            sender = OutboxSender(app, poll_interval=60, retry_base_seconds=60)
+            # Thread vivant mais jamais exécuté (worker uWSGI sans threads)
+            stand_in = threading.Event()
+            sender._thread = threading.Thread(target=stand_in.wait, daemon=True)
+            sender._thread.start()
+            sender._heartbeat = time.monotonic() - 3600
+            assert not sender.thread_running()
+            with app.app_context():
+                enqueue_email('a@example.org', 'Sujet', 'Corps')
+                enqueue_email('busy@example.org', 'Sujet', 'Corps')
+                db.session.commit()
+            sender.wake()
+            assert smtp.delivered == ['a@example.org']
+
+            # Nouvel essai dû: envoyé par la tâche planifiée
+            app.extensions['email_outbox'] = sender
+            app.extensions['email_digest'] = DigestScheduler(app, outbox=sender, interval=0)
+            with app.app_context():
+                EmailOutbox.query.filter_by(to_email='busy@example.org').update({'next_attempt_at': datetime.utcnow()})
+                db.session.commit()
+            assert run_scheduled_tasks(app) == {'digests': 0, 'emails': 1}
+            with app.app_context():
+                busy = EmailOutbox.query.filter_by(to_email='busy@example.org').one()
+                assert (busy.status, busy.attempts) == ('pending', 2)
+            stand_in.set()
+    finally:
+        smtp.shutdown()
+        smtp.server_close()
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("✅ Sans thread de fond OK")
+
+
+if __name__ == '__main__':
+    test_outbox_batch_and_retries()
+    test_outbox_smtp_down()
+    test_outbox_without_thread()
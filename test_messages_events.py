@@ -0,0 +1,88 @@
+"""
+Tests pour les événements temps réel de la messagerie (messages_events.py)
+
+Usage:
+    python test_messages_events.py
+"""
+
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, User, Conversation, ConversationParticipant, ConversationMessage
+from messages_events import MessageEventBroker, SUBSCRIPTION_QUEUE_SIZE
+
+
+def test_local_publish():
+    """Test 1 : Publication en mémoire aux seuls destinataires abonnés"""
+    print("\n=== Test 1 : Publication locale ===")
+    broker = MessageEventBroker(app=None)
+    alice = broker.subscribe(1)
+    alice_tab = broker.subscribe(1)
+    bob = broker.subscribe(2)
+    broker.publish_message(10, 100, sender_id=2, recipient_ids=[1, 3])
+    for subscription in (alice, alice_tab):
+        assert subscription.get(timeout=0.1) == {'type': 'message', 'conversation_id': 10, 'message_id': 100, 'sender_id': 2}
+    assert bob.get(timeout=0.05) is None
+
+    broker.unsubscribe(alice_tab)
+    broker.unsubscribe(bob)
+    assert broker.subscriber_count() == 1
+
+    # Client qui ne lit plus: file bornée, puis un seul événement de resynchronisation
+    for index in range(SUBSCRIPTION_QUEUE_SIZE + 5):
+        broker.publish_message(10, 200 + index, sender_id=2, recipient_ids=[1])
+    assert alice.get(timeout=0.1) == {'type': 'resync'}
+    assert alice.get(timeout=0.05) is None
+    print("✅ Publication locale OK")
+
+
+def test_poll_backend():
+    """Test 2 : Repli multi-workers: nouveaux messages lus en base"""
+    print("\n=== Test 2 : Lecture en base ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'events.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=name, password_hash='x') for name in ('auteur', 'lecteur', 'absent')]
+            db.session.add_all(users)
+            conv = Conversation(subject='Signalement')
+            db.session.add(conv)
+            db.session.flush()
+            for user in users:
+                db.session.add(ConversationParticipant(conversation_id=conv.id, user_id=user.id))
+            db.session.add(ConversationMessage(conversation_id=conv.id, sender_id=users[0].id, content='Ancien'))
+            db.session.commit()
+            conv_id, author_id, reader_id = conv.id, users[0].id, users[1].id
+
+        # Intervalle long: le thread de fond ne passe pas pendant le test, poll_once est appelé directement
+        broker = MessageEventBroker(app, backend='poll', poll_interval=60)
+        reader = broker.subscribe(reader_id)
+        author = broker.subscribe(author_id)
+        # Premier passage: point de départ, les messages existants ne sont pas rejoués
+        assert broker.poll_once() == 0
+
+        # La publication en mémoire est ignorée (un autre worker ne la verrait pas)
+        broker.publish_message(conv_id, 999, author_id, [reader_id])
+        assert reader.get(timeout=0.05) is None
+
+        with app.app_context():
+            msg = ConversationMessage(conversation_id=conv_id, sender_id=author_id, content='Réponse')
+            db.session.add(msg)
+            db.session.commit()
+            msg_id = msg.id
+        assert broker.poll_once() == 1
+        assert reader.get(timeout=0.1) == {'type': 'message', 'conversation_id': conv_id, 'message_id': msg_id, 'sender_id': author_id}
+        # Pas d'événement pour l'expéditeur
+        assert author.get(timeout=0.05) is None
+        assert broker.poll_once() == 0
+        broker.stop()
+    print("✅ Lecture en base OK")
+
+
+if __name__ == '__main__':
+    test_local_publish()
+    test_poll_backend()
@@ -0,0 +1,195 @@
+"""
+Tests pour la boîte de réception et les fils paginés par curseur (messages_inbox.py)
+
+Usage:
+    python test_messages_inbox.py
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, User, Conversation, ConversationParticipant, ConversationMessage
+from messages_inbox import (fetch_inbox, fetch_thread_page, record_new_message, mark_read, mark_unread,
+                            total_unread, recount_unread_counters)
+from sql_profiler import assert_max_queries
+
+
+def _create_app(tmp):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'inbox.db')}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _user(username):
+    user = User(username=username, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _conversation(created_at, *users):
+    conversation = Conversation(subject='Sujet', created_at=created_at)
+    db.session.add(conversation)
+    db.session.flush()
+    for user in users:
+        db.session.add(ConversationParticipant(conversation_id=conversation.id, user_id=user.id))
+    return conversation
+
+
+def _send(conversation, sender, created_at):
+    db.session.add(ConversationMessage(conversation_id=conversation.id, sender_id=sender.id if sender else None,
+                                       content='Message', created_at=created_at))
+    record_new_message(conversation.id, sender.id if sender else None)
+
+
+def _unread_counts():
+    db.session.expire_all()
+    return {(p.conversation_id, p.user_id): p.unread_count for p in ConversationParticipant.query}
+
+
+def test_inbox_cursor_equal_activity():
+    """Test 1 : Pages de la boîte de réception, conversations de même dernière activité"""
+    print("\n=== Test 1 : Curseur de la boîte de réception ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _create_app(tmp)
+        with app.app_context():
+            owner = _user('joueur')
+            other = _user('autre')
+            created = datetime(2024, 5, 1, 12, 0, 0)
+            quiet = [_conversation(created, owner, other) for _ in range(5)]
+            active = [_conversation(created, owner, other) for _ in range(2)]
+            for conversation in active:
+                _send(conversation, other, created + timedelta(hours=1))
+            _conversation(created, other)
+            db.session.commit()
+            expected = [c.id for c in sorted(active, key=lambda c: -c.id)] + [c.id for c in sorted(quiet, key=lambda c: -c.id)]
+
+            seen = []
+            cursor = None
+            pages = 0
+            while True:
+                rows, cursor = fetch_inbox(owner.id, limit=2, cursor=cursor)
+                seen.extend(row.id for row in rows)
+                pages += 1
+                if cursor is None:
+                    break
+            assert seen == expected
+            assert pages == 4
+
+            # Curseur invalide: première page
+            rows, _ = fetch_inbox(owner.id, limit=2, cursor='invalide')
+            assert [row.id for row in rows] == expected[:2]
+    print("✅ Curseur de la boîte de réception OK")
+
+
+def test_thread_cursor_equal_timestamps():
+    """Test 2 : Pages d'un fil, messages de même date"""
+    print("\n=== Test 2 : Curseur d'un fil ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _create_app(tmp)
+        with app.app_context():
+            first = _user('joueur')
+            second = _user('autre')
+            conversation = _conversation(datetime(2024, 5, 1), first, second)
+            sent_at = datetime(2024, 5, 1, 12, 0, 0)
+            for index in range(7):
+                _send(conversation, first if index % 2 else second, sent_at)
+            db.session.commit()
+            expected = [m.id for m in ConversationMessage.query.order_by(ConversationMessage.id)]
+
+            pages = []
+            before = None
+            while True:
+                messages, before = fetch_thread_page(conversation.id, limit=3, before=before)
+                pages.append([m.id for m in messages])
+                if before is None:
+                    break
+            assert pages == [expected[4:], expected[1:4], expected[:1]]
+    print("✅ Curseur d'un fil OK")
+
+
+def test_unread_counters_match_recount():
+    """Test 3 : Compteurs dénormalisés identiques au recalcul complet"""
+    print("\n=== Test 3 : Compteurs de non lus ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _create_app(tmp)
+        with app.app_context():
+            alice = _user('alice')
+            bob = _user('bob')
+            carol = _user('carol')
+            earlier = datetime.utcnow() - timedelta(hours=1)
+            group = _conversation(earlier, alice, bob, carol)
+            direct = _conversation(earlier, alice, bob)
+            _send(group, alice, earlier)
+            _send(group, alice, earlier)
+            _send(group, None, earlier)
+            _send(direct, bob, earlier)
+            db.session.commit()
+
+            assert total_unread(alice.id) == 2
+            assert total_unread(bob.id) == 3
+            assert total_unread(carol.id) == 3
+
+            # Bob lit le groupe, puis Carol répond
+            mark_read(ConversationParticipant.query.filter_by(conversation_id=group.id, user_id=bob.id).one())
+            db.session.commit()
+            _send(group, carol, datetime.utcnow() + timedelta(seconds=1))
+            # Alice remet la conversation directe en non lue
+            mark_unread(ConversationParticipant.query.filter_by(conversation_id=direct.id, user_id=alice.id).one())
+            db.session.commit()
+
+            counters = _unread_counts()
+            assert counters[(group.id, bob.id)] == 1
+            assert total_unread(alice.id) == 3
+            assert recount_unread_counters() == 5
+            db.session.commit()
+            assert _unread_counts() == counters
+    print("✅ Compteurs de non lus OK")
+
+
+def test_query_budget():
+    """Test 4 : Une requête par page de boîte de réception, de fil, et pour le total des non lus"""
+    print("\n=== Test 4 : Budget de requêtes ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _create_app(tmp)
+        with app.app_context():
+            owner = _user('joueur')
+            others = [_user(f'autre{index}') for index in range(10)]
+            created = datetime(2024, 5, 1, 12, 0, 0)
+            conversations = [_conversation(created, owner, other) for other in others]
+            for index, (conversation, other) in enumerate(zip(conversations, others)):
+                _send(conversation, other, created + timedelta(minutes=index))
+                _send(conversation, owner, created + timedelta(minutes=index, seconds=30))
+            thread = conversations[0]
+            for index in range(20):
+                _send(thread, others[0] if index % 2 else owner, created + timedelta(hours=1, minutes=index))
+            db.session.commit()
+            owner_id, thread_id = owner.id, thread.id
+            db.session.expire_all()
+
+            with assert_max_queries(1, label='fetch_inbox'):
+                rows, cursor = fetch_inbox(owner_id, limit=5)
+                assert len(rows) == 5 and cursor
+            with assert_max_queries(1, label='fetch_inbox (page suivante)'):
+                rows, cursor = fetch_inbox(owner_id, limit=5, cursor=cursor)
+                assert len(rows) == 5 and cursor is None
+            with assert_max_queries(1, label='fetch_thread_page'):
+                messages, before = fetch_thread_page(thread_id, limit=10)
+                # Expéditeurs chargés avec les messages: pas de requête par message
+                assert {m.sender.username for m in messages} == {'joueur', 'autre0'}
+            with assert_max_queries(1, label='total_unread'):
+                assert total_unread(owner_id) == 20
+    print("✅ Budget de requêtes OK")
+
+
+if __name__ == '__main__':
+    test_inbox_cursor_equal_activity()
+    test_thread_cursor_equal_timestamps()
+    test_unread_counters_match_recount()
+    test_query_budget()
@@ -0,0 +1,108 @@
+"""
+Tests pour les journaux de sûreté des compteurs de questions (quiz_counters.py)
+
+Usage:
+    python test_quiz_counters.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+from models import db, User, Question
+from quiz_counters import QuestionCounterAggregator
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_journal_per_process():
+    """Test 1 : Seuls les journaux des processus terminés sont rejoués"""
+    print("\n=== Test 1 : Journaux par processus ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'counters.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            author = User(username='auteur', password_hash='x')
+            db.session.add(author)
+            db.session.flush()
+            question = Question(author_id=author.id, question_text='Q', possible_answers='A|||B', correct_answer='1')
+            db.session.add(question)
+            db.session.commit()
+            qid = question.id
+
+        journal = os.path.join(tmp, 'counters.journal')
+        live_pid = os.getppid()
+        files = {
+            # Worker vivant: journal et lot en cours à ne pas toucher
+            f'counters.journal.{live_pid}': f"{qid},1,1\n",
+            f'counters.journal.{live_pid}.123.flushing': f"{qid},1,1\n",
+            # Worker arrêté, ancien journal commun, processus précédent de même pid: rejoués
+            f'counters.journal.{_dead_pid()}.456.flushing': f"{qid},1,1\n{qid},0,2\n",
+            'counters.journal': f"{qid},0,2\n",
+            f'counters.journal.{os.getpid()}': f"{qid},1,1\n",
+        }
+        for name, content in files.items():
+            with open(os.path.join(tmp, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+
+        aggregator = QuestionCounterAggregator(app, flush_interval=100, journal_path=journal)
+        with app.app_context():
+            question = db.session.get(Question, qid)
+            assert (question.times_answered, question.success_count) == (4, 2)
+        remaining = sorted(name for name in os.listdir(tmp) if name.startswith('counters.journal'))
+        assert remaining == sorted([f'counters.journal.{live_pid}', f'counters.journal.{live_pid}.123.flushing',
+                                    f'counters.journal.{os.getpid()}'])
+        # Le journal de ce processus est neuf (l'ancien contenu a été rejoué)
+        assert os.path.getsize(os.path.join(tmp, f'counters.journal.{os.getpid()}')) == 0
+
+        aggregator.add_answer(qid, True, 1)
+        assert aggregator.flush() == 1
+        with app.app_context():
+            assert db.session.get(Question, qid).times_answered == 5
+        aggregator.stop()
+    print("✅ Journaux par processus OK")
+
+
+def test_flush_without_thread():
+    """Test 2 : Thread de fond absent (serveur sans threads): add_answer écrit le tampon en retard"""
+    print("\n=== Test 2 : Sans thread de fond ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'counters.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            author = User(username='auteur', password_hash='x')
+            db.session.add(author)
+            db.session.flush()
+            question = Question(author_id=author.id, question_text='Q', possible_answers='A|||B', correct_answer='1')
+            db.session.add(question)
+            db.session.commit()
+            qid = question.id
+
+        aggregator = QuestionCounterAggregator(app, flush_interval=0.2)
+        aggregator._ensure_worker = lambda: None
+        aggregator.add_answer(qid, True, 1)
+        assert aggregator.pending(qid) == (1, 1)
+        time.sleep(0.25)
+        aggregator.add_answer(qid, False, 2)
+        assert aggregator.pending(qid) == (0, 0)
+        with app.app_context():
+            assert db.session.get(Question, qid).times_answered == 2
+        aggregator.stop()
+    print("✅ Sans thread de fond OK")
+
+
+if __name__ == '__main__':
+    test_journal_per_process()
+    test_flush_without_thread()
@@ -0,0 +1,44 @@
+"""
+Tests pour le mode sans fin (quiz_endless.py)
+
+Usage:
+    python test_quiz_endless.py
+"""
+
+from quiz_endless import SeededPermutation, next_endless_question_id
+
+
+def test_permutation():
+    """Test 1 : La permutation couvre chaque position une seule fois"""
+    print("\n=== Test 1 : Permutation ===")
+    for size in (1, 2, 3, 17, 256, 1000):
+        permutation = SeededPermutation(size, 42)
+        assert sorted(permutation[i] for i in range(size)) == list(range(size))
+    # Même graine => même ordre; autre graine => autre ordre
+    assert [SeededPermutation(50, 7)[i] for i in range(50)] == [SeededPermutation(50, 7)[i] for i in range(50)]
+    assert [SeededPermutation(50, 7)[i] for i in range(50)] != [SeededPermutation(50, 8)[i] for i in range(50)]
+    print("✅ Permutation OK")
+
+
+def test_cursor():
+    """Test 2 : Curseur (graine, position) sans répétition sur un cycle"""
+    print("\n=== Test 2 : Curseur ===")
+    ids = tuple(range(100, 120))
+    cursor = {}
+    served = [next_endless_question_id(cursor, (), ids) for _ in range(len(ids))]
+    assert sorted(served) == list(ids)
+    assert cursor['offset'] == len(ids)
+    first_seed = cursor['seed']
+    # Cycle suivant: nouvelle graine
+    assert next_endless_question_id(cursor, (), ids) in ids
+    assert cursor['offset'] == 1 and cursor['seed'] != first_seed
+    # Changement de filtres: nouveau curseur
+    next_endless_question_id(cursor, ('', '', '', '2'), ids)
+    assert cursor['filters'] == ['', '', '', '2'] and cursor['offset'] == 1
+    assert next_endless_question_id({}, (), ()) is None
+    print("✅ Curseur OK")
+
+
+if __name__ == '__main__':
+    test_permutation()
+    test_cursor()
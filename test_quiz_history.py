@@ -0,0 +1,173 @@
+"""
+Tests pour l'historique de jeu par utilisateur et son cache (quiz_history.py)
+
+Usage:
+    python test_quiz_history.py
+"""
+
+import os
+import tempfile
+import threading
+
+from flask import Flask
+from sqlalchemy import text
+
+from models import db, User, Question, UserQuestionStat, UserQuizHistory
+from quiz_history import get_user_history, invalidate_user_history, record_answer, _insert_history_row
+
+
+def test_cache_invalidated_after_commit():
+    """Test 1 : Une lecture concurrente avant le commit ne laisse pas l'ancien historique en cache"""
+    print("\n=== Test 1 : Invalidation après commit ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='joueur', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(UserQuizHistory(user_id=user.id))
+            db.session.commit()
+            user_id = user.id
+            # Cache du processus: entrée éventuelle d'un autre test pour le même id
+            invalidate_user_history(user_id)
+            assert get_user_history(user_id) == (frozenset(), frozenset())
+
+        def concurrent_read(results):
+            with app.app_context():
+                results.append(get_user_history(user_id))
+
+        with app.app_context():
+            assert record_answer(user_id, 12, [3, 4])
+            # Autre requête du même processus, avant le commit de la réponse: ancienne ligne
+            results = []
+            reader = threading.Thread(target=concurrent_read, args=(results,))
+            reader.start()
+            reader.join()
+            assert results == [(frozenset(), frozenset())]
+            db.session.commit()
+            assert get_user_history(user_id) == (frozenset({12}), frozenset({3, 4}))
+
+            # Réponse annulée: historique inchangé
+            assert record_answer(user_id, 13, [5])
+            db.session.rollback()
+            assert get_user_history(user_id) == (frozenset({12}), frozenset({3, 4}))
+    print("✅ Invalidation après commit OK")
+
+
+def test_first_row_insert_is_idempotent():
+    """Test 2 : Ligne d'historique déjà créée par une autre requête: pas d'erreur d'unicité"""
+    print("\n=== Test 2 : Création de la ligne ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='joueur', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            first = _insert_history_row(user.id)
+            first.set_ids({7}, {1})
+            db.session.commit()
+            again = _insert_history_row(user.id)
+            assert again.get_seen_question_ids() == {7}
+            db.session.commit()
+            assert UserQuizHistory.query.count() == 1
+    print("✅ Création de la ligne OK")
+
+
+def test_record_answer_appends_in_sql():
+    """Test 3 : Réponse enregistrée par une autre transaction pendant la lecture: aucun id perdu"""
+    print("\n=== Test 3 : Ajout en une instruction ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='joueur', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(UserQuizHistory(user_id=user.id, seen_question_ids_csv='4', answered_keyword_ids_csv='1'))
+            db.session.commit()
+            user_id = user.id
+            invalidate_user_history(user_id)
+
+            # Ligne lue par cette requête, puis complétée par une requête simultanée
+            stale = UserQuizHistory.query.filter_by(user_id=user_id).one()
+            with db.engine.begin() as conn:
+                conn.execute(text("UPDATE user_quiz_history SET seen_question_ids_csv = '4,5', "
+                                  "answered_keyword_ids_csv = '1,2' WHERE user_id = :user_id"), {'user_id': user_id})
+            assert record_answer(user_id, 6, [2, 3])
+            db.session.commit()
+            assert get_user_history(user_id) == (frozenset({4, 5, 6}), frozenset({1, 2, 3}))
+            assert not record_answer(user_id, 5, [1])
+            assert stale.get_seen_question_ids() == {4, 5, 6}
+    print("✅ Ajout en une instruction OK")
+
+
+def test_record_answer_creates_row_from_stats():
+    """Test 4 : Première réponse d'un utilisateur sans ligne: historique reconstruit puis complété"""
+    print("\n=== Test 4 : Première réponse ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='joueur', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            question = Question(author_id=user.id, question_text='Q', possible_answers='A|||B', correct_answer='1')
+            db.session.add(question)
+            db.session.flush()
+            db.session.add(UserQuestionStat(user_id=user.id, question_id=question.id, times_answered=1, success_count=1))
+            db.session.commit()
+            user_id, old_id = user.id, question.id
+            invalidate_user_history(user_id)
+
+            assert record_answer(user_id, 900, [8])
+            db.session.commit()
+            row = UserQuizHistory.query.filter_by(user_id=user_id).one()
+            assert (row.get_seen_question_ids(), row.get_answered_keyword_ids()) == ({old_id, 900}, {8})
+    print("✅ Première réponse OK")
+
+
+def test_read_does_not_commit_caller_session():
+    """Test 5 : Lecture sans ligne d'historique: la session de l'appelant n'est ni validée ni annulée"""
+    print("\n=== Test 5 : Lecture seule ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='joueur', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            question = Question(author_id=user.id, question_text='Q', possible_answers='A|||B', correct_answer='1')
+            db.session.add(question)
+            db.session.flush()
+            db.session.add(UserQuestionStat(user_id=user.id, question_id=question.id, times_answered=1, success_count=1))
+            db.session.commit()
+            user_id, question_id = user.id, question.id
+            invalidate_user_history(user_id)
+
+            pending = User(username='en-cours', password_hash='x')
+            db.session.add(pending)
+            assert get_user_history(user_id) == (frozenset({question_id}), frozenset())
+            db.session.rollback()
+            assert User.query.filter_by(username='en-cours').count() == 0
+            assert UserQuizHistory.query.count() == 0
+    print("✅ Lecture seule OK")
+
+
+if __name__ == '__main__':
+    test_cache_invalidated_after_commit()
+    test_first_row_insert_is_idempotent()
+    test_record_answer_appends_in_sql()
+    test_record_answer_creates_row_from_stats()
+    test_read_does_not_commit_caller_session()
@@ -0,0 +1,166 @@
+"""
+Tests pour le quiz hors ligne: /api/quiz/pack/<slug> et /api/quiz/pack/submit
+
+Les données du test (utilisateurs, questions, set) sont créées avec des noms
+uniques et supprimées à la fin: la base est celle de l'application importée.
+
+Usage:
+    python test_quiz_pack.py
+"""
+
+import os
+import tempfile
+import uuid
+
+# Lancé seul: base et état de quiz temporaires (sans effet si l'application est déjà importée)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(_tmp, 'pack.db'))
+os.environ.setdefault('QUIZ_STATE_DB_PATH', os.path.join(_tmp, 'quiz_state.db'))
+
+import app as app_module
+from app import app, db
+from models import (User, Question, QuizRuleSet, UserQuestionStat, UserQuizHistory, UserQuizSession,
+                    QuestionAnswerStat)
+
+
+ANSWERS = ['A', 'B', 'C']
+
+
+def _create_fixture():
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        player = User(username=f'pack-{tag}', password_hash='x')
+        other = User(username=f'pack-other-{tag}', password_hash='x')
+        db.session.add_all([player, other])
+        db.session.flush()
+        for index in range(4):
+            db.session.add(Question(author_id=player.id, question_text=f'Pack {tag} Q{index}',
+                                    possible_answers='|||'.join(ANSWERS), correct_answer='2',
+                                    difficulty_level=1, is_published=True))
+        db.session.add(QuizRuleSet(name=f'Pack {tag}', slug=f'pack-{tag}', created_by_user_id=player.id,
+                                   allowed_difficulties_csv='1', questions_per_difficulty_json='{"1":4}',
+                                   scoring_base_points=2, perfect_quiz_bonus=5))
+        db.session.commit()
+        return {'tag': tag, 'slug': f'pack-{tag}', 'player': player.id, 'other': other.id}
+
+
+def _delete_fixture(fixture):
+    with app.app_context():
+        user_ids = [fixture['player'], fixture['other']]
+        question_ids = [q.id for q in Question.query.filter(Question.question_text.like(f"Pack {fixture['tag']} %"))]
+        QuestionAnswerStat.query.filter(QuestionAnswerStat.question_id.in_(question_ids)).delete(synchronize_session=False)
+        UserQuestionStat.query.filter(UserQuestionStat.user_id.in_(user_ids)).delete(synchronize_session=False)
+        UserQuizHistory.query.filter(UserQuizHistory.user_id.in_(user_ids)).delete(synchronize_session=False)
+        UserQuizSession.query.filter(UserQuizSession.user_id.in_(user_ids)).delete(synchronize_session=False)
+        QuizRuleSet.query.filter_by(slug=fixture['slug']).delete(synchronize_session=False)
+        Question.query.filter(Question.id.in_(question_ids)).delete(synchronize_session=False)
+        User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _client(user_id):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = user_id
+    return client
+
+
+def _answer_counts(question_ids):
+    with app.app_context():
+        times = {q.id: (q.times_answered, q.success_count) for q in Question.query.filter(Question.id.in_(question_ids))}
+        chosen = {(a.question_id, a.answer_index): a.selected_count
+                  for a in QuestionAnswerStat.query.filter(QuestionAnswerStat.question_id.in_(question_ids))}
+        return times, chosen
+
+
+def test_pack_submit():
+    """Test 1 : Pack, décodage de l'ordre des réponses, rejeu et pack d'un autre joueur"""
+    print("\n=== Test 1 : Envoi d'un pack ===")
+    fixture = _create_fixture()
+    try:
+        player = _client(fixture['player'])
+        pack = player.get(f"/api/quiz/pack/{fixture['slug']}").get_json()
+        questions = pack['questions']
+        assert len(questions) == 4
+        ids = [q['id'] for q in questions]
+
+        # Deux bonnes réponses, puis deux réponses fausses (position affichée -> réponse d'origine)
+        answers = []
+        expected_chosen = {}
+        for index, question in enumerate(questions):
+            shown = [a['text'] for a in question['answers']]
+            assert sorted(shown) == ANSWERS
+            if index < 2:
+                position = question['correct_answer']
+                assert shown[position - 1] == 'B'
+            else:
+                position = shown.index('A') + 1
+            answers.append({'question_id': question['id'], 'selected': position})
+            original = ANSWERS.index(shown[position - 1]) + 1
+            expected_chosen[(question['id'], original)] = 1
+
+        # Le jeton est lié au joueur
+        response = _client(fixture['other']).post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers})
+        assert response.status_code == 403
+        response = app.test_client().post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers})
+        assert response.status_code == 403
+
+        response = player.post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        result = response.get_json()
+        assert (result['answered'], result['correct'], result['perfect_bonus']) == (4, 2, 0)
+        assert [r['is_correct'] for r in result['results']] == [True, True, False, False]
+
+        times, chosen = _answer_counts(ids)
+        assert chosen == expected_chosen
+        assert sorted(times.values()) == [(1, 0), (1, 0), (1, 1), (1, 1)]
+
+        # Rejeu: refusé, compteurs et statistiques inchangés
+        response = player.post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers})
+        assert response.status_code == 409
+        assert _answer_counts(ids) == (times, chosen)
+        with app.app_context():
+            assert UserQuizSession.query.filter_by(user_id=fixture['player']).count() == 1
+            assert UserQuestionStat.query.filter_by(user_id=fixture['player']).count() == 4
+
+        assert player.post('/api/quiz/pack/submit', json={'token': 'invalide', 'answers': answers}).status_code == 400
+    finally:
+        _delete_fixture(fixture)
+    print("✅ Envoi d'un pack OK")
+
+
+def test_pack_submit_rollback():
+    """Test 2 : Échec d'enregistrement: marqueur supprimé, le pack peut être renvoyé"""
+    print("\n=== Test 2 : Annulation ===")
+    fixture = _create_fixture()
+    write_counter_batch = app_module.write_counter_batch
+
+    def failing_batch(*args, **kwargs):
+        raise RuntimeError("base indisponible")
+
+    try:
+        player = _client(fixture['player'])
+        pack = player.get(f"/api/quiz/pack/{fixture['slug']}").get_json()
+        answers = [{'question_id': q['id'], 'selected': q['correct_answer']} for q in pack['questions']]
+
+        app_module.write_counter_batch = failing_batch
+        try:
+            response = player.post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers})
+        finally:
+            app_module.write_counter_batch = write_counter_batch
+        assert response.status_code == 500
+        with app.app_context():
+            assert UserQuizSession.query.filter_by(user_id=fixture['player']).count() == 0
+
+        response = player.post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers})
+        assert response.status_code == 200
+        assert response.get_json()['perfect_bonus'] == 5
+        assert player.post('/api/quiz/pack/submit', json={'token': pack['token'], 'answers': answers}).status_code == 409
+    finally:
+        _delete_fixture(fixture)
+    print("✅ Annulation OK")
+
+
+if __name__ == '__main__':
+    test_pack_submit()
+    test_pack_submit_rollback()
@@ -0,0 +1,94 @@
+"""
+Tests pour le moteur de sélection des questions (quiz_selection.py)
+
+Usage:
+    python test_quiz_selection.py
+"""
+
+import random
+
+from quiz_selection import KeywordSelectionIndex, iter_positions, iter_random_positions, mask_from_positions
+
+
+def test_masks():
+    """Test 1 : Construction et lecture des masques"""
+    print("\n=== Test 1 : Masques de bits ===")
+    positions = [0, 3, 7, 8, 63, 64, 99]
+    mask = mask_from_positions(positions, 100)
+    assert list(iter_positions(mask)) == positions
+    assert sorted(iter_random_positions(mask, random.Random(3))) == positions
+    dense = (1 << 1000) - 1
+    assert sorted(iter_random_positions(dense, random.Random(5))) == list(range(1000))
+    print("✅ Masques OK")
+
+
+def test_priorities():
+    """Test 2 : Respect des priorités keywords / questions vues"""
+    print("\n=== Test 2 : Priorités ===")
+    question_keywords = {
+        1: frozenset({10}),
+        2: frozenset({10}),      # même keyword que 1
+        3: frozenset({20}),      # keyword déjà répondu
+        4: frozenset({30}),      # question déjà vue
+        5: frozenset(),          # sans keyword
+        6: frozenset({40}),
+    }
+    index = KeywordSelectionIndex([1, 2, 3, 4, 5, 6], question_keywords)
+    for seed in range(20):
+        selected, used, stats = index.select(
+            quota=4,
+            seen_question_ids={4},
+            answered_keywords={20},
+            prevent_duplicate_keywords=True,
+            rng=random.Random(seed),
+        )
+        # 5 (sans keyword) d'abord, puis 6 et un seul de 1/2, puis 3 (keyword répondu)
+        assert selected[0] == 5
+        assert set(selected[1:3]) in ({1, 6}, {2, 6})
+        assert selected[3] == 3
+        assert stats['fallback_used'] == ['keyword_already_answered']
+        assert used == {10, 20, 40}
+
+    # Pool insuffisant: les doublons de keywords passent en dernier
+    selected, _, stats = index.select(quota=6, seen_question_ids={4}, answered_keywords={20})
+    assert len(selected) == 6
+    assert selected[-1] in (1, 2)
+    assert 'keyword_duplicate' in stats['fallback_used']
+    print("✅ Priorités OK")
+
+
+def test_restrict_mask():
+    """Test 3 : Sélection restreinte à un sous-ensemble"""
+    print("\n=== Test 3 : Sous-ensemble ===")
+    ids = list(range(1, 101))
+    index = KeywordSelectionIndex(ids, {qid: frozenset({qid % 7}) for qid in ids})
+    restrict = index.question_mask({qid for qid in ids if qid % 2 == 0})
+    selected, used, stats = index.select(quota=5, restrict_mask=restrict, used_keywords={0})
+    assert len(selected) == 5
+    assert all(qid % 2 == 0 for qid in selected)
+    assert len({qid % 7 for qid in selected}) == 5
+    assert 0 not in {qid % 7 for qid in selected}
+    assert stats['perfect']
+    print("✅ Sous-ensemble OK")
+
+
+def test_select_groups():
+    """Test 4 : Plusieurs quotas en une passe (keywords partagés)"""
+    print("\n=== Test 4 : Quotas multiples ===")
+    ids = list(range(1, 41))
+    # Difficulté = qid % 4, keyword = qid % 10 (partagé entre difficultés)
+    index = KeywordSelectionIndex(ids, {qid: frozenset({qid % 10}) for qid in ids})
+    groups = [(d, index.question_mask({qid for qid in ids if qid % 4 == d}), 2) for d in range(4)]
+    selected, used, stats = index.select_groups(groups, prevent_duplicate_keywords=True)
+    all_selected = [qid for d in range(4) for qid in selected[d]]
+    assert all(len(selected[d]) == 2 and all(qid % 4 == d for qid in selected[d]) for d in range(4))
+    assert len({qid % 10 for qid in all_selected}) == 8
+    assert all(stats[d]['perfect'] for d in range(4))
+    print("✅ Quotas multiples OK")
+
+
+if __name__ == '__main__':
+    test_masks()
+    test_priorities()
+    test_restrict_mask()
+    test_select_groups()
@@ -0,0 +1,84 @@
+"""
+Tests pour le stockage côté serveur de l'état des parties de quiz (quiz_state.py)
+
+Usage:
+    python test_quiz_state.py
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from quiz_state import MemoryQuizStateStore, SQLiteQuizStateStore
+
+
+def _check_store(store):
+    state = {'playlist': [3, 1, 2], 'index': 1, 'score': 20, 'breakdown': [{'base': 10}]}
+    store.set('sid1', 'user:set-a', state)
+    assert store.get('sid1', 'user:set-a') == state
+    assert store.get('sid1', 'user:set-b') is None
+    assert store.get('sid2', 'user:set-a') is None
+
+    # Une modification de l'objet retourné ne doit pas modifier l'état stocké
+    loaded = store.get('sid1', 'user:set-a')
+    loaded['index'] = 2
+    assert store.get('sid1', 'user:set-a')['index'] == 1
+
+    store.delete('sid1', 'user:set-a')
+    assert store.get('sid1', 'user:set-a') is None
+
+    # Marqueur à usage unique: une seule insertion réussit, même en parallèle
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.add('sid1', 'pack:n1', {'x': 1}))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+    assert store.add('sid1', 'pack:n1', {'x': 2}) is False
+    assert store.get('sid1', 'pack:n1') == {'x': 1}
+    store.delete('sid1', 'pack:n1')
+    assert store.add('sid1', 'pack:n1', {'x': 3}) is True
+
+
+def _check_ttl(store):
+    store.set('sid1', 'k', {'index': 0})
+    time.sleep(0.05)
+    assert store.get('sid1', 'k') is None
+    # Un marqueur expiré peut être reposé
+    assert store.add('sid1', 'm', {}) is True
+    time.sleep(0.05)
+    assert store.add('sid1', 'm', {}) is True
+    store.delete('sid1', 'm')
+    store.set('sid1', 'k', {'index': 0})
+    store.set('sid2', 'k', {'index': 0})
+    time.sleep(0.05)
+    assert store.purge_expired() == 2
+
+
+def test_memory_store():
+    """Test 1 : Stockage en mémoire"""
+    print("\n=== Test 1 : Stockage en mémoire ===")
+    _check_store(MemoryQuizStateStore())
+    store = MemoryQuizStateStore()
+    store.ttl_seconds = 0.01
+    _check_ttl(store)
+    print("✅ MemoryQuizStateStore OK")
+
+
+def test_sqlite_store():
+    """Test 2 : Stockage SQLite"""
+    print("\n=== Test 2 : Stockage SQLite ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'quiz_state.db')
+        _check_store(SQLiteQuizStateStore(path))
+        store = SQLiteQuizStateStore(path)
+        store.ttl_seconds = 0.01
+        _check_ttl(store)
+    print("✅ SQLiteQuizStateStore OK")
+
+
+if __name__ == '__main__':
+    test_memory_store()
+    test_sqlite_store()
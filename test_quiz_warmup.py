@@ -0,0 +1,62 @@
+"""
+Tests pour la réserve de playlists pré-générées (quiz_warmup.py)
+
+Usage:
+    python test_quiz_warmup.py
+"""
+
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, User, QuizRuleSet, UserQuizHistory
+from quiz_history import invalidate_user_history, record_answer
+from quiz_warmup import PlaylistWarmPool
+
+
+def test_user_playlist_history_snapshot():
+    """Test 1 : Réponse donnée pendant la génération: la playlist pré-générée n'est pas servie"""
+    print("\n=== Test 1 : Instantané de l'historique ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'warmup.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='joueur', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(UserQuizHistory(user_id=user.id))
+            rule_set = QuizRuleSet(name='Set', slug='set', created_by_user_id=user.id, is_active=True)
+            db.session.add(rule_set)
+            db.session.commit()
+            user_id, rule_set_id = user.id, rule_set.id
+            invalidate_user_history(user_id)
+
+        calls = []
+
+        def generate(rule_set, generating_user_id, history=None):
+            calls.append(history)
+            if len(calls) == 2:
+                # Le joueur répond pendant la génération
+                with app.app_context():
+                    record_answer(generating_user_id, 42, [7])
+                    db.session.commit()
+            return [1, 2, 3]
+
+        pool = PlaylistWarmPool(app, generate, size=1)
+        with app.app_context():
+            rule_set = db.session.get(QuizRuleSet, rule_set_id)
+            pool._process(('user', rule_set_id, user_id))
+            assert calls == [(frozenset(), frozenset())]
+            assert pool.take(rule_set, user_id) == [1, 2, 3]
+
+            pool._process(('user', rule_set_id, user_id))
+            assert calls[1] == (frozenset(), frozenset())
+            assert pool.take(rule_set, user_id) is None
+    print("✅ Instantané de l'historique OK")
+
+
+if __name__ == '__main__':
+    test_user_playlist_history_snapshot()
@@ -0,0 +1,73 @@
+"""
+Tests pour le comptage des requêtes SQL et la détection des N+1 (sql_profiler.py)
+
+Usage:
+    python test_sql_profiler.py
+"""
+
+from sqlalchemy import create_engine, text
+
+from sql_profiler import QueryBudgetExceeded, assert_max_queries, count_queries, normalize_statement
+
+
+def _engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (id, name) VALUES (1, 'a'), (2, 'b'), (3, 'c')"))
+    return engine
+
+
+def test_normalize_statement():
+    """Test 1 : Forme des instructions"""
+    print("\n=== Test 1 : Forme des instructions ===")
+    assert normalize_statement("SELECT * FROM t WHERE id = 12 AND name = 'x''y'") == \
+        "SELECT * FROM t WHERE id = ? AND name = ?"
+    assert normalize_statement("SELECT * FROM t\n  WHERE id IN (?, ?, ?)") == \
+        normalize_statement("SELECT * FROM t WHERE id IN (?)")
+    print("✅ Normalisation OK")
+
+
+def test_count_and_repeated():
+    """Test 2 : Comptage et formes répétées (N+1)"""
+    print("\n=== Test 2 : Comptage et N+1 ===")
+    engine = _engine()
+    with count_queries('liste') as stats:
+        with engine.connect() as conn:
+            ids = [row[0] for row in conn.execute(text("SELECT id FROM items ORDER BY id"))]
+            for item_id in ids:
+                conn.execute(text("SELECT name FROM items WHERE id = :id"), {'id': item_id}).scalar()
+    assert stats.count == 4
+    repeated = stats.repeated(3)
+    assert len(repeated) == 1 and repeated[0][1] == 3
+    assert stats.repeated(4) == []
+    # Hors bloc: plus rien n'est compté
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert stats.count == 4
+    print("✅ Comptage OK")
+
+
+def test_query_budget():
+    """Test 3 : Budget de requêtes"""
+    print("\n=== Test 3 : Budget ===")
+    engine = _engine()
+    with assert_max_queries(2):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT COUNT(*) FROM items"))
+    try:
+        with assert_max_queries(10, max_repeats=2, label='N+1'):
+            with engine.connect() as conn:
+                for item_id in (1, 2, 3):
+                    conn.execute(text("SELECT name FROM items WHERE id = :id"), {'id': item_id})
+    except QueryBudgetExceeded as e:
+        assert '3×' in str(e)
+    else:
+        raise AssertionError("QueryBudgetExceeded attendu")
+    print("✅ Budget OK")
+
+
+if __name__ == '__main__':
+    test_normalize_statement()
+    test_count_and_repeated()
+    test_query_budget()